@@ -1,32 +1,140 @@
+import threading
 import pandas as pd
-from langchain.tools import Tool
+from core.anomaly import describe_alert, get_monitor
+from core.data_store import get_store
+from core.intervals import OutageIntervals
+from core.outage_index import DEFAULT_RESULTS, get_outage_index
+from core.outage_stats import describe_outages_by_region
+from core.query_engine import NO_DATA, NO_OUTAGE_DATA, get_engine
+from core.telemetry import traced
+
+# Readings at or above this per-region demand quantile count as peak demand
+PEAK_QUANTILE = 0.9
+# Alerts listed individually in an anomaly scan
+MAX_LISTED_ALERTS = 5
 
 class AnalysisAgent:
-    def __init__(self, llm):
+    def __init__(self, llm, store=None, engine=None, monitor=None, outage_index=None):
         self.llm = llm
-        self.consumption_data = pd.read_csv('data/consumption_logs.csv')
-        self.outage_data = pd.read_csv('data/outage_reports.csv')
-    
-    def analyze_outages_by_region(self) -> str:
-        summary = {}
-        for _, row in self.outage_data.iterrows():
-            region = row['region']
-            if region not in summary:
-                summary[region] = {'count': 0, 'hours': 0}
-            summary[region]['count'] += 1
-            summary[region]['hours'] += row['duration_hours']
-        
-        result = []
-        for region, data in summary.items():
-            result.append(f"{region}: {data['count']} outages, {data['hours']} hrs")
-        return ". ".join(result)
-    
-    def analyze_demand_supply_gap(self) -> str:
-        self.consumption_data['gap'] = self.consumption_data['supply_mw'] - self.consumption_data['demand_mw']
-        analysis = self.consumption_data.groupby('region')['gap'].agg(['mean', 'min', 'max'])
+        self.store = store or get_store()
+        self.engine = engine or get_engine()
+        self.monitor = monitor or get_monitor()
+        self._outage_index = outage_index
+        self._intervals = None
+        self._intervals_lock = threading.Lock()
+    
+    @property
+    def consumption_data(self) -> pd.DataFrame:
+        return self.store.consumption
+    
+    @property
+    def outage_data(self) -> pd.DataFrame:
+        return self.store.outages
+    
+    @traced
+    def analyze_outages_by_region(self, *, region=None, start=None, end=None) -> str:
+        breakdown = self.engine.outage_breakdown('region', region, start, end)
+        if breakdown.empty:
+            return NO_OUTAGE_DATA
+        return describe_outages_by_region(breakdown)
+    
+    @traced
+    def summarize_outage_totals(self, *, region=None, start=None, end=None) -> str:
+        totals = self.engine.outage_totals(region, start, end)
+        if totals['count'] == 0:
+            return NO_OUTAGE_DATA
+        return f"Total outages: {totals['count']}, {totals['total_hours']} hrs (average {totals['mean_hours']:.2f} hrs, {totals['affected_customers']} customers affected)"
+    
+    @traced
+    def analyze_demand_supply_gap(self, *, region=None, start=None, end=None) -> str:
+        analysis = self.engine.demand_supply_gap(region, start, end)
+        if analysis.empty:
+            return NO_DATA
         return f"Demand-Supply Gap Analysis:\n{analysis.to_string()}"
     
+    @property
+    def outage_index(self):
+        # chromadb is only loaded once a similarity search is asked for
+        if self._outage_index is None:
+            self._outage_index = get_outage_index()
+        return self._outage_index
+    
+    @traced
+    def find_similar_outages(self, *, region=None, start=None, end=None, text=None, k=None) -> str:
+        if not text:
+            return "Please describe the incident to compare against, e.g. 'outages similar to a lightning strike on a substation'."
+        matches = self.outage_index.similar(text, region, start, end, k or DEFAULT_RESULTS)
+        matches = matches[matches['similarity'] > 0]
+        if matches.empty:
+            return NO_OUTAGE_DATA
+        result = [f"{row.date} {row.region}: {row.document}, {row.duration_hours} hrs, {row.affected_customers:,} customers (similarity {row.similarity:.2f})"
+                  for row in matches.itertuples()]
+        return f"Outages most similar to '{text}':\n" + "\n".join(result)
+    
+    def outage_intervals(self) -> OutageIntervals:
+        with self._intervals_lock:
+            version = self.store.version('outages')
+            if self._intervals is None or self._intervals[0] != version:
+                self._intervals = (version, OutageIntervals(self.outage_data))
+            return self._intervals[1]
+    
+    def _outage_overlaps(self, region, start, end):
+        consumption = self.store.select('consumption', region, start, end)
+        intervals = self.outage_intervals()
+        pairs = intervals.join(consumption)
+        pairs['region'] = intervals.outages['region'].to_numpy()[pairs['outage_row']]
+        return consumption, pairs
+    
+    @traced
+    def analyze_outages_during_peak(self, *, region=None, start=None, end=None) -> str:
+        consumption, pairs = self._outage_overlaps(region, start, end)
+        if consumption.empty:
+            return NO_DATA
+        if pairs.empty:
+            return NO_OUTAGE_DATA
+        demand = consumption['demand_mw']
+        threshold = demand.groupby(consumption['region'], observed=True).transform('quantile', PEAK_QUANTILE)
+        at_peak = pairs[(demand >= threshold).to_numpy()[pairs['consumption_row']]]
+        label = f"top {1 - PEAK_QUANTILE:.0%} of demand per region"
+        if at_peak.empty:
+            return f"None of {pairs['outage_row'].nunique()} outages overlapped peak-demand periods ({label})"
+        by_region = at_peak.groupby('region', sort=False, observed=True).agg(outages=('outage_row', 'nunique'), hours=('overlap_hours', 'sum'))
+        result = [f"{name}: {row.outages} outages, {row.hours:g} hrs" for name, row in zip(by_region.index, by_region.itertuples())]
+        return (f"{at_peak['outage_row'].nunique()} of {pairs['outage_row'].nunique()} outages overlapped peak-demand periods ({label}). "
+                + ". ".join(result))
+    
+    @traced
+    def estimate_unserved_demand(self, *, region=None, start=None, end=None) -> str:
+        consumption, pairs = self._outage_overlaps(region, start, end)
+        if consumption.empty:
+            return NO_DATA
+        if pairs.empty:
+            return NO_OUTAGE_DATA
+        # Regional demand over the outage hours: an upper bound on the energy not served
+        pairs['mwh'] = consumption['demand_mw'].to_numpy()[pairs['consumption_row']] * pairs['overlap_hours']
+        by_region = pairs.groupby('region', sort=False, observed=True).agg(mwh=('mwh', 'sum'), hours=('overlap_hours', 'sum'))
+        result = [f"{name}: {row.mwh:,.0f} MWh over {row.hours:g} outage hrs" for name, row in zip(by_region.index, by_region.itertuples())]
+        return f"Demand during outages (upper bound on unserved energy): {pairs['mwh'].sum():,.0f} MWh. " + ". ".join(result)
+    
+    @traced
+    def detect_anomalies(self, *, region=None, start=None, end=None) -> str:
+        readings, scores, alerts = self.monitor.scan(region, start, end)
+        if readings.empty:
+            return NO_DATA
+        detector = self.monitor.detector
+        flags = scores[['spike', 'deficit_alert']].groupby(readings['region'], sort=False, observed=True).sum()
+        result = [f"{name}: {row.spike} demand spikes, {row.deficit_alert} supply-deficit events"
+                  for name, row in zip(flags.index, flags.itertuples())]
+        header = (f"Anomaly scan of {len(readings):,} readings (EWMA span {detector.span} readings, "
+                  f"spike at z >= {detector.z_threshold:g}): {int(flags['spike'].sum())} demand spikes, "
+                  f"{int(flags['deficit_alert'].sum())} supply-deficit events")
+        if alerts:
+            latest = sorted(alerts, key=lambda a: a['date'])[-MAX_LISTED_ALERTS:]
+            result.append("Latest: " + "; ".join(describe_alert(a) for a in latest))
+        return header + "\n" + "\n".join(result)
+    
     def get_tools(self):
+        from langchain.tools import Tool
         return [
             Tool(
                 name="analyze_outages",
@@ -37,5 +145,25 @@ class AnalysisAgent:
                 name="analyze_gap",
                 func=self.analyze_demand_supply_gap,
                 description="Analyze demand-supply gap"
+            ),
+            Tool(
+                name="outages_during_peak",
+                func=self.analyze_outages_during_peak,
+                description="Find outages that overlapped peak demand"
+            ),
+            Tool(
+                name="unserved_demand",
+                func=self.estimate_unserved_demand,
+                description="Estimate demand affected by outages"
+            ),
+            Tool(
+                name="detect_anomalies",
+                func=self.detect_anomalies,
+                description="Find demand spikes and supply-deficit events"
+            ),
+            Tool(
+                name="find_similar_outages",
+                func=lambda text: self.find_similar_outages(text=text),
+                description="Find past outages similar to a described incident"
             )
         ]
\ No newline at end of file
@@ -1,22 +1,52 @@
 # agents/data_agent.py
 import pandas as pd
-from langchain.tools import Tool
+from core.data_store import get_store
+from core.quantiles import DEFAULT_PERCENTILES, RELATIVE_ACCURACY
+from core.query_engine import NO_DATA, get_engine
+from core.telemetry import traced
 
 class DataAgent:
-    def __init__(self, llm):
+    def __init__(self, llm, store=None, engine=None):
         self.llm = llm
-        self.consumption_data = pd.read_csv('data/consumption_logs.csv')
-        self.outage_data = pd.read_csv('data/outage_reports.csv')
+        self.store = store or get_store()
+        self.engine = engine or get_engine()
     
-    def get_peak_demand(self) -> str:
-        peak_row = self.consumption_data.loc[self.consumption_data['demand_mw'].idxmax()]
-        return f"Peak demand observed on {peak_row['date']} in {peak_row['region']} with {peak_row['demand_mw']} MW"
+    @property
+    def consumption_data(self) -> pd.DataFrame:
+        return self.store.consumption
+    
+    @property
+    def outage_data(self) -> pd.DataFrame:
+        return self.store.outages
+    
+    @traced
+    def get_peak_demand(self, *, region=None, start=None, end=None) -> str:
+        peak = self.engine.peak_demand(region, start, end)
+        if peak is None:
+            return NO_DATA
+        return f"Peak demand observed on {peak['date']:%Y-%m-%d} in {peak['region']} with {peak['demand_mw']} MW"
+    
+    @traced
+    def get_demand_percentiles(self, *, region=None, start=None, end=None, percentiles=None) -> str:
+        table = self.engine.percentiles(region, start, end, percentiles or DEFAULT_PERCENTILES)
+        if table.empty:
+            return NO_DATA
+        approximate = f" (sketch estimates, within {RELATIVE_ACCURACY:.0%})" if self.engine.name == 'pandas' else ""
+        result = [f"{name}: " + ", ".join(f"{column} {row[column]:,.0f} MW" for column in table.columns[1:]) + f" ({int(row['count']):,} readings)"
+                  for name, row in table.iterrows()]
+        return f"Demand percentiles{approximate}:\n" + "\n".join(result)
     
     def get_tools(self):
+        from langchain.tools import Tool
         return [
             Tool(
                 name="get_peak_demand",
                 func=self.get_peak_demand,
                 description="Get information about peak demand"
+            ),
+            Tool(
+                name="get_demand_percentiles",
+                func=self.get_demand_percentiles,
+                description="Get demand percentiles such as the median or p95"
             )
         ]
\ No newline at end of file
@@ -0,0 +1,44 @@
+# agents/forecast_agent.py
+from core.data_store import get_store
+from core.forecast import DEFAULT_DAYS, DemandForecaster, get_forecaster
+from core.query_engine import NO_DATA
+from core.telemetry import traced
+
+# Longest horizon for which the answer lists every day
+MAX_DAILY_LINES = 14
+
+class ForecastAgent:
+    def __init__(self, llm, store=None, forecaster=None):
+        self.llm = llm
+        self.store = store or get_store()
+        if forecaster is None:
+            forecaster = get_forecaster() if store is None else DemandForecaster(self.store)
+        self.forecaster = forecaster
+
+    @traced
+    def forecast_demand(self, *, region=None, start=None, end=None, days=None) -> str:
+        forecast = self.forecaster.forecast(region, days or DEFAULT_DAYS, start, end)
+        if forecast.empty:
+            return NO_DATA
+        first, last = forecast['date'].min(), forecast['date'].max()
+        daily = forecast.groupby(['region', forecast['date'].dt.normalize()], sort=False)['demand_mw'].agg(['mean', 'max'])
+        result = []
+        for name, part in forecast.groupby('region', sort=False):
+            peak = part.loc[part['demand_mw'].idxmax()]
+            line = (f"{name}: mean {part['demand_mw'].mean():,.0f} MW, peak {peak['demand_mw']:,.0f} MW on {peak['date']:%Y-%m-%d}"
+                    f" (model R² {self.forecaster.r_squared(name):.2f})")
+            days_of_region = daily.loc[name]
+            if region not in (None, 'All') and len(days_of_region) <= MAX_DAILY_LINES:
+                line += ". Daily: " + ", ".join(f"{day:%Y-%m-%d} {row['mean']:,.0f} MW" for day, row in days_of_region.iterrows())
+            result.append(line)
+        return f"Demand forecast {first:%Y-%m-%d} to {last:%Y-%m-%d}:\n" + "\n".join(result)
+
+    def get_tools(self):
+        from langchain.tools import Tool
+        return [
+            Tool(
+                name="forecast_demand",
+                func=self.forecast_demand,
+                description="Forecast electricity demand for the coming days"
+            )
+        ]
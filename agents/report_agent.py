@@ -1,39 +1,93 @@
-import plotly.express as px
+import os
 import pandas as pd
-from langchain.tools import Tool
+from core.data_store import get_store
+from core.outage_stats import describe_outages_by_region
+from core.query_engine import NO_DATA, NO_OUTAGE_DATA, get_engine
+from core.telemetry import traced
+
+LLM_UNAVAILABLE = "The language model is unavailable. Start Ollama or choose another model with EMS_LLM."
 
 class ReportAgent:
-    def __init__(self, llm):
+    def __init__(self, llm, store=None, engine=None):
         self.llm = llm
-        self.consumption_data = pd.read_csv('data/consumption_logs.csv')
-        self.outage_data = pd.read_csv('data/outage_reports.csv')
+        self.store = store or get_store()
+        self.engine = engine or get_engine()
+    
+    @property
+    def consumption_data(self) -> pd.DataFrame:
+        return self.store.consumption
+    
+    @property
+    def outage_data(self) -> pd.DataFrame:
+        return self.store.outages
+    
+    @traced
+    def generate_summary(self, *, region=None, start=None, end=None) -> str:
+        peak = self.engine.peak_demand(region, start, end)
+        if peak is None:
+            return NO_DATA
+        outage_summary = self.analyze_outages_by_region(region=region, start=start, end=end)
+        return f"Summary Report:\n- Peak Demand: {peak['demand_mw']} MW on {peak['date']:%Y-%m-%d}\n- Outages: {outage_summary}"
     
-    def generate_summary(self) -> str:
-        peak_row = self.consumption_data.loc[self.consumption_data['demand_mw'].idxmax()]
-        outage_summary = self.analyze_outages_by_region()
-        return f"Summary Report:\n- Peak Demand: {peak_row['demand_mw']} MW on {peak_row['date']}\n- Outages: {outage_summary}"
+    @traced
+    def create_demand_plot(self, *, region=None, start=None, end=None) -> str:
+        from core.reports import REPORT_DIR, report_name, run_reports
+        label = ' to '.join(f"{pd.Timestamp(d):%Y-%m-%d}" for d in (start, end) if d is not None) or None
+        spec = {'region': region, 'start': start, 'end': end, 'label': label}
+        # Unchanged data re-uses the previous file; see run_reports
+        stats = run_reports([spec], REPORT_DIR, workers=1, store=self.store)
+        if stats['empty']:
+            return NO_DATA
+        return f"Demand plot saved as '{os.path.join(REPORT_DIR, report_name(spec))}.html'"
     
-    def create_demand_plot(self) -> str:
-        fig = px.line(self.consumption_data, x='date', y='demand_mw', 
-                     color='region', title='Demand Trends')
-        fig.write_html('demand_plot.html')
-        return "Demand plot saved as 'demand_plot.html'"
+    def insights_prompt(self, region=None, start=None, end=None):
+        stats = self.engine.summary(region, start, end)
+        if not stats['records']:
+            return None
+        peak = self.engine.peak_demand(region, start, end)
+        gap = self.engine.demand_supply_gap(region, start, end)
+        causes = self.engine.outage_breakdown('cause', region, start, end)
+        period = ' to '.join(f"{pd.Timestamp(d):%Y-%m-%d}" for d in (start, end) if d is not None) or "all dates"
+        figures = [
+            f"Scope: {region if region not in (None, 'All') else 'all regions'}, {period}",
+            f"Readings: {stats['records']:,}; average demand {stats['avg_demand']:,.0f} MW; "
+            f"peak demand {peak['demand_mw']:,} MW in {peak['region']} on {peak['date']:%Y-%m-%d}",
+            "Supply minus demand by region (MW): " + "; ".join(
+                f"{row.Index} mean {row.mean:,.0f}, min {row.min:,.0f}" for row in gap.itertuples()),
+            f"Outages: {stats['total_outages']:,} totalling {stats['total_outage_hours']:,} hours",
+        ]
+        if not causes.empty:
+            figures.append("Outage hours by cause: " + "; ".join(
+                f"{row.Index} {row.total_hours:,}" for row in causes.sort_values('total_hours', ascending=False).itertuples()))
+        return ("You are an analyst for an electricity grid operator. Using only the figures below, "
+                "give three short observations and one recommendation.\n\n" + "\n".join(figures))
+
+    @traced
+    def stream_insights(self, *, region=None, start=None, end=None):
+        """Model commentary on the figures for the filters, yielded as it is generated."""
+        prompt = self.insights_prompt(region, start, end)
+        if prompt is None:
+            yield NO_DATA
+            return
+        version = (self.store.version('consumption'), self.store.version('outages'))
+        try:
+            yield from self.llm.stream(prompt, version=version)
+        except Exception:
+            yield LLM_UNAVAILABLE
+
+    @traced
+    def generate_insights(self, *, region=None, start=None, end=None) -> str:
+        return "".join(self.stream_insights(region=region, start=start, end=end))
     
-    def analyze_outages_by_region(self) -> str:
-        summary = {}
-        for _, row in self.outage_data.iterrows():
-            region = row['region']
-            if region not in summary:
-                summary[region] = {'count': 0, 'hours': 0}
-            summary[region]['count'] += 1
-            summary[region]['hours'] += row['duration_hours']
-        
-        result = []
-        for region, data in summary.items():
-            result.append(f"{region}: {data['count']} outages, {data['hours']} hrs")
-        return ". ".join(result)
+    @traced
+    def analyze_outages_by_region(self, *, region=None, start=None, end=None) -> str:
+        breakdown = self.engine.outage_breakdown('region', region, start, end)
+        if breakdown.empty:
+            return NO_OUTAGE_DATA
+        return describe_outages_by_region(breakdown)
     
     def get_tools(self):
+        from langchain.tools import Tool
         return [
             Tool(
                 name="generate_summary",
@@ -44,5 +98,10 @@ class ReportAgent:
                 name="create_plot",
                 func=self.create_demand_plot,
                 description="Create demand visualization"
+            ),
+            Tool(
+                name="generate_insights",
+                func=self.generate_insights,
+                description="Explain the demand, supply and outage figures with a recommendation"
             )
         ]
\ No newline at end of file
@@ -0,0 +1,213 @@
+# batch.py
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from core.parallel import pool_context
+from main import INTENT_OPTIONS, EnergyManagementSystem
+
+CHUNKS_PER_WORKER = 4
+OPTION_NAMES = sorted({name for names in INTENT_OPTIONS.values() for name in names})
+
+
+def parse_percentiles(value) -> tuple:
+    # A list, a single number or a comma-separated string such as "95,99"
+    values = value.split(',') if isinstance(value, str) else value if isinstance(value, (list, tuple)) else [value]
+    percentiles = tuple(sorted(float(p) for p in values))
+    if not percentiles or not all(0 <= p <= 100 for p in percentiles):
+        raise ValueError(f"percentiles must be between 0 and 100, got {value!r}")
+    return percentiles
+
+
+# Parse option values given in JSON query lines
+OPTION_TYPES = {
+    'days': int,
+    'percentiles': parse_percentiles,
+    'text': str,
+}
+
+_system = None
+
+
+def _init_worker(system=None):
+    # Forked workers inherit the parent's loaded system; spawned ones load their own
+    global _system
+    _system = system or _system or warm_up(EnergyManagementSystem())
+
+
+def warm_up(system):
+    system.store.consumption, system.store.outages
+    system.store.index('consumption'), system.store.index('outages')
+    if hasattr(system.engine, 'cube'):
+        system.engine.cube(), system.engine.sketches()
+    return system
+
+
+def _run_task(task):
+    # A failing query becomes an error result instead of ending the batch
+    intent, region, start, end, options = task
+    started = time.perf_counter()
+    try:
+        answer, error = _system.answer(intent, region, start, end, **dict(options)), None
+    except Exception as e:
+        answer, error = None, f"{type(e).__name__}: {e}"
+    return answer, time.perf_counter() - started, error
+
+
+def _run_chunk(chunk):
+    return [_run_task(task) for task in chunk]
+
+
+def parse_query(line: str) -> dict:
+    # Lines opening like JSON must be an object with a text ``query``; anything else is the query text
+    if not line.startswith(('{', '[')):
+        return {'query': line}
+    try:
+        item = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"invalid JSON ({e})")
+    if not isinstance(item, dict):
+        raise TypeError(f"expected a JSON object, got {type(item).__name__}")
+    if 'query' not in item:
+        raise ValueError("missing 'query'")
+    if not isinstance(item['query'], str):
+        raise TypeError(f"'query' must be a string, got {type(item['query']).__name__}")
+    return item
+
+
+def read_queries(path: str) -> tuple:
+    """Queries from a file: JSON objects per line, or plain query text per line.
+
+    JSON lines hold ``query`` and optionally ``id``, ``region``, ``start``,
+    ``end``, ``days``, ``percentiles`` and ``text``; explicit filters
+    override those found in the query text. Returns the queries and the
+    lines that could not be read, each with its error message.
+    """
+    queries, invalid = [], []
+    with (sys.stdin if path == '-' else open(path)) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                item = parse_query(line)
+            except (TypeError, ValueError) as e:
+                invalid.append(({'line': number}, f"{type(e).__name__}: {e}"))
+                continue
+            item['line'] = number
+            queries.append(item)
+    return queries, invalid
+
+
+def plan(system, queries: list) -> tuple:
+    """Route every query and group identical (intent, region, start, end, options) work.
+
+    Returns the grouped tasks and the lines whose filters or options could
+    not be parsed, each with its error message.
+    """
+    tasks, invalid = {}, []
+    for item in queries:
+        route = system.router.route(item['query'])
+        region = item.get('region', route['region'])
+        try:
+            start = pd.Timestamp(item['start']) if item.get('start') else route['start']
+            end = pd.Timestamp(item['end']) if item.get('end') else route['end']
+            options = tuple((name, OPTION_TYPES[name](item[name]) if item.get(name) else route[name])
+                            for name in INTENT_OPTIONS.get(route['intent'], ()))
+        except (TypeError, ValueError) as e:
+            invalid.append((item, f"{type(e).__name__}: {e}"))
+            continue
+        key = (route['intent'], None if region == 'All' else region, start, end, options)
+        tasks.setdefault(key, []).append(item)
+    return tasks, invalid
+
+
+def error_record(item, error: str) -> dict:
+    record = {'line': item['line']}
+    if 'id' in item:
+        record['id'] = item['id']
+    if 'query' in item:
+        record['query'] = item['query']
+    record.update({'answer': None, 'error': error})
+    return record
+
+
+def result_records(task, items, answer, seconds, error=None):
+    intent, region, start, end, options = task
+    options = {name: dict(options).get(name) for name in OPTION_NAMES}
+    for name, value in options.items():
+        if isinstance(value, tuple):
+            options[name] = list(value)
+    for n, item in enumerate(items):
+        record = {'line': item['line']}
+        if 'id' in item:
+            record['id'] = item['id']
+        record.update({
+            'query': item.get('query', ''),
+            'intent': intent,
+            'region': region,
+            'start': start.date().isoformat() if start is not None else None,
+            'end': end.date().isoformat() if end is not None else None,
+            **options,
+            'answer': answer,
+            'seconds': seconds,
+            'deduplicated': n > 0,
+        })
+        if error is not None:
+            record['error'] = error
+        yield record
+
+
+def run_batch(path: str, output=None, workers=None) -> dict:
+    """Answer every query in ``path``, writing one JSON result per line as tasks finish.
+
+    Routing and the data load happen once in this process; identical tasks
+    are answered once. Workers are forked after the load so they share the
+    parsed frames and aggregates instead of each reading the files; from a
+    multithreaded host they are started cleanly and load their own.
+    """
+    started = time.perf_counter()
+    system = warm_up(EnergyManagementSystem())
+    queries, unreadable = read_queries(path)
+    tasks, invalid = plan(system, queries)
+    invalid = sorted(unreadable + invalid, key=lambda pair: pair[0]['line'])
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    out = sys.stdout if output in (None, '-') else open(output, 'w')
+
+    def emit(task, answer, seconds, error=None):
+        for record in result_records(task, tasks[task], answer, seconds, error):
+            out.write(json.dumps(record) + '\n')
+        out.flush()
+
+    try:
+        for item, error in invalid:
+            out.write(json.dumps(error_record(item, error)) + '\n')
+        if workers == 1:
+            _init_worker(system)
+            for task in tasks:
+                emit(task, *_run_task(task))
+        else:
+            global _system
+            _system = system
+            # Several chunks per worker keep them busy without paying IPC per query
+            order = list(tasks)
+            size = max(1, -(-len(order) // (workers * CHUNKS_PER_WORKER)))
+            chunks = [order[i:i + size] for i in range(0, len(order), size)]
+            with ProcessPoolExecutor(workers, mp_context=pool_context(), initializer=_init_worker) as pool:
+                futures = {pool.submit(_run_chunk, chunk): chunk for chunk in chunks}
+                for future in as_completed(futures):
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        # The worker itself failed (e.g. was killed): every task in the chunk gets the error
+                        results = [(None, 0.0, f"{type(e).__name__}: {e}")] * len(futures[future])
+                    for task, result in zip(futures[future], results):
+                        emit(task, *result)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    return {'queries': len(queries) + len(unreadable), 'unique': len(tasks), 'invalid': len(invalid), 'workers': workers,
+            'seconds': time.perf_counter() - started}
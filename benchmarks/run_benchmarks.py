@@ -0,0 +1,284 @@
+# benchmarks/run_benchmarks.py
+"""Time the query paths at several data scales.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --scales 1 10 50 --output bench.json
+    python -m benchmarks.run_benchmarks --scales 1 10 50 --compare bench.json
+
+Each scale factor runs in its own interpreter so peak memory is measured per
+scale. Generated datasets are kept under --data-dir and reused on later runs.
+The LLM gateway is timed against FakeLLM, and the run fails if it lets
+duplicate prompts reach the model, exceeds its concurrency limit or streams
+a different answer than the model gave.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', '.data')
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def timed(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {'min': min(samples), 'median': statistics.median(samples), 'runs': repeat}
+
+
+def llm_gateway_check(prompts=8, duplicates=4, max_concurrent=2):
+    """Ask every prompt ``duplicates`` times at once through LLMGateway on FakeLLM."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from core.llm import FakeLLM, LLMGateway
+
+    model = FakeLLM(delay=0.001)
+    gateway = LLMGateway(model=model, max_concurrent=max_concurrent)
+    texts = [f'benchmark prompt {i}' for i in range(prompts)] * duplicates
+    start = threading.Barrier(len(texts))
+
+    def ask(prompt):
+        start.wait()
+        return gateway.invoke(prompt)
+
+    with ThreadPoolExecutor(len(texts)) as pool:
+        answers = list(pool.map(ask, texts))
+    streamed = list(gateway.stream('benchmark stream prompt'))
+    problems = []
+    if answers != [FakeLLM().invoke(prompt) for prompt in texts]:
+        problems.append('invoke returned another prompt\'s answer')
+    if model.calls != prompts + 1 or gateway.coalesced == 0:
+        problems.append(f'{model.calls} model calls and {gateway.coalesced} coalesced for {prompts + 1} distinct prompts')
+    if model.peak > max_concurrent:
+        problems.append(f'{model.peak} concurrent model calls with a limit of {max_concurrent}')
+    if len(streamed) < 2 or ''.join(streamed) != FakeLLM().invoke('benchmark stream prompt'):
+        problems.append(f'stream yielded {streamed!r}')
+    if problems:
+        raise RuntimeError(f"LLM gateway: {'; '.join(problems)}")
+
+
+def dataset_dir(data_dir: str, scale: int, years: float, granularity: str) -> str:
+    return os.path.join(data_dir, f'sf{scale}-{years:g}y-{granularity}')
+
+
+def ensure_dataset(data_dir: str, scale: int, years: float, granularity: str) -> str:
+    from data.generate_data import generate
+
+    path = dataset_dir(data_dir, scale, years, granularity)
+    if not os.path.exists(os.path.join(path, 'outage_reports.csv')):
+        shutil.rmtree(path, ignore_errors=True)
+        generate(path, regions=4 * scale, years=years, granularity=granularity, verbose=False)
+    return path
+
+
+def run_scale(args) -> dict:
+    """Benchmark one scale factor inside this process."""
+    path = ensure_dataset(args.data_dir, args.worker, args.years, args.granularity)
+    consumption_csv = os.path.join(path, 'consumption_logs.csv')
+    outage_csv = os.path.join(path, 'outage_reports.csv')
+    results = {}
+
+    results['cli_import'] = timed(lambda: subprocess.run([sys.executable, '-c', 'import main'], cwd=ROOT, check=True), 1)
+
+    from core.data_store import DataStore
+    from core.query_engine import BACKENDS
+    from agents.data_agent import DataAgent
+    from agents.analysis_agent import AnalysisAgent
+    from agents.report_agent import ReportAgent
+
+    cache_dir = tempfile.mkdtemp(prefix='ems-bench-cache-')
+    workdir = tempfile.mkdtemp(prefix='ems-bench-out-')
+    try:
+        def cold_load():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            store = DataStore(consumption_csv, outage_csv, cache_dir)
+            store.consumption, store.outages
+
+        def warm_load():
+            store = DataStore(consumption_csv, outage_csv, cache_dir)
+            store.consumption, store.outages
+
+        results['load_cold'] = timed(cold_load, 1)
+        results['load_warm'] = timed(warm_load, args.repeat)
+
+        store = DataStore(consumption_csv, outage_csv, cache_dir)
+        rows = len(store.consumption)
+        outage_rows = len(store.outages)
+        rss_after_load = peak_rss_mb()
+
+        def startup():
+            engine = BACKENDS[args.backend](store)
+            agents = (DataAgent(None, store, engine), AnalysisAgent(None, store, engine), ReportAgent(None, store, engine))
+            agents[0].get_peak_demand()
+            return agents
+
+        if args.backend == 'pandas':
+            # Full rebuild of the rollup cube, in EMS_WORKERS processes for large data
+            from core.parallel import build_cube
+            results['build_cube'] = timed(lambda: build_cube(store.consumption), 1)
+
+        results['startup_first_query'] = timed(startup, 1)
+        data_agent, analysis_agent, report_agent = startup()
+
+        paths = {
+            'get_peak_demand': data_agent.get_peak_demand,
+            'analyze_outages_by_region': analysis_agent.analyze_outages_by_region,
+            'analyze_demand_supply_gap': analysis_agent.analyze_demand_supply_gap,
+            'generate_summary': report_agent.generate_summary,
+        }
+        for name, func in paths.items():
+            results[name] = timed(func, args.repeat)
+
+        consumption = store.consumption
+        lo, hi = consumption['date'].min(), consumption['date'].max()
+        mid = lo + (hi - lo) / 2
+        region = consumption['region'].iloc[0]
+
+        def dashboard_filter():
+            store.select('consumption', region, lo, mid)
+            store.select('outages', region, lo, mid)
+
+        results['dashboard_filter'] = timed(dashboard_filter, args.repeat)
+        results['llm_gateway'] = timed(llm_gateway_check, args.repeat)
+
+        if not args.skip_plot:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                results['create_demand_plot'] = timed(report_agent.create_demand_plot, 1)
+            finally:
+                os.chdir(cwd)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'scale': args.worker,
+        'rows': rows,
+        'outage_rows': outage_rows,
+        'rss_after_load_mb': rss_after_load,
+        'peak_rss_mb': peak_rss_mb(),
+        'timings': results,
+    }
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip()
+    except OSError:
+        return ''
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    old = {r['scale']: r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'scale':>6} {'metric':<28} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in current['results']:
+        before = old.get(result['scale'])
+        if before is None:
+            continue
+        for metric, timing in result['timings'].items():
+            if metric not in before['timings']:
+                continue
+            was, now = before['timings'][metric]['min'], timing['min']
+            change = (now - was) / was if was > 0 else 0.0
+            flag = ' !' if change > threshold else ''
+            print(f"{result['scale']:>6} {metric:<28} {was:>10.4f} {now:>10.4f} {change:>+7.0%}{flag}")
+            if flag:
+                regressions.append((result['scale'], metric, change))
+        was, now = before['peak_rss_mb'], result['peak_rss_mb']
+        change = (now - was) / was if was > 0 else 0.0
+        flag = ' !' if change > threshold else ''
+        print(f"{result['scale']:>6} {'peak_rss_mb':<28} {was:>10.1f} {now:>10.1f} {change:>+7.0%}{flag}")
+        if flag:
+            regressions.append((result['scale'], 'peak_rss_mb', change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the energy management query paths.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 50], help='scale factors (x4 regions)')
+    parser.add_argument('--years', type=float, default=1.0)
+    parser.add_argument('--granularity', choices=['daily', 'hourly'], default='daily')
+    parser.add_argument('--backend', choices=['pandas', 'duckdb'], default='pandas')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per timing (min and median are reported)')
+    parser.add_argument('--workers', type=int, help='processes for aggregate builds (sets EMS_WORKERS; default: CPU count)')
+    parser.add_argument('--skip-plot', action='store_true', help='skip create_demand_plot')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as a regression')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        json.dump(run_scale(args), sys.stdout)
+        return
+
+    results = []
+    for scale in args.scales:
+        cmd = [sys.executable, '-m', 'benchmarks.run_benchmarks', '--worker', str(scale),
+               '--years', str(args.years), '--granularity', args.granularity, '--backend', args.backend,
+               '--repeat', str(args.repeat), '--data-dir', args.data_dir]
+        if args.skip_plot:
+            cmd.append('--skip-plot')
+        env = dict(os.environ, EMS_WORKERS=str(args.workers)) if args.workers else None
+        out = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, env=env)
+        if out.returncode != 0:
+            sys.stderr.write(out.stderr)
+            sys.exit(out.returncode)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"scale {scale}: {result['rows']:,} rows, peak RSS {result['peak_rss_mb']:.0f} MB")
+        for metric, timing in result['timings'].items():
+            print(f"  {metric:<28} {timing['min'] * 1000:>10.2f} ms (median {timing['median'] * 1000:.2f} ms)")
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'years': args.years,
+            'granularity': args.granularity,
+            'workers': args.workers or os.cpu_count(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
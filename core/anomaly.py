@@ -0,0 +1,220 @@
+# core/anomaly.py
+import collections
+import threading
+import time
+import numpy as np
+import pandas as pd
+from core.data_store import get_store
+
+# EWMA span in readings; alpha = 2 / (span + 1)
+EWMA_SPAN = 30
+Z_THRESHOLD = 3.0
+# Readings a region needs before its z-scores are trusted
+WARMUP = 10
+# Consecutive readings with supply below demand that raise a deficit alert
+DEFICIT_RUN = 1
+MAX_ALERTS = 1000
+
+SCORE_COLUMNS = ('mean', 'std', 'z', 'deficit_run', 'spike', 'deficit_alert')
+
+
+def _new_region() -> dict:
+    return {'n': 0, 'mean': 0.0, 'var': 0.0, 'run': 0}
+
+
+class StreamingDetector:
+    """Per-region EWMA demand statistics and supply-deficit counters.
+
+    Each reading is scored against the region's exponentially weighted
+    mean and variance *before* it is folded in: a demand spike is a
+    z-score of at least ``z_threshold``, and a deficit alert is raised when
+    ``deficit_run`` consecutive readings have supply below demand. An
+    update is O(1). ``replay`` gives the same scores for a whole history
+    with vectorized EWM passes and leaves the detector ready to continue
+    from the last reading.
+    """
+
+    def __init__(self, span=EWMA_SPAN, z_threshold=Z_THRESHOLD, warmup=WARMUP, deficit_run=DEFICIT_RUN):
+        self.alpha = 2 / (span + 1)
+        self.span = span
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.deficit_run = deficit_run
+        self.regions = {}
+
+    def update(self, region, when, demand, supply) -> tuple:
+        """Score one reading and fold it in; returns (scores, alerts)."""
+        state = self.regions.get(region)
+        if state is None:
+            state = self.regions[region] = _new_region()
+        mean, std, z = state['mean'], state['var'] ** 0.5, float('nan')
+        if state['n'] == 0:
+            state['mean'] = float(demand)
+            mean = std = float('nan')
+        else:
+            diff = demand - state['mean']
+            if state['n'] >= self.warmup and std > 0:
+                z = diff / std
+            increment = self.alpha * diff
+            state['mean'] += increment
+            state['var'] = (1 - self.alpha) * (state['var'] + diff * increment)
+        state['n'] += 1
+        state['run'] = state['run'] + 1 if supply < demand else 0
+        scores = (mean, std, z, state['run'], z >= self.z_threshold, state['run'] == self.deficit_run)
+        return scores, self._alerts(region, when, demand, supply, scores)
+
+    def feed(self, rows: pd.DataFrame) -> tuple:
+        """Score newly arrived readings one at a time, in arrival order."""
+        columns = [rows['region'].tolist(), rows['date'].tolist(),
+                   rows['demand_mw'].tolist(), rows['supply_mw'].tolist()]
+        scores, alerts = [], []
+        for reading in zip(*columns):
+            row_scores, row_alerts = self.update(*reading)
+            scores.append(row_scores)
+            alerts.extend(row_alerts)
+        return self._frame(scores, rows.index), alerts
+
+    def replay(self, consumption: pd.DataFrame) -> pd.DataFrame:
+        """Score a history from scratch without a per-row loop.
+
+        Readings are taken in date order per region. The EWMA recurrences
+        mean' = mean + a*d and var' = (1-a)*(var + a*d^2) are both
+        first-order linear filters, so each is one ``ewm(adjust=False)``
+        pass. The detector's state afterwards is that of the last reading.
+        """
+        a = self.alpha
+        n = len(consumption)
+        out = {
+            'mean': np.full(n, np.nan), 'std': np.full(n, np.nan), 'z': np.full(n, np.nan),
+            'deficit_run': np.zeros(n, dtype=np.int64),
+        }
+        times = consumption['date'].to_numpy()
+        demand = consumption['demand_mw'].to_numpy(dtype=np.float64)
+        deficit = (consumption['supply_mw'].to_numpy() < consumption['demand_mw'].to_numpy())
+        self.regions = {}
+        for region, rows in consumption.groupby('region', sort=False, observed=True).indices.items():
+            rows = rows[np.argsort(times[rows], kind='stable')]
+            x = demand[rows]
+            mean = pd.Series(x).ewm(alpha=a, adjust=False).mean().to_numpy()
+            prior_mean = np.concatenate(([np.nan], mean[:-1]))
+            diff = np.concatenate(([0.0], x[1:] - mean[:-1]))
+            var = pd.Series((1 - a) * diff ** 2).ewm(alpha=a, adjust=False).mean().to_numpy()
+            prior_std = np.concatenate(([np.nan], np.sqrt(var[:-1])))
+            trusted = (np.arange(len(x)) >= self.warmup) & (prior_std > 0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                z = np.where(trusted, diff / prior_std, np.nan)
+            # Run length of consecutive deficits: count since the last non-deficit reading
+            flags = deficit[rows]
+            count = np.cumsum(flags)
+            run = count - np.maximum.accumulate(np.where(flags, 0, count))
+            out['mean'][rows], out['std'][rows], out['z'][rows], out['deficit_run'][rows] = prior_mean, prior_std, z, run
+            self.regions[region] = {'n': len(x), 'mean': float(mean[-1]), 'var': float(var[-1]), 'run': int(run[-1])}
+        with np.errstate(invalid='ignore'):
+            out['spike'] = out['z'] >= self.z_threshold
+        out['deficit_alert'] = out['deficit_run'] == self.deficit_run
+        return pd.DataFrame(out, index=consumption.index)
+
+    def alerts_from(self, consumption: pd.DataFrame, scores: pd.DataFrame) -> list:
+        """Alerts for scored rows, as ``update`` would have raised them."""
+        flagged = scores.index[scores['spike'] | scores['deficit_alert']]
+        rows = consumption.loc[flagged]
+        alerts = []
+        for reading, row_scores in zip(zip(rows['region'], rows['date'], rows['demand_mw'], rows['supply_mw']),
+                                       scores.loc[flagged, list(SCORE_COLUMNS)].itertuples(index=False)):
+            alerts.extend(self._alerts(*reading, tuple(row_scores)))
+        return alerts
+
+    def _alerts(self, region, when, demand, supply, scores) -> list:
+        mean, _std, z, run, spike, deficit_alert = scores
+        alerts = []
+        if spike:
+            alerts.append({'kind': 'spike', 'region': region, 'date': when, 'demand_mw': demand, 'supply_mw': supply,
+                           'expected_mw': mean, 'z': z})
+        if deficit_alert:
+            alerts.append({'kind': 'deficit', 'region': region, 'date': when, 'demand_mw': demand, 'supply_mw': supply,
+                           'shortfall_mw': demand - supply, 'run': run})
+        return alerts
+
+    @staticmethod
+    def _frame(scores: list, index) -> pd.DataFrame:
+        frame = pd.DataFrame(scores, columns=list(SCORE_COLUMNS), index=index)
+        return frame.astype({'mean': np.float64, 'std': np.float64, 'z': np.float64,
+                             'deficit_run': np.int64, 'spike': bool, 'deficit_alert': bool})
+
+
+class AnomalyMonitor:
+    """Keeps a StreamingDetector in step with the store's consumption data.
+
+    The first sync (and any full reload) replays the history; after that
+    only appended rows go through the O(1) streaming update, and the
+    alerts they raise are kept in a bounded list of recent alerts. Call
+    ``sync`` from the ingestor so alerts follow each poll.
+    """
+
+    def __init__(self, store=None, detector=None, max_alerts=MAX_ALERTS):
+        self.store = store or get_store()
+        self.detector = detector or StreamingDetector()
+        self.alerts = collections.deque(maxlen=max_alerts)
+        self._scores = []
+        self._version = None
+        self._lock = threading.Lock()
+
+    def sync(self, appended=None) -> list:
+        """Score rows added since the last sync; returns the new alerts."""
+        with self._lock:
+            version = self.store.version('consumption')
+            if self._version == version:
+                return []
+            frame = self.store.consumption
+            alerts = []
+            if self._version is None or self._version[0] != version[0] or version[1] < self._version[1]:
+                self._scores = [self.detector.replay(frame)]
+            else:
+                scores, alerts = self.detector.feed(frame.iloc[self._version[1]:])
+                self._scores.append(scores)
+                detected = time.time()
+                for alert in alerts:
+                    alert['detected_at'] = detected
+                self.alerts.extend(alerts)
+            self._version = version
+            return alerts
+
+    def scores(self) -> pd.DataFrame:
+        """Scores for every consumption row, indexed like the store's frame."""
+        self.sync()
+        with self._lock:
+            if len(self._scores) > 1:
+                self._scores = [pd.concat(self._scores)]
+            return self._scores[0]
+
+    def scan(self, region=None, start=None, end=None) -> tuple:
+        """Readings for the filters with their scores, and the alerts among them."""
+        scores = self.scores()
+        readings = self.store.select('consumption', region, start, end)
+        selected = scores.loc[readings.index]
+        return readings, selected, self.detector.alerts_from(readings, selected)
+
+    def recent_alerts(self, limit=None, region=None) -> list:
+        alerts = [a for a in self.alerts if region in (None, 'All') or a['region'] == region]
+        return alerts[-limit:] if limit else alerts
+
+
+def describe_alert(alert: dict) -> str:
+    when = pd.Timestamp(alert['date']).strftime('%Y-%m-%d %H:%M')
+    if alert['kind'] == 'spike':
+        return (f"{when} {alert['region']}: demand spike {alert['demand_mw']:,} MW "
+                f"(expected {alert['expected_mw']:,.0f} MW, z {alert['z']:.1f})")
+    return (f"{when} {alert['region']}: supply deficit {alert['shortfall_mw']:,} MW "
+            f"(demand {alert['demand_mw']:,} MW, supply {alert['supply_mw']:,} MW)")
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor() -> AnomalyMonitor:
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = AnomalyMonitor()
+        return _monitor
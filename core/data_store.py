@@ -0,0 +1,220 @@
+# core/data_store.py
+import io
+import json
+import os
+import threading
+import pandas as pd
+from core.frame_index import FrameIndex
+from core.schema import apply_schema, concat_rows
+from core.telemetry import span
+
+try:
+    import pyarrow
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+CONSUMPTION_PATH = 'data/consumption_logs.csv'
+OUTAGE_PATH = 'data/outage_reports.csv'
+CACHE_DIR = 'data/.cache'
+FINGERPRINT_BYTES = 64
+# Parquet key-value metadata naming the CSV bytes a mirror was built from
+MIRROR_KEY = b'ems_source'
+
+
+class DataStore:
+    """Loads each dataset once and hands out read-only views of it.
+
+    CSVs are parsed on first use, cast to the declared schema (see
+    core.schema) and mirrored to a Parquet cache under ``cache_dir``;
+    later loads read the cache while the CSV still has the mtime recorded
+    in the mirror's metadata. A partially written last line is left
+    unparsed until it is complete.
+    Rows appended to a CSV are parsed on their own and added to the loaded
+    frame, so only rewritten files trigger a full reload.
+    """
+
+    def __init__(self, consumption_path=CONSUMPTION_PATH, outage_path=OUTAGE_PATH, cache_dir=CACHE_DIR):
+        self.paths = {'consumption': consumption_path, 'outages': outage_path}
+        self.cache_dir = cache_dir
+        self._frames = {}
+        self._files = {}
+        self._generations = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+
+    @property
+    def consumption(self) -> pd.DataFrame:
+        return self.get('consumption')
+
+    @property
+    def outages(self) -> pd.DataFrame:
+        return self.get('outages')
+
+    def get(self, name: str) -> pd.DataFrame:
+        # A shallow copy shares the column buffers but keeps callers that add
+        # or reassign columns from leaking changes into the shared frame.
+        return self._frame(name).copy(deep=False)
+
+    def version(self, name: str) -> tuple:
+        # (generation, rows): the generation changes on a full reload, the
+        # row count grows on appends, so frame.iloc[rows:] is always the delta.
+        frame = self._frame(name)
+        return self._generations[name], len(frame)
+
+    def select(self, name: str, region=None, start=None, end=None) -> pd.DataFrame:
+        # Zero-copy slice of the rows for one region (or 'All') and whole-day
+        # date range, in date order; see FrameIndex.
+        with span(f'data.select.{name}'):
+            return self.index(name).select(region, start, end)
+
+    def index(self, name: str) -> FrameIndex:
+        with self._index_lock:
+            frame = self._frame(name)
+            generation = self._generations[name]
+            entry = self._indexes.get(name)
+            if entry is None or entry[0] != generation or (entry[1].rows != len(frame) and not entry[1].append(frame)):
+                with span(f'data.index.{name}'):
+                    entry = (generation, FrameIndex(frame))
+                self._indexes[name] = entry
+            return entry[1]
+
+    def snapshot(self, name: str) -> dict:
+        # Identifies the parsed prefix of the source file across processes:
+        # a file that still starts with these bytes holds the same first rows.
+        self._frame(name)
+        with self._lock:
+            known = self._files[name]
+            return {'path': os.path.abspath(self.paths[name]), 'size': known['size'],
+                    'tail': known['tail'], 'rows': len(self._frames[name])}
+
+    def extends(self, name: str, snapshot: dict) -> bool:
+        current = self.snapshot(name)
+        return (current['path'] == snapshot['path'] and current['rows'] >= snapshot['rows']
+                and current['size'] >= snapshot['size']
+                and self._fingerprint(self.paths[name], snapshot['size']) == snapshot['tail'])
+
+    def refresh(self, name: str = None) -> dict:
+        names = [name] if name else list(self.paths)
+        before = {n: self._frames.get(n) for n in names}
+        after = {n: self._frame(n) for n in names}
+        return {n: len(after[n]) - (len(before[n]) if before[n] is not None else 0) for n in names}
+
+    def source_path(self, name: str) -> str:
+        # File for out-of-core readers: the Parquet mirror when it is current,
+        # otherwise the CSV itself.
+        path = self.paths[name]
+        cache_path = self._cache_path(path)
+        stat = os.stat(path)
+        if self._mirror_size(cache_path, stat.st_mtime_ns, stat.st_size) is not None:
+            return cache_path
+        return path
+
+    def _frame(self, name: str) -> pd.DataFrame:
+        path = self.paths[name]
+        stat = os.stat(path)
+        with self._lock:
+            known = self._files.get(name)
+            if known is None or known['mtime'] != stat.st_mtime_ns:
+                if known is not None and stat.st_size > known['size'] and self._fingerprint(path, known['size']) == known['tail']:
+                    with span(f'data.append.{name}'):
+                        self._append_tail(name, path, known)
+                else:
+                    with span(f'data.load.{name}'):
+                        self._frames[name], size = self._read(name, path, stat.st_mtime_ns, stat.st_size)
+                    # Without the mtime the next call reads on from `size` once the last line is complete
+                    self._files[name] = self._file_state(path, stat.st_mtime_ns if size == stat.st_size else None, size)
+                    self._generations[name] = self._generations.get(name, 0) + 1
+            return self._frames[name]
+
+    def _append_tail(self, name: str, path: str, known: dict):
+        with open(path, 'rb') as f:
+            f.seek(known['size'])
+            data = f.read()
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+        # Leave a partially written last line for the next refresh.
+        complete = data.rfind(b'\n') + 1
+        if complete > 0:
+            frame = self._frames[name]
+            # The file's own header: the frame may also hold derived columns
+            new_rows = pd.read_csv(io.BytesIO(data[:complete]), header=None, names=list(pd.read_csv(path, nrows=0).columns))
+            if len(new_rows) > 0:
+                self._frames[name] = concat_rows(frame, apply_schema(new_rows, name))
+        self._files[name] = self._file_state(path, mtime if complete == len(data) else known['mtime'], known['size'] + complete)
+
+    def _file_state(self, path: str, mtime: int, size: int) -> dict:
+        return {'mtime': mtime, 'size': size, 'tail': self._fingerprint(path, size)}
+
+    @staticmethod
+    def _fingerprint(path: str, size: int) -> bytes:
+        # The bytes just before `size`; if they still match, everything after
+        # them was appended rather than the file being rewritten.
+        with open(path, 'rb') as f:
+            f.seek(max(0, size - FINGERPRINT_BYTES))
+            return f.read(min(size, FINGERPRINT_BYTES))
+
+    def _cache_path(self, path: str) -> str:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, f"{stem}.parquet")
+
+    @staticmethod
+    def _mirror_size(cache_path: str, mtime: int, size: int):
+        # A mirror is only as current as the CSV bytes it was parsed from; its
+        # own mtime says nothing about rows appended while it was being written.
+        # Returns how many of the file's bytes it holds, or None if it is stale.
+        if not HAS_PARQUET or not os.path.exists(cache_path):
+            return None
+        import pyarrow.parquet as pq
+        try:
+            metadata = pq.read_schema(cache_path).metadata or {}
+            source = json.loads(metadata.get(MIRROR_KEY, b'{}'))
+            if source.get('mtime') == mtime and 0 <= source.get('size', -1) <= size:
+                return source['size']
+        except (OSError, ValueError, TypeError, pyarrow.ArrowException):
+            pass
+        return None
+
+    def _read(self, name: str, path: str, mtime: int, size: int) -> tuple:
+        # The frame and how many bytes of the file it was parsed from
+        cache_path = self._cache_path(path)
+        parsed = self._mirror_size(cache_path, mtime, size)
+        if parsed is not None:
+            try:
+                # A no-op for mirrors written with the current schema
+                return apply_schema(pd.read_parquet(cache_path), name), parsed
+            except Exception:
+                pass
+
+        # Parse only the bytes that were stat'ed so rows appended meanwhile
+        # are picked up by the next tail read instead of being counted twice,
+        # and, as in _append_tail, leave a partially written last line for it.
+        with open(path, 'rb') as f:
+            data = f.read(size)
+        parsed = data.rfind(b'\n') + 1 or len(data)
+        df = apply_schema(pd.read_csv(io.BytesIO(data[:parsed])), name)
+        if HAS_PARQUET:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                import pyarrow.parquet as pq
+                table = pyarrow.Table.from_pandas(df, preserve_index=False)
+                source = json.dumps({'mtime': mtime, 'size': parsed}).encode()
+                table = table.replace_schema_metadata({**(table.schema.metadata or {}), MIRROR_KEY: source})
+                tmp_path = f"{cache_path}.tmp"
+                pq.write_table(table, tmp_path)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                pass
+        return df, parsed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> DataStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DataStore()
+        return _store
@@ -0,0 +1,102 @@
+# core/downsample.py
+import os
+import numpy as np
+import pandas as pd
+from core.telemetry import traced
+
+# Points kept per series; roughly two per horizontal pixel of a wide chart
+MAX_POINTS = int(os.environ.get('EMS_CHART_POINTS', 2000))
+METHOD = os.environ.get('EMS_CHART_DOWNSAMPLE', 'minmax')
+# Above this many points a figure is drawn with WebGL (Scattergl) instead of SVG
+WEBGL_POINTS = 1000
+
+
+def minmax_indices(y, n_out: int) -> np.ndarray:
+    """Indices of the first, last, and min and max of each of n_out/2 equal-count buckets."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    buckets = max(1, n_out // 2)
+    if n <= max(n_out, 2):
+        return np.arange(n)
+    starts = np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+    sizes = np.diff(np.append(starts, n))
+    bucket = np.repeat(np.arange(buckets), sizes)
+    picked = [np.array([0, n - 1])]
+    for reduce in (np.fmin, np.fmax):
+        extreme = np.repeat(reduce.reduceat(y, starts), sizes)
+        hits = np.flatnonzero(y == extreme)
+        _, first = np.unique(bucket[hits], return_index=True)
+        picked.append(hits[first])
+    return np.unique(np.concatenate(picked))
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: keeps the points that best preserve the line's shape."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Each bucket is compared against the mean of the next one (the last point for the final bucket)
+    counts = np.diff(edges)
+    finite = np.isfinite(y[1:n - 1])
+    mean_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(np.where(finite, y[1:n - 1], 0.0), edges[:-1] - 1)
+                       / np.maximum(np.add.reduceat(finite, edges[:-1] - 1), 1), y[-1])
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        xc, yc = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((x[a] - xc) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (yc - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        out[i + 1] = a
+    return out
+
+
+def _time_values(values) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    return np.asarray(values, dtype=np.float64)
+
+
+def series_indices(x, y, n_out: int, method: str = METHOD) -> np.ndarray:
+    if method == 'lttb':
+        return lttb_indices(x, y, n_out)
+    if method == 'minmax':
+        return minmax_indices(y, n_out)
+    raise ValueError(f"Unknown downsampling method '{method}'; expected 'minmax' or 'lttb'")
+
+
+@traced('chart.downsample')
+def downsample(df: pd.DataFrame, x: str, y, by=None, max_points: int = MAX_POINTS, method: str = METHOD) -> pd.DataFrame:
+    """Reduce each series of ``df`` to about ``max_points`` rows for plotting.
+
+    A series is one ``by`` group ordered by ``x``. With several ``y``
+    columns the budget is shared and the rows chosen for any of them are
+    kept, so every line keeps its own peaks. Frames already within budget
+    are returned unchanged, so narrowing the date range switches back to
+    full resolution.
+    """
+    columns = [y] if isinstance(y, str) else list(y)
+    groups = df.groupby(by, sort=False, observed=True).indices if by is not None else {None: np.arange(len(df))}
+    if all(len(rows) <= max_points for rows in groups.values()):
+        return df
+
+    xs = _time_values(df[x])
+    keep = []
+    for rows in groups.values():
+        if len(rows) <= max_points:
+            keep.append(rows)
+            continue
+        rows = rows[np.argsort(xs[rows], kind='stable')]
+        budget = max(3, max_points // len(columns))
+        chosen = [series_indices(xs[rows], df[col].to_numpy()[rows], budget, method) for col in columns]
+        keep.append(rows[np.unique(np.concatenate(chosen))])
+    return df.iloc[np.sort(np.concatenate(keep))]
+
+
+def use_webgl(points: int) -> bool:
+    return points > WEBGL_POINTS
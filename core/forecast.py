@@ -0,0 +1,205 @@
+# core/forecast.py
+import os
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from core.data_store import get_store
+from core.frame_index import day_bounds
+from core.intervals import DAY_NS, HOUR_NS, infer_step
+
+# Bump when the design matrix changes so cached statistics are refitted
+FEATURE_VERSION = 2
+ANNUAL_HARMONICS = 3
+BASE_TEMPERATURE = 18.0
+TREND_ORIGIN = pd.Timestamp('2020-01-01').value
+RIDGE = 1e-6
+CHUNK_ROWS = 250_000
+DEFAULT_DAYS = 7
+
+
+def design_matrix(times: np.ndarray, temperature: np.ndarray, hourly: bool) -> np.ndarray:
+    """Regressors for readings at ``times`` (int64 ns).
+
+    Intercept, linear trend, weekday dummies, annual Fourier terms,
+    hour-of-day dummies for sub-daily data, and heating/cooling degrees
+    from ``temperature``.
+    """
+    days = times / DAY_NS
+    columns = [np.ones(len(times)), (times - TREND_ORIGIN) / (365.25 * DAY_NS)]
+    # Calendar fields in integer nanoseconds: float day fractions round 02:00 down to 1.999...
+    weekday = (times // DAY_NS + 3) % 7  # 1970-01-01 was a Thursday; Monday = 0
+    columns += [weekday == d for d in range(1, 7)]
+    phase = 2 * np.pi * days / 365.25
+    for k in range(1, ANNUAL_HARMONICS + 1):
+        columns += [np.sin(k * phase), np.cos(k * phase)]
+    if hourly:
+        hour = (times // HOUR_NS) % 24
+        columns += [hour == h for h in range(1, 24)]
+    columns += [np.maximum(BASE_TEMPERATURE - temperature, 0), np.maximum(temperature - BASE_TEMPERATURE, 0)]
+    return np.column_stack(columns).astype(np.float64)
+
+
+def _month_hour(times: np.ndarray, hourly: bool) -> np.ndarray:
+    month = times.astype('datetime64[ns]').astype('datetime64[M]').astype(np.int64) % 12
+    hour = (times // HOUR_NS) % 24 if hourly else np.zeros(len(times), dtype=np.int64)
+    return month * 24 + hour
+
+
+class DemandForecaster:
+    """Per-region linear demand models with seasonal, calendar and temperature regressors.
+
+    Each region's model is kept as least-squares sufficient statistics
+    (X'X, X'y, y'y), so new readings are folded in by adding their
+    contribution and re-solving a small system. The statistics are saved
+    next to the Parquet mirrors with a fingerprint of the data they cover.
+    A later process reuses them when the file still starts with those rows,
+    fitting only the rows appended since.
+    """
+
+    def __init__(self, store=None, cache_dir=None):
+        self.store = store or get_store()
+        self.cache_dir = cache_dir or self.store.cache_dir
+        self._state = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_path(self) -> str:
+        stem = os.path.splitext(os.path.basename(self.store.paths['consumption']))[0]
+        return os.path.join(self.cache_dir, f'forecast_{stem}.pkl')
+
+    def state(self) -> dict:
+        with self._lock:
+            version = self.store.version('consumption')
+            if self._version == version:
+                return self._state
+            snapshot = self.store.snapshot('consumption')
+            frame = self.store.consumption.iloc[:snapshot['rows']]
+            state = self._state
+            if state is None or self._version[0] != version[0]:
+                state = self._load(snapshot)
+            if state is None:
+                state = self._new_state(frame)
+            if state['rows'] < len(frame):
+                self._accumulate(state, frame.iloc[state['rows']:])
+                state['rows'] = len(frame)
+                state['snapshot'] = snapshot
+                self._save(state)
+            self._state, self._version = state, version
+            return state
+
+    def _new_state(self, frame: pd.DataFrame) -> dict:
+        sample = frame['date'].iloc[:100_000].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        step = infer_step(sample)
+        return {'feature_version': FEATURE_VERSION, 'step': step, 'hourly': step < DAY_NS,
+                'rows': 0, 'snapshot': None, 'regions': {}}
+
+    def _load(self, snapshot: dict):
+        try:
+            with open(self.cache_path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if state.get('feature_version') != FEATURE_VERSION or not self.store.extends('consumption', state['snapshot']):
+            return None
+        return state
+
+    def _save(self, state: dict):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def _accumulate(self, state: dict, rows: pd.DataFrame):
+        times = rows['date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        demand = rows['demand_mw'].to_numpy(dtype=np.float64)
+        temperature = rows['temperature'].to_numpy(dtype=np.float64)
+        cells = _month_hour(times, state['hourly'])
+        for region, positions in rows.groupby('region', sort=False, observed=True).indices.items():
+            stats = state['regions'].get(region)
+            if stats is None:
+                p = design_matrix(times[:1], np.zeros(1), state['hourly']).shape[1]
+                stats = state['regions'][region] = {
+                    'xtx': np.zeros((p, p)), 'xty': np.zeros(p), 'yty': 0.0, 'ysum': 0.0, 'n': 0,
+                    'temp_sum': np.zeros(12 * 24), 'temp_count': np.zeros(12 * 24), 'last': np.iinfo(np.int64).min,
+                }
+            t, y, temp, cell = times[positions], demand[positions], temperature[positions], cells[positions]
+            known = ~np.isnan(temp)
+            np.add.at(stats['temp_sum'], cell[known], temp[known])
+            np.add.at(stats['temp_count'], cell[known], 1)
+            # Missing temperatures fall back to the monthly/hourly climatology
+            temp = np.where(known, temp, self._climatology(stats, cell))
+            for lo in range(0, len(positions), CHUNK_ROWS):
+                X = design_matrix(t[lo:lo + CHUNK_ROWS], temp[lo:lo + CHUNK_ROWS], state['hourly'])
+                stats['xtx'] += X.T @ X
+                stats['xty'] += X.T @ y[lo:lo + CHUNK_ROWS]
+            stats['yty'] += float(y @ y)
+            stats['ysum'] += float(y.sum())
+            stats['n'] += len(positions)
+            stats['last'] = max(stats['last'], int(t.max()))
+            stats.pop('coef', None)
+
+    @staticmethod
+    def _climatology(stats: dict, cells: np.ndarray) -> np.ndarray:
+        counts = stats['temp_count'][cells]
+        overall = stats['temp_sum'].sum() / stats['temp_count'].sum() if stats['temp_count'].sum() else BASE_TEMPERATURE
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, stats['temp_sum'][cells] / counts, overall)
+
+    @staticmethod
+    def _coefficients(stats: dict) -> np.ndarray:
+        if 'coef' not in stats:
+            xtx = stats['xtx']
+            ridge = RIDGE * max(np.trace(xtx) / len(xtx), 1.0)
+            stats['coef'] = np.linalg.solve(xtx + ridge * np.eye(len(xtx)), stats['xty'])
+        return stats['coef']
+
+    def r_squared(self, region) -> float:
+        stats = self.state()['regions'][region]
+        beta = self._coefficients(stats)
+        sse = stats['yty'] - 2 * beta @ stats['xty'] + beta @ stats['xtx'] @ beta
+        sst = stats['yty'] - stats['ysum'] ** 2 / stats['n']
+        return 1 - sse / sst if sst > 0 else float('nan')
+
+    def forecast(self, region=None, days=DEFAULT_DAYS, start=None, end=None) -> pd.DataFrame:
+        """Predicted demand per reading interval.
+
+        Covers ``days`` days after the last reading, or the whole days from
+        ``start`` to ``end`` when given. Temperatures come from each region's
+        monthly/hourly climatology.
+        """
+        state = self.state()
+        step = state['step']
+        regions = state['regions'] if region in (None, 'All') else {r: s for r, s in state['regions'].items() if r == region}
+        frames = []
+        for name, stats in regions.items():
+            if start is not None or end is not None:
+                lo, hi = day_bounds(start if start is not None else end, end if end is not None else start)
+                times = np.arange(lo.value, hi.value, step, dtype=np.int64)
+            else:
+                first = stats['last'] + step
+                times = np.arange(first, first + days * DAY_NS, step, dtype=np.int64)
+            temperature = self._climatology(stats, _month_hour(times, state['hourly']))
+            demand = design_matrix(times, temperature, state['hourly']) @ self._coefficients(stats)
+            frames.append(pd.DataFrame({'date': times.astype('datetime64[ns]'), 'region': name,
+                                        'demand_mw': demand, 'temperature': temperature}))
+        if not frames:
+            return pd.DataFrame(columns=['date', 'region', 'demand_mw', 'temperature'])
+        return pd.concat(frames, ignore_index=True)
+
+
+_forecaster = None
+_forecaster_lock = threading.Lock()
+
+
+def get_forecaster() -> DemandForecaster:
+    global _forecaster
+    with _forecaster_lock:
+        if _forecaster is None:
+            _forecaster = DemandForecaster()
+        return _forecaster
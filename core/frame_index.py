@@ -0,0 +1,88 @@
+# core/frame_index.py
+import numpy as np
+import pandas as pd
+
+
+def day_bounds(start=None, end=None):
+    # Date ranges cover whole days: [start 00:00, day after end 00:00).
+    lo = pd.to_datetime(start).normalize() if start is not None else None
+    hi = pd.to_datetime(end).normalize() + pd.Timedelta(days=1) if end is not None else None
+    return lo, hi
+
+
+def _sort_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    if df['date'].is_monotonic_increasing:
+        return df
+    # NaT sorts last, matching numpy's searchsorted
+    return df.iloc[np.argsort(df['date'].to_numpy(), kind='stable')]
+
+
+class _Partition:
+    __slots__ = ('frame', 'dates', 'valid')
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.dates = frame['date'].to_numpy()
+        self.valid = len(frame) - int(np.isnat(self.dates).sum())
+
+    def slice(self, lo, hi) -> pd.DataFrame:
+        if lo is None and hi is None:
+            return self.frame
+        first = int(self.dates.searchsorted(lo.to_datetime64(), 'left')) if lo is not None else 0
+        last = int(self.dates.searchsorted(hi.to_datetime64(), 'left')) if hi is not None else self.valid
+        return self.frame.iloc[first:max(first, last)]
+
+    def last_date(self):
+        return self.dates[self.valid - 1] if self.valid else None
+
+
+class FrameIndex:
+    """A frame sorted by date plus one date-sorted partition per region.
+
+    A region and date-range filter is two binary searches on the matching
+    partition, and the result is a positional slice, so no rows are copied
+    or scanned. When the source frame is already in date order it is used
+    as the all-regions partition as-is.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.all = _Partition(_sort_by_date(df))
+        self.in_source_order = self.all.frame is df
+        self.regions = {
+            region: _Partition(part)
+            for region, part in self.all.frame.groupby('region', sort=False, observed=True)
+        }
+        self.rows = len(df)
+
+    def select(self, region=None, start=None, end=None) -> pd.DataFrame:
+        lo, hi = day_bounds(start, end)
+        if region is None or region == 'All':
+            return self.all.slice(lo, hi)
+        part = self.regions.get(region)
+        if part is None:
+            return self.all.frame.iloc[0:0]
+        return part.slice(lo, hi)
+
+    def append(self, df: pd.DataFrame) -> bool:
+        """Index the rows of ``df`` past the ones already indexed.
+
+        Only rows that keep every partition in date order can be added in
+        place; returns False when the index has to be rebuilt instead.
+        """
+        new = df.iloc[self.rows:]
+        if not self.in_source_order or self.all.valid < self.rows:
+            return False
+        if new['date'].isna().any() or not new['date'].is_monotonic_increasing:
+            return False
+        first = new['date'].iloc[0].to_datetime64() if len(new) else None
+        last = self.all.last_date()
+        if first is not None and last is not None and first < last:
+            return False
+        parts = {}
+        for region, rows in new.groupby('region', sort=False, observed=True):
+            part = self.regions.get(region)
+            parts[region] = _Partition(pd.concat([part.frame, rows]) if part is not None else rows)
+        self.all = _Partition(df)
+        self.regions.update(parts)
+        self.rows = len(df)
+        return True
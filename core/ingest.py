@@ -0,0 +1,108 @@
+# core/ingest.py
+import glob
+import json
+import os
+import threading
+import time
+import pandas as pd
+from core.data_store import get_store
+
+SPOOL_DIR = 'data/spool'
+POLL_SECONDS = 5.0
+
+
+class Ingestor:
+    """Moves spooled JSONL batches into the dataset CSVs and refreshes the store.
+
+    Producers drop finished batches as ``<spool_dir>/<dataset>/*.jsonl``
+    (write to a temporary name, then rename). Each poll appends the batch
+    rows to the matching CSV and deletes the batch; the store then parses
+    only the appended bytes, and derived aggregates fold in the new rows.
+    Rows appended straight to the CSVs are picked up the same way.
+    Listeners are called with the appended row counts after every poll
+    that added rows.
+    """
+
+    def __init__(self, store=None, spool_dir=SPOOL_DIR, interval=POLL_SECONDS, listeners=()):
+        self.store = store or get_store()
+        self.spool_dir = spool_dir
+        self.interval = interval
+        self.listeners = list(listeners)
+        self.rows_ingested = {name: 0 for name in self.store.paths}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def ingest_spool(self) -> dict:
+        counts = {}
+        for name, path in self.store.paths.items():
+            for batch in sorted(glob.glob(os.path.join(self.spool_dir, name, '*.jsonl'))):
+                with open(batch) as f:
+                    records = [json.loads(line) for line in f if line.strip()]
+                counts[name] = counts.get(name, 0) + self._append_csv(path, records)
+                os.remove(batch)
+        return counts
+
+    def _append_csv(self, path: str, records: list) -> int:
+        if not records:
+            return 0
+        with open(path, 'rb') as f:
+            columns = f.readline().decode().strip().split(',')
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - 1))
+            needs_newline = size > 0 and f.read(1) != b'\n'
+        rows = pd.DataFrame.from_records(records)
+        missing = set(columns) - set(rows.columns)
+        if missing:
+            raise ValueError(f"Spooled rows for {path} are missing columns: {', '.join(sorted(missing))}")
+        with open(path, 'a', newline='') as f:
+            if needs_newline:
+                f.write('\n')
+            rows[columns].to_csv(f, header=False, index=False)
+        return len(rows)
+
+    def poll(self) -> dict:
+        self.ingest_spool()
+        appended = self.store.refresh()
+        for name, count in appended.items():
+            self.rows_ingested[name] = self.rows_ingested.get(name, 0) + max(count, 0)
+        if any(appended.values()):
+            for listener in self.listeners:
+                listener(appended)
+        return appended
+
+    def run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='ingestor', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+if __name__ == "__main__":
+    from core.anomaly import describe_alert, get_monitor
+    from core.outage_index import HAS_CHROMADB, get_outage_index
+    monitor = get_monitor()
+    monitor.sync()
+    ingestor = Ingestor(listeners=[get_outage_index().sync] if HAS_CHROMADB else ())
+    print(f"Watching {os.path.abspath(ingestor.spool_dir)} every {ingestor.interval:.0f}s (Ctrl+C to stop)")
+    try:
+        while True:
+            appended = ingestor.poll()
+            for name, count in appended.items():
+                if count:
+                    print(f"{time.strftime('%H:%M:%S')} {name}: +{count} rows")
+            for alert in monitor.sync(appended):
+                print(f"{time.strftime('%H:%M:%S')} ALERT {describe_alert(alert)}")
+            time.sleep(ingestor.interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,109 @@
+# core/intervals.py
+import numpy as np
+import pandas as pd
+
+HOUR_NS = 3600 * 10**9
+DAY_NS = 24 * HOUR_NS
+
+
+def _ns(values) -> np.ndarray:
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def _point_ns(when) -> int:
+    return pd.Timestamp(when).as_unit('ns').value
+
+
+def concat_ranges(lo: np.ndarray, hi: np.ndarray) -> tuple:
+    """Concatenated aranges lo[k]..hi[k], and the k each element came from."""
+    lengths = np.maximum(hi - lo, 0)
+    owner = np.repeat(np.arange(len(lo)), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(lo - offsets, lengths) + np.arange(lengths.sum()), owner
+
+
+def infer_step(times: np.ndarray, default: int = DAY_NS) -> int:
+    """Smallest positive spacing between readings, i.e. the interval each row covers."""
+    gaps = np.diff(np.unique(times))
+    return int(gaps.min()) if len(gaps) else default
+
+
+class OutageIntervals:
+    """Outage events as [start, start + duration_hours) intervals per region.
+
+    Intervals are sorted by start with a running maximum of their ends, so
+    an overlap or stabbing query is two binary searches plus a scan of the
+    candidates between them; no pairwise comparison of all events is made.
+    Results are positions into the outage frame the index was built from.
+    """
+
+    def __init__(self, outages: pd.DataFrame):
+        self.outages = outages
+        starts = _ns(outages['date'])
+        ends = starts + (outages['duration_hours'].to_numpy(dtype=np.float64) * HOUR_NS).astype(np.int64)
+        self.regions = {}
+        for region, rows in outages.groupby('region', sort=False, observed=True).indices.items():
+            rows = rows[np.argsort(starts[rows], kind='stable')]
+            self.regions[region] = {
+                'rows': rows,
+                'start': starts[rows],
+                'end': ends[rows],
+                'max_end': np.maximum.accumulate(ends[rows]) if len(rows) else ends[rows],
+            }
+
+    def _parts(self, region):
+        if region is None or region == 'All':
+            return self.regions.values()
+        part = self.regions.get(region)
+        return [part] if part is not None else []
+
+    def overlapping(self, start, end, region=None) -> np.ndarray:
+        """Outages overlapping [start, end), in start order per region."""
+        lo, hi = _point_ns(start), _point_ns(end)
+        found = []
+        for part in self._parts(region):
+            # Candidates start before `hi`; those from `first` on may still be running at `lo`.
+            last = part['start'].searchsorted(hi, 'left')
+            first = part['max_end'][:last].searchsorted(lo, 'right')
+            candidates = np.arange(first, last)
+            found.append(part['rows'][candidates[part['end'][candidates] > lo]])
+        return np.concatenate(found) if found else np.array([], dtype=np.int64)
+
+    def at(self, when, region=None) -> np.ndarray:
+        """Outages in progress at instant ``when``."""
+        t = _point_ns(when)
+        return self.overlapping(pd.Timestamp(t), pd.Timestamp(t + 1), region)
+
+    def join(self, consumption: pd.DataFrame, step: int = None) -> pd.DataFrame:
+        """Pair each outage with the consumption rows whose interval it overlaps.
+
+        Row i of ``consumption`` covers [date, date + step); ``step`` defaults
+        to the data's reading interval. For every outage the overlapping rows
+        are found by binary search over that region's sorted readings, so
+        the work is O((rows + outages) log rows + matches). Returns positions
+        into both frames and the overlap in hours.
+        """
+        times = _ns(consumption['date'])
+        step = step or infer_step(times)
+        pieces = []
+        for region, rows in consumption.groupby('region', sort=False, observed=True).indices.items():
+            part = self.regions.get(region)
+            if part is None or len(part['rows']) == 0:
+                continue
+            rows = rows[np.argsort(times[rows], kind='stable')]
+            t = times[rows]
+            lo = t.searchsorted(part['start'] - step, 'right')
+            hi = t.searchsorted(part['end'], 'left')
+            matched, owner = concat_ranges(lo, hi)
+            row_start = t[matched]
+            overlap = np.minimum(part['end'][owner], row_start + step) - np.maximum(part['start'][owner], row_start)
+            pieces.append(pd.DataFrame({
+                'consumption_row': rows[matched],
+                'outage_row': part['rows'][owner],
+                'overlap_hours': overlap / HOUR_NS,
+            }))
+        if not pieces:
+            return pd.DataFrame({'consumption_row': np.array([], dtype=np.int64),
+                                 'outage_row': np.array([], dtype=np.int64),
+                                 'overlap_hours': np.array([], dtype=np.float64)})
+        return pd.concat(pieces, ignore_index=True)
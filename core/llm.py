@@ -0,0 +1,225 @@
+# core/llm.py
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from core.result_cache import ResultCache
+from core.telemetry import span
+
+# "ollama:<model>" or "fake"; the model is created on the first call
+MODEL_ENV = 'EMS_LLM'
+DEFAULT_MODEL = 'ollama:llama2'
+# Concurrent requests to the model; a local model on CPU gains nothing from more
+MAX_CONCURRENT = int(os.environ.get('EMS_LLM_CONCURRENCY', 1))
+CACHE_ENTRIES = 1024
+TOKEN = re.compile(r"\S+\s*|\s+")
+
+
+class FakeLLM:
+    """Deterministic local stand-in for the model, for benchmarks and offline runs.
+
+    ``reply`` is the answer text or a function of the prompt; by default the
+    answer names a digest of the prompt, so equal prompts give equal
+    answers. ``stream`` yields it a word at a time, ``delay`` seconds apart.
+    ``calls`` counts answers and ``peak`` the most generated at once.
+    """
+
+    def __init__(self, reply=None, delay=0.0):
+        self.reply = reply
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        if callable(self.reply):
+            return self.reply(prompt)
+        if self.reply is not None:
+            return self.reply
+        digest = hashlib.blake2b(prompt.encode(), digest_size=4).hexdigest()
+        return f"Fake answer to a {len(prompt):,}-character prompt ({digest})."
+
+    def _running(self, step: int):
+        with self._lock:
+            self.active += step
+            self.peak = max(self.peak, self.active)
+
+    def invoke(self, prompt: str) -> str:
+        self._running(1)
+        try:
+            text = self._answer(prompt)
+            time.sleep(self.delay * len(TOKEN.findall(text)))
+            return text
+        finally:
+            self._running(-1)
+
+    def stream(self, prompt: str):
+        self._running(1)
+        try:
+            for token in TOKEN.findall(self._answer(prompt)):
+                time.sleep(self.delay)
+                yield token
+        finally:
+            self._running(-1)
+
+
+def _ollama(model='llama2'):
+    from langchain_ollama import OllamaLLM
+    return OllamaLLM(model=model)
+
+
+MODELS = {'ollama': _ollama, 'fake': FakeLLM}
+
+
+def create_model(name=None):
+    name = name or os.environ.get(MODEL_ENV, DEFAULT_MODEL)
+    kind, _, model = name.partition(':')
+    if kind not in MODELS:
+        raise ValueError(f"Unknown LLM '{name}'. Choose from: {', '.join(MODELS)}")
+    return MODELS[kind](model) if model else MODELS[kind]()
+
+
+class LLMGateway:
+    """The one path from agents to the language model.
+
+    Answers are memoised on (model, prompt, version); callers pass the data
+    version their prompt was built from, so new data never serves an old
+    answer. Identical requests already in flight wait for that call instead
+    of making their own, at most ``max_concurrent`` calls reach the model
+    at once, and ``stream`` yields tokens as the model produces them.
+    Failed calls are not memoised.
+    """
+
+    def __init__(self, model=None, name=None, max_concurrent=MAX_CONCURRENT, cache=None):
+        self.name = name or (type(model).__name__ if model is not None else os.environ.get(MODEL_ENV, DEFAULT_MODEL))
+        self._model = model
+        self.cache = cache or ResultCache(max_entries=CACHE_ENTRIES, ttl=None)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.max_concurrent = max_concurrent
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = create_model(self.name)
+        return self._model
+
+    def _join(self, key):
+        # Cached answer, or the in-flight call for key and whether this caller makes it
+        missing = object()
+        with self._lock:
+            text = self.cache.get(key, missing)
+            if text is not missing:
+                return text, None, False
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Future()
+                return None, flight, True
+            self.coalesced += 1
+            return None, flight, False
+
+    def _finish(self, key, flight, text=None, error=None):
+        with self._lock:
+            if error is None:
+                self.cache.put(key, text)
+                flight.set_result(text)
+            elif isinstance(error, GeneratorExit):
+                # Stream abandoned by its reader: waiters make the call themselves
+                flight.cancel()
+            else:
+                self.errors += 1
+                flight.set_exception(error)
+            del self._flights[key]
+
+    def invoke(self, prompt: str, version=None) -> str:
+        key = (self.name, prompt, version)
+        while True:
+            text, flight, leader = self._join(key)
+            if flight is None:
+                return text
+            if leader:
+                break
+            try:
+                return flight.result()
+            except CancelledError:
+                continue
+        try:
+            with self._slots, span('llm.invoke'):
+                started = time.perf_counter()
+                self.calls += 1
+                text = str(self.model.invoke(prompt))
+                self.seconds += time.perf_counter() - started
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, text)
+        return text
+
+    def stream(self, prompt: str, version=None):
+        """Yield the answer as it is generated; cached or coalesced answers arrive whole."""
+        key = (self.name, prompt, version)
+        while True:
+            text, flight, leader = self._join(key)
+            if flight is None:
+                yield text
+                return
+            if leader:
+                break
+            try:
+                text = flight.result()
+            except CancelledError:
+                continue
+            yield text
+            return
+        parts = []
+        try:
+            with self._slots, span('llm.stream'):
+                started = time.perf_counter()
+                self.calls += 1
+                for token in self.model.stream(prompt):
+                    token = str(token)
+                    parts.append(token)
+                    yield token
+                self.seconds += time.perf_counter() - started
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, "".join(parts))
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._flights)
+        return {
+            'model': self.name,
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'in_flight': in_flight,
+            'max_concurrent': self.max_concurrent,
+            'model_seconds': self.seconds,
+            'cache': self.cache.stats(),
+        }
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
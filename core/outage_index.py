@@ -0,0 +1,219 @@
+# core/outage_index.py
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+from core.data_store import get_store
+from core.frame_index import day_bounds
+
+# chromadb is imported when the index is first opened
+HAS_CHROMADB = importlib.util.find_spec('chromadb') is not None
+
+EMBEDDER_ENV = 'EMS_EMBEDDER'
+HASHING_DIM = 384
+BATCH_SIZE = 512
+DEFAULT_RESULTS = 5
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder: signed feature hashing of words and character trigrams.
+
+    Needs no model or network and gives the same vector for the same text
+    in every process, so stored vectors stay valid across restarts.
+    """
+
+    def __init__(self, dim=HASHING_DIM):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+
+    def _features(self, text: str) -> list:
+        words = TOKEN.findall(text.lower())
+        grams = [w[i:i + 3] for w in (f' {w} ' for w in words) for i in range(len(w) - 2)]
+        return [f'w:{w}' for w in words] + [f'g:{g}' for g in grams]
+
+    def __call__(self, texts: list) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+                vectors[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama model through langchain."""
+
+    def __init__(self, model='nomic-embed-text'):
+        from langchain_ollama import OllamaEmbeddings
+        self.client = OllamaEmbeddings(model=model)
+        self.name = f'ollama-{model}'
+
+    def __call__(self, texts: list) -> np.ndarray:
+        return np.asarray(self.client.embed_documents(list(texts)), dtype=np.float32)
+
+
+EMBEDDERS = {'hashing': HashingEmbedder, 'ollama': OllamaEmbedder}
+
+
+def get_embedder(name=None):
+    name = name or os.environ.get(EMBEDDER_ENV, 'hashing')
+    kind, _, model = name.partition(':')
+    if kind not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}'. Choose from: {', '.join(EMBEDDERS)}")
+    return EMBEDDERS[kind](model) if model else EMBEDDERS[kind]()
+
+
+def outage_documents(outages: pd.DataFrame) -> pd.Series:
+    return (outages['cause'].astype(str) + ': ' + outages['description'].astype(str)
+            + ' (' + outages['severity'].astype(str) + ' severity)')
+
+
+def outage_ids(outages: pd.DataFrame) -> list:
+    # Content ids: the same outage keeps its id (and stored vector) when the
+    # file is rewritten; repeats of an identical row are numbered.
+    hashes = pd.util.hash_pandas_object(outages, index=False).to_numpy()
+    repeat = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+    return [f'{h:016x}-{n}' for h, n in zip(hashes.tolist(), repeat.tolist())]
+
+
+def _day_number(when) -> int:
+    return int(pd.Timestamp(when).value // (86400 * 10**9))
+
+
+class OutageIndex:
+    """Persistent ChromaDB index of outage records for similarity search.
+
+    Each outage is stored as its cause, description and severity text with
+    region, date and impact metadata, so searches can be filtered by
+    region and date range. Vectors persist under the store's cache
+    directory together with a fingerprint of the rows indexed; a new
+    process only embeds rows appended since. After a full rewrite of the
+    file, rows keep their content ids, so only new or changed rows are
+    embedded. Texts are embedded once per distinct string, in batches.
+    """
+
+    def __init__(self, store=None, embedder=None, path=None):
+        if not HAS_CHROMADB:
+            raise ImportError("chromadb is required for the outage similarity index")
+        self.store = store or get_store()
+        self.embedder = embedder or get_embedder()
+        self.path = path or os.path.join(self.store.cache_dir, 'chroma')
+        stem = os.path.splitext(os.path.basename(self.store.paths['outages']))[0]
+        self.collection_name = re.sub(r'[^a-zA-Z0-9._-]', '_', f'outages_{stem}_{self.embedder.name}')
+        self.state_path = os.path.join(self.path, f'{self.collection_name}.json')
+        self._collection = None
+        self._version = None
+        self.embedded = 0
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            import chromadb
+            os.makedirs(self.path, exist_ok=True)
+            client = chromadb.PersistentClient(path=self.path)
+            self._collection = client.get_or_create_collection(
+                self.collection_name, embedding_function=None, metadata={'hnsw:space': 'cosine'})
+        return self._collection
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            state['tail'] = bytes.fromhex(state['tail'])
+            return state
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_state(self, snapshot: dict):
+        state = dict(snapshot, tail=snapshot['tail'].hex())
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def sync(self, appended=None) -> int:
+        """Index outages added since the last sync; returns the number embedded."""
+        with self._lock:
+            version = self.store.version('outages')
+            if self._version == version:
+                return 0
+            snapshot = self.store.snapshot('outages')
+            outages = self.store.outages.iloc[:snapshot['rows']]
+            collection = self.collection
+            state = self._load_state()
+            if state is not None and collection.count() >= state['rows'] and self.store.extends('outages', state):
+                new = outages.iloc[state['rows']:]
+                ids = outage_ids(outages)[state['rows']:]
+            else:
+                # Unknown or rewritten file: reuse vectors of rows whose content is unchanged
+                ids = outage_ids(outages)
+                existing = set(collection.get(include=[])['ids'])
+                stale = list(existing.difference(ids))
+                for lo in range(0, len(stale), BATCH_SIZE):
+                    collection.delete(ids=stale[lo:lo + BATCH_SIZE])
+                keep = [i not in existing for i in ids]
+                new, ids = outages[keep], [i for i, k in zip(ids, keep) if k]
+            added = self._add(new, ids)
+            self._save_state(snapshot)
+            self._version = version
+            return added
+
+    def _add(self, outages: pd.DataFrame, ids: list) -> int:
+        if len(outages) == 0:
+            return 0
+        documents = outage_documents(outages)
+        texts = documents.unique().tolist()
+        vectors = np.concatenate([self.embedder(texts[lo:lo + BATCH_SIZE]) for lo in range(0, len(texts), BATCH_SIZE)])
+        positions = pd.Index(texts).get_indexer(documents)
+        metadatas = [
+            {'region': str(region), 'day': _day_number(date), 'date': f'{date:%Y-%m-%d}', 'cause': str(cause),
+             'severity': str(severity), 'duration_hours': int(hours), 'affected_customers': int(customers)}
+            for region, date, cause, severity, hours, customers in zip(
+                outages['region'], outages['date'], outages['cause'], outages['severity'],
+                outages['duration_hours'], outages['affected_customers'])
+        ]
+        documents = documents.tolist()
+        for lo in range(0, len(ids), BATCH_SIZE):
+            hi = lo + BATCH_SIZE
+            self.collection.upsert(ids=ids[lo:hi], embeddings=vectors[positions[lo:hi]], documents=documents[lo:hi],
+                                   metadatas=metadatas[lo:hi])
+        self.embedded += len(texts)
+        return len(ids)
+
+    def similar(self, text: str, region=None, start=None, end=None, k=DEFAULT_RESULTS) -> pd.DataFrame:
+        """The ``k`` outages closest to ``text``, optionally within a region and whole-day date range."""
+        self.sync()
+        clauses = []
+        if region is not None and region != 'All':
+            clauses.append({'region': region})
+        lo, hi = day_bounds(start, end)
+        if lo is not None:
+            clauses.append({'day': {'$gte': _day_number(lo)}})
+        if hi is not None:
+            clauses.append({'day': {'$lt': _day_number(hi)}})
+        where = clauses[0] if len(clauses) == 1 else {'$and': clauses} if clauses else None
+        result = self.collection.query(query_embeddings=self.embedder([text]), n_results=k, where=where,
+                                       include=['documents', 'metadatas', 'distances'])
+        rows = [dict(meta, document=doc, similarity=1 - distance)
+                for meta, doc, distance in zip(result['metadatas'][0], result['documents'][0], result['distances'][0])]
+        columns = ['date', 'region', 'cause', 'document', 'severity', 'duration_hours', 'affected_customers', 'similarity']
+        return pd.DataFrame(rows, columns=columns)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_outage_index() -> OutageIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = OutageIndex()
+        return _index
@@ -0,0 +1,65 @@
+# core/outage_stats.py
+import numpy as np
+import pandas as pd
+
+OUTAGE_KEYS = ('region', 'severity', 'cause')
+
+
+def outage_breakdown(outages: pd.DataFrame, by: str = 'region') -> pd.DataFrame:
+    """Per-group outage statistics, in order of first appearance of each group."""
+    if by not in OUTAGE_KEYS:
+        raise ValueError(f"Cannot group outages by '{by}'. Choose from: {', '.join(OUTAGE_KEYS)}")
+    codes, groups = pd.factorize(outages[by], sort=False)
+    n = len(groups)
+    valid = codes >= 0
+    codes = codes[valid]
+    hours = outages['duration_hours'].to_numpy()[valid]
+    customers = outages['affected_customers'].to_numpy()[valid]
+
+    count = np.bincount(codes, minlength=n)
+    total_hours = np.bincount(codes, weights=hours, minlength=n)
+    max_hours = np.full(n, -np.inf)
+    np.maximum.at(max_hours, codes, hours)
+    affected = np.bincount(codes, weights=customers, minlength=n)
+
+    # bincount sums in float64; hand integer inputs back as integers
+    if np.issubdtype(hours.dtype, np.integer):
+        total_hours = total_hours.astype(np.int64)
+        max_hours = max_hours.astype(hours.dtype)
+    if np.issubdtype(customers.dtype, np.integer):
+        affected = affected.astype(np.int64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_hours = total_hours / count
+    return pd.DataFrame({
+        'count': count,
+        'total_hours': total_hours,
+        'mean_hours': mean_hours,
+        'max_hours': max_hours,
+        'affected_customers': affected,
+    }, index=pd.Index(groups, name=by))
+
+
+def outage_totals(outages: pd.DataFrame) -> dict:
+    count = len(outages)
+    total_hours = outages['duration_hours'].sum() if count > 0 else 0
+    return {
+        'count': count,
+        'total_hours': total_hours,
+        'mean_hours': total_hours / count if count > 0 else float('nan'),
+        'max_hours': outages['duration_hours'].max() if count > 0 else 0,
+        'affected_customers': outages['affected_customers'].sum() if count > 0 else 0,
+    }
+
+
+def summarize_outages(outages: pd.DataFrame) -> dict:
+    summary = {key: outage_breakdown(outages, key) for key in OUTAGE_KEYS}
+    summary['totals'] = outage_totals(outages)
+    return summary
+
+
+def describe_outages_by_region(breakdown: pd.DataFrame) -> str:
+    result = []
+    for row in breakdown.itertuples():
+        result.append(f"{row.Index}: {row.count} outages, {row.total_hours} hrs")
+    return ". ".join(result)
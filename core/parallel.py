@@ -0,0 +1,167 @@
+# core/parallel.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from core import rollup
+from core.quantiles import MEASURES as SKETCH_MEASURES, QuantileSketches, sketch_cells
+from core.telemetry import traced
+
+WORKERS_ENV = 'EMS_WORKERS'
+# Below this many rows one process builds faster than a pool starts
+MIN_PARALLEL_ROWS = int(os.environ.get('EMS_PARALLEL_MIN_ROWS', 500_000))
+TASKS_PER_WORKER = 4
+# Month number given to rows without a date
+NO_MONTH = np.iinfo(np.int64).min
+
+_columns = {}
+_blocks = []
+
+
+def worker_count(workers=None) -> int:
+    return max(1, workers or int(os.environ.get(WORKERS_ENV, 0)) or os.cpu_count() or 1)
+
+
+class SharedColumns:
+    """Numpy columns copied once into shared memory blocks.
+
+    Workers attach to the blocks by name (``spec`` is all that is
+    pickled), so every process reads the same pages instead of receiving
+    a copy of the frame. Use as a context manager; the blocks are freed on
+    exit.
+    """
+
+    def __init__(self, arrays: dict):
+        self.blocks = []
+        self.spec = {}
+        try:
+            for name, values in arrays.items():
+                values = np.ascontiguousarray(values)
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(values.shape, values.dtype, buffer=block.buf)[...] = values
+                self.spec[name] = (block.name, values.dtype.str, values.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(spec: dict, context: dict):
+    global _blocks
+    _columns.clear()
+    _blocks = []
+    for name, (block_name, dtype, shape) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        _columns[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    _columns.update(context)
+
+
+def pool_context():
+    # fork copies only the calling thread: a lock another thread held at that
+    # moment (pandas/arrow internals, the metrics registry) stays locked in the
+    # child. Threaded hosts (the service, Streamlit) start workers cleanly instead.
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and threading.active_count() == 1:
+        return multiprocessing.get_context('fork')
+    if 'forkserver' in methods:
+        context = multiprocessing.get_context('forkserver')
+        # Workers fork from a server that has already imported pandas and this module
+        context.set_forkserver_preload(['core.parallel'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def partition_tasks(region: np.ndarray, month: np.ndarray, tasks: int):
+    """Row order grouping region x month partitions, and contiguous task bounds in it.
+
+    Rows keep their original order within a partition, and each task is a
+    run of whole partitions, so per-task results concatenate in region,
+    then month order.
+    """
+    order = np.lexsort((month, region))
+    key_region, key_month = region[order], month[order]
+    starts = np.flatnonzero(np.r_[True, (key_region[1:] != key_region[:-1]) | (key_month[1:] != key_month[:-1])])
+    edges = starts[np.unique(np.linspace(0, len(starts), tasks, endpoint=False).astype(np.int64))]
+    bounds = list(zip(edges.tolist(), np.r_[edges[1:], len(order)].tolist()))
+    return order, bounds
+
+
+def _cube_task(bounds):
+    rows = _columns['order'][bounds[0]:bounds[1]]
+    raw = rollup.cells_from_arrays(_columns['region'][rows], _columns['date'][rows],
+                                   _columns['demand_mw'][rows], _columns['supply_mw'][rows])
+    cells = {'day': rollup.day_cells(raw)}
+    if _columns['sub_hourly']:
+        cells['hour'] = rollup.hour_cells(raw)
+    return cells
+
+
+def _sketch_task(bounds):
+    rows = _columns['order'][bounds[0]:bounds[1]]
+    region, month = _columns['region'][rows], _columns['month'][rows]
+    valid = (region >= 0) & (month != NO_MONTH)
+    region, month, rows = region[valid], month[valid] - _columns['first_month'], rows[valid]
+    partial = {}
+    for measure in SKETCH_MEASURES:
+        cells = sketch_cells(region, month, _columns['months'], _columns[measure][rows])
+        partial[measure] = np.unique(cells, return_counts=True)
+    return partial
+
+
+def _run(consumption: pd.DataFrame, regions: pd.Index, task, workers: int, context=None) -> list:
+    region = regions.get_indexer(consumption['region'])
+    date = pd.to_datetime(consumption['date']).to_numpy()
+    month = date.astype('datetime64[M]').astype(np.int64)
+    # Undated rows sort first; the sketch task skips them like QuantileSketches does
+    month[pd.isna(date)] = NO_MONTH
+    order, bounds = partition_tasks(region, month, workers * TASKS_PER_WORKER)
+    arrays = {'order': order, 'region': region, 'date': date, 'month': month,
+              'demand_mw': consumption['demand_mw'].to_numpy(), 'supply_mw': consumption['supply_mw'].to_numpy()}
+    with SharedColumns(arrays) as shared:
+        with ProcessPoolExecutor(workers, mp_context=pool_context(),
+                                 initializer=_attach, initargs=(shared.spec, context or {})) as pool:
+            return list(pool.map(task, bounds))
+
+
+def _serial(consumption: pd.DataFrame, workers) -> bool:
+    return worker_count(workers) == 1 or len(consumption) < max(MIN_PARALLEL_ROWS, 1)
+
+
+@traced('rollup.build_cube')
+def build_cube(consumption: pd.DataFrame, workers=None) -> rollup.RollupCube:
+    """RollupCube built from per-partition day (and hour) cells computed in a process pool."""
+    if _serial(consumption, workers):
+        return rollup.RollupCube(consumption)
+    regions = pd.Index(sorted(consumption['region'].dropna().unique()))
+    context = {'sub_hourly': rollup.sub_hourly(pd.to_datetime(consumption['date']).to_numpy())}
+    parts = _run(consumption, regions, _cube_task, worker_count(workers), context)
+    return rollup.RollupCube(consumption, cells={level: pd.concat([p[level] for p in parts], ignore_index=True) for level in parts[0]})
+
+
+@traced('quantiles.build_sketches')
+def build_sketches(consumption: pd.DataFrame, workers=None) -> QuantileSketches:
+    """QuantileSketches whose per-partition counts are computed in a process pool."""
+    if _serial(consumption, workers):
+        return QuantileSketches(consumption)
+    sketches = QuantileSketches(consumption, fill=False)
+    context = {'first_month': sketches.first_month, 'months': sketches.months}
+    for partial in _run(consumption, sketches.regions, _sketch_task, worker_count(workers), context):
+        for measure, (cells, counts) in partial.items():
+            sketches.counts[measure].reshape(-1)[cells] += counts.astype(np.int32)
+    return sketches
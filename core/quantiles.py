@@ -0,0 +1,162 @@
+# core/quantiles.py
+import math
+import numpy as np
+import pandas as pd
+from core.frame_index import day_bounds
+
+# Every reported quantile is within this fraction of the exact value
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+# Bin 0 holds values <= 1; bin k >= 1 holds (GAMMA**(k-1), GAMMA**k]. 1024 bins reach ~7e8.
+BINS = 1024
+MEASURES = ('demand_mw', 'supply_mw')
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+# Months of room added when appended rows run past the last month
+GROWTH_MONTHS = 12
+
+
+def bin_index(values) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.ceil(np.log(values) / math.log(GAMMA))
+    return np.clip(np.where(values > 1, k, 0), 0, BINS - 1).astype(np.int64)
+
+
+def bin_value(k: np.ndarray) -> np.ndarray:
+    # Midpoint of bin k in relative terms, so any value in it is within RELATIVE_ACCURACY
+    k = np.asarray(k)
+    return np.where(k > 0, 2 * GAMMA ** k / (GAMMA + 1), 0.0)
+
+
+def quantiles_from_counts(counts: np.ndarray, percentiles) -> np.ndarray:
+    """Estimate the percentiles of the values behind a histogram of bin counts.
+
+    Percentile p is the nearest-rank value, the smallest with at least p%
+    of the values at or below it (numpy's method='inverted_cdf'); the
+    estimate is within RELATIVE_ACCURACY of it for values above 1 and 0
+    for values up to 1.
+    """
+    cumulative = np.cumsum(counts)
+    n = cumulative[-1] if len(cumulative) else 0
+    if n == 0:
+        return np.full(len(percentiles), np.nan)
+    ranks = np.maximum(np.ceil(np.asarray(percentiles, dtype=np.float64) / 100 * n) - 1, 0)
+    return bin_value(np.searchsorted(cumulative, ranks, side='right'))
+
+
+def _month_numbers(dates) -> np.ndarray:
+    return pd.to_datetime(dates).to_numpy().astype('datetime64[M]').astype(np.int64)
+
+
+def sketch_cells(region: np.ndarray, month: np.ndarray, months: int, values: np.ndarray) -> np.ndarray:
+    # Flat position in a (regions, months, BINS) count array
+    return (region * months + month) * BINS + bin_index(values)
+
+
+class QuantileSketches:
+    """Per-region, per-month log-bucket histograms of demand and supply.
+
+    Each sketch is a fixed array of BINS counts (4 KB), whatever the number
+    of readings behind it, and two sketches merge by adding their counts.
+    A date range merges the sketches of the whole months it covers and
+    bins the few readings in the partial months at either end, so a
+    percentile query never sorts rows. Estimates are within
+    RELATIVE_ACCURACY of the exact percentile. With ``fill=False`` the
+    sketches are sized for ``consumption`` but left empty (see
+    core.parallel).
+    """
+
+    def __init__(self, consumption: pd.DataFrame, fill=True):
+        self.regions = pd.Index(sorted(consumption['region'].dropna().unique()))
+        months = _month_numbers(consumption['date'].dropna())
+        self.first_month = int(months.min()) if len(months) else 0
+        span = int(months.max()) - self.first_month + 1 if len(months) else 0
+        self.counts = {m: np.zeros((len(self.regions), span, BINS), dtype=np.int32) for m in MEASURES}
+        self.months = span
+        if fill:
+            self._add(consumption)
+
+    def append(self, rows: pd.DataFrame) -> bool:
+        """Fold newly appended readings into their month's sketches.
+
+        Returns False when the rows bring an unknown region or a month
+        before the first one; the caller should rebuild in that case.
+        """
+        rows = rows[rows['date'].notna()]
+        if len(rows) == 0:
+            return True
+        if not rows['region'].dropna().isin(self.regions).all():
+            return False
+        months = _month_numbers(rows['date'])
+        if months.min() < self.first_month:
+            return False
+        needed = int(months.max()) - self.first_month + 1
+        if needed > self.months:
+            grow = max(needed, self.months + GROWTH_MONTHS) - self.months
+            self.counts = {m: np.pad(c, ((0, 0), (0, grow), (0, 0))) for m, c in self.counts.items()}
+            self.months += grow
+        self._add(rows)
+        return True
+
+    def _add(self, rows: pd.DataFrame):
+        rows = rows[rows['date'].notna() & rows['region'].notna()]
+        if len(rows) == 0:
+            return
+        region = self.regions.get_indexer(rows['region'])
+        month = _month_numbers(rows['date']) - self.first_month
+        for measure, counts in self.counts.items():
+            np.add.at(counts.reshape(-1), sketch_cells(region, month, self.months, rows[measure].to_numpy()), 1)
+
+    def histograms(self, region=None, start=None, end=None, store=None) -> dict:
+        """Merged counts per region and measure for the inclusive date range.
+
+        Whole months come from the sketches. Readings in partial months at
+        either end are read through ``store.select`` (a binary-search
+        slice), so the extra work is bounded by two months of rows.
+        """
+        lo, hi = day_bounds(start, end)
+        codes = np.arange(len(self.regions)) if region in (None, 'All') else self.regions.get_indexer([region])
+        codes = codes[codes >= 0]
+        month_lo = self.first_month if lo is None else max(self.first_month, int(_month_numbers([lo + pd.offsets.MonthBegin(0)])[0]))
+        month_hi = self.first_month + self.months if hi is None else min(self.first_month + self.months, int(_month_numbers([hi])[0]))
+        first, last = month_lo - self.first_month, max(month_lo, month_hi) - self.first_month
+        merged = {m: c[codes, first:last].sum(axis=1, dtype=np.int64) for m, c in self.counts.items()}
+        edges = []
+        if month_lo >= month_hi:
+            edges.append((lo, hi))
+        else:
+            if lo is not None and lo < pd.Timestamp(np.datetime64(month_lo, 'M')):
+                edges.append((lo, pd.Timestamp(np.datetime64(month_lo, 'M'))))
+            if hi is not None and hi > pd.Timestamp(np.datetime64(month_hi, 'M')):
+                edges.append((pd.Timestamp(np.datetime64(month_hi, 'M')), hi))
+        for edge_lo, edge_hi in edges:
+            # select() takes whole days and both bounds are midnights
+            rows = store.select('consumption', region,
+                                edge_lo, None if edge_hi is None else edge_hi - pd.Timedelta(days=1))
+            if len(rows) == 0:
+                continue
+            row_codes = self.regions.get_indexer(rows['region'])
+            for measure, counts in merged.items():
+                flat = np.searchsorted(codes, row_codes) * BINS + bin_index(rows[measure].to_numpy())
+                counts += np.bincount(flat, minlength=counts.size).reshape(counts.shape)
+        return {'regions': self.regions[codes], **merged}
+
+    def percentiles(self, region=None, start=None, end=None, percentiles=DEFAULT_PERCENTILES,
+                    measure='demand_mw', store=None) -> pd.DataFrame:
+        """Percentiles per region, plus an 'All' row merging every region when unfiltered."""
+        merged = self.histograms(region, start, end, store)
+        counts = merged[measure]
+        rows = {name: counts[i] for i, name in enumerate(merged['regions']) if counts[i].any()}
+        if region in (None, 'All') and len(rows) > 1:
+            rows['All'] = counts.sum(axis=0)
+        return percentile_table(rows, percentiles)
+
+
+def percentile_table(histograms: dict, percentiles) -> pd.DataFrame:
+    columns = [f"p{p:g}" for p in percentiles]
+    table = pd.DataFrame(
+        [quantiles_from_counts(h, percentiles) for h in histograms.values()],
+        index=pd.Index(list(histograms), name='region'), columns=columns,
+    )
+    table.insert(0, 'count', [int(h.sum()) for h in histograms.values()])
+    return table
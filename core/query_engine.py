@@ -0,0 +1,357 @@
+# core/query_engine.py
+import importlib.util
+import os
+import threading
+import pandas as pd
+from core.data_store import get_store
+from core.downsample import MAX_POINTS
+from core.frame_index import day_bounds
+from core.outage_stats import OUTAGE_KEYS, outage_breakdown, outage_totals
+from core import parallel, rollup
+from core.quantiles import DEFAULT_PERCENTILES, QuantileSketches
+from core.telemetry import traced
+
+# duckdb is imported on first connection so the pandas backend never pays for it
+HAS_DUCKDB = importlib.util.find_spec('duckdb') is not None
+
+BACKEND_ENV = 'EMS_QUERY_BACKEND'
+
+NO_DATA = "No data available for the selected filters."
+NO_OUTAGE_DATA = "No outage data available for the selected filters."
+
+
+def filter_frame(df: pd.DataFrame, region=None, start=None, end=None) -> pd.DataFrame:
+    lo, hi = day_bounds(start, end)
+    mask = pd.Series(True, index=df.index)
+    if lo is not None:
+        mask &= df['date'] >= lo
+    if hi is not None:
+        mask &= df['date'] < hi
+    if region is not None and region != 'All':
+        mask &= df['region'] == region
+    return df[mask]
+
+
+class PandasBackend:
+    name = 'pandas'
+
+    def __init__(self, store=None, workers=None):
+        self.store = store or get_store()
+        # Processes for full rebuilds of the cube and sketches; see core.parallel
+        self.workers = workers
+        # kind -> (version, structure) for aggregates kept in step with the consumption rows
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def _maintained(self, kind, build):
+        with self._derived_lock:
+            version = self.store.version('consumption')
+            old, current = self._derived.get(kind, (None, None))
+            if old != version:
+                data = self.store.consumption
+                if old is None or old[0] != version[0] or not current.append(data.iloc[old[1]:version[1]]):
+                    current = build(data.iloc[:version[1]])
+                self._derived[kind] = (version, current)
+            return current
+
+    def cube(self) -> rollup.RollupCube:
+        return self._maintained('cube', lambda data: parallel.build_cube(data, self.workers))
+
+    def sketches(self) -> QuantileSketches:
+        return self._maintained('sketches', lambda data: parallel.build_sketches(data, self.workers))
+
+    def _outages(self, region, start, end):
+        return self.store.select('outages', region, start, end)
+
+    @traced
+    def peak_demand(self, region=None, start=None, end=None):
+        agg = self.cube().query(region, start, end)
+        if agg.empty:
+            return None
+        top = agg[agg['demand_max'] == agg['demand_max'].max()].sort_values('demand_argmax', kind='stable')
+        return {'date': pd.Timestamp(top['demand_argmax'].iloc[0]), 'region': top.index[0], 'demand_mw': top['demand_max'].iloc[0]}
+
+    @traced
+    def outage_breakdown(self, by='region', region=None, start=None, end=None) -> pd.DataFrame:
+        return outage_breakdown(self._outages(region, start, end), by)
+
+    @traced
+    def outage_totals(self, region=None, start=None, end=None) -> dict:
+        return outage_totals(self._outages(region, start, end))
+
+    @traced
+    def demand_supply_gap(self, region=None, start=None, end=None) -> pd.DataFrame:
+        agg = self.cube().query(region, start, end)
+        return pd.DataFrame({'mean': rollup.mean(agg, 'gap'), 'min': agg['gap_min'], 'max': agg['gap_max']})
+
+    @traced
+    def region_stats(self, region=None, start=None, end=None) -> pd.DataFrame:
+        agg = self.cube().query(region, start, end)
+        return pd.DataFrame({
+            ('demand_mw', 'mean'): rollup.mean(agg, 'demand'),
+            ('demand_mw', 'max'): agg['demand_max'],
+            ('demand_mw', 'min'): agg['demand_min'],
+            ('demand_mw', 'std'): rollup.std(agg, 'demand'),
+            ('supply_mw', 'mean'): rollup.mean(agg, 'supply'),
+            ('supply_mw', 'max'): agg['supply_max'],
+            ('supply_mw', 'min'): agg['supply_min'],
+        })
+
+    @traced
+    def percentiles(self, region=None, start=None, end=None, percentiles=DEFAULT_PERCENTILES, column='demand_mw') -> pd.DataFrame:
+        # Approximate: within quantiles.RELATIVE_ACCURACY of the exact value, and
+        # clipped to the exact range from the cube so p0/p100 are the true min/max
+        table = self.sketches().percentiles(region, start, end, percentiles, column, self.store)
+        if table.empty:
+            return table
+        agg = self.cube().query(region, start, end)
+        measure = column.replace('_mw', '')
+        low, high = agg[f'{measure}_min'].astype(float), agg[f'{measure}_max'].astype(float)
+        low['All'], high['All'] = low.min(), high.max()
+        values = table.columns[1:]
+        table[values] = table[values].clip(low.reindex(table.index), high.reindex(table.index), axis=0)
+        return table
+
+    @traced
+    def series(self, region=None, start=None, end=None, max_points=MAX_POINTS) -> tuple:
+        """Demand and supply for charts, and the pyramid level they come from.
+
+        The finest level ('raw' readings, then hourly, daily, weekly or
+        monthly buckets) with at most ``max_points`` points per region is
+        read from the cube, so drawing a long span never touches its rows.
+        """
+        cube = self.cube()
+        span = cube.span(start, end)
+        agg = cube.query(region, start, end)
+        rows = int(agg['count'].max()) if len(agg) else 0
+        level = rollup.pick_level(rows, span[1] - span[0] + 1 if span else 0, max_points, cube.levels)
+        if level == 'raw':
+            return self.store.select('consumption', region, start, end), level
+        return cube.series(level, region, start, end), level
+
+    @traced
+    def summary(self, region=None, start=None, end=None) -> dict:
+        agg = self.cube().query(region, start, end)
+        outages = self.outage_totals(region, start, end)
+        records = int(agg['count'].sum())
+        return {
+            'records': records,
+            'peak_demand': agg['demand_max'].max() if records else float('nan'),
+            'avg_demand': agg['demand_sum'].sum() / records if records else float('nan'),
+            'total_supply': agg['supply_sum'].sum() if records else 0,
+            'total_outages': outages['count'],
+            'total_outage_hours': outages['total_hours'],
+        }
+
+
+class DuckDBBackend:
+    """Runs the same queries as SQL over the store's files.
+
+    Reads the Parquet mirror (or CSV) directly so date and region filters
+    are pushed into the scan instead of materialising a pandas frame.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, store=None, threads=None):
+        if not HAS_DUCKDB:
+            raise ImportError("duckdb is required for the 'duckdb' query backend")
+        self.store = store or get_store()
+        self.threads = threads
+        self._local = threading.local()
+        self._types = {}
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import duckdb
+            conn = duckdb.connect()
+            if self.threads:
+                conn.execute(f"SET threads TO {int(self.threads)}")
+            self._local.conn = conn
+        return conn
+
+    def _source(self, name: str) -> str:
+        path = self.store.source_path(name).replace("'", "''")
+        if path.endswith('.parquet'):
+            return f"read_parquet('{path}', file_row_number = true)"
+        return f"read_csv_auto('{path}')"
+
+    def _row_order(self, name: str) -> str:
+        # Parquet scans expose the original row number, which keeps tie-breaks
+        # identical to pandas; CSV scans fall back to date order.
+        if self.store.source_path(name).endswith('.parquet'):
+            return 'file_row_number'
+        return 'date'
+
+    def _sum(self, name: str, column: str) -> str:
+        # DuckDB widens integer sums to HUGEINT, which pandas receives as float;
+        # narrow back so integer columns format the same as the pandas backend.
+        src = self._source(name)
+        types = self._types.get(src)
+        if types is None:
+            types = dict((row[0], row[1]) for row in self._conn().execute(f"DESCRIBE SELECT * FROM {src}").fetchall())
+            self._types[src] = types
+        if types.get(column, '').endswith(('INT', 'INTEGER')):
+            return f"CAST(SUM({column}) AS BIGINT)"
+        return f"SUM({column})"
+
+    def _where(self, region, start, end):
+        clauses, params = [], []
+        lo, hi = day_bounds(start, end)
+        if lo is not None:
+            clauses.append("date >= CAST(? AS DATE)")
+            params.append(str(lo.date()))
+        if hi is not None:
+            clauses.append("date < CAST(? AS DATE)")
+            params.append(str(hi.date()))
+        if region is not None and region != 'All':
+            clauses.append("region = ?")
+            params.append(region)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def _query(self, name, sql, region, start, end) -> pd.DataFrame:
+        where, params = self._where(region, start, end)
+        return self._conn().execute(sql.format(src=self._source(name), where=where), params).df()
+
+    @traced
+    def peak_demand(self, region=None, start=None, end=None):
+        df = self._query('consumption', f"""
+            SELECT date, region, demand_mw FROM {{src}} {{where}}
+            ORDER BY demand_mw DESC, {self._row_order('consumption')} LIMIT 1
+        """, region, start, end)
+        if df.empty:
+            return None
+        row = df.iloc[0]
+        return {'date': pd.Timestamp(row['date']), 'region': row['region'], 'demand_mw': row['demand_mw']}
+
+    @traced
+    def outage_breakdown(self, by='region', region=None, start=None, end=None) -> pd.DataFrame:
+        if by not in OUTAGE_KEYS:
+            raise ValueError(f"Cannot group outages by '{by}'. Choose from: {', '.join(OUTAGE_KEYS)}")
+        df = self._query('outages', f"""
+            SELECT {by}, COUNT(*) AS count,
+                   {self._sum('outages', 'duration_hours')} AS total_hours,
+                   AVG(duration_hours) AS mean_hours, MAX(duration_hours) AS max_hours,
+                   {self._sum('outages', 'affected_customers')} AS affected_customers
+            FROM {{src}} {{where}}
+            GROUP BY {by} ORDER BY MIN({self._row_order('outages')}), {by}
+        """, region, start, end)
+        return df.set_index(by)
+
+    @traced
+    def outage_totals(self, region=None, start=None, end=None) -> dict:
+        totals = self._query('outages', f"""
+            SELECT COUNT(*) AS count,
+                   COALESCE({self._sum('outages', 'duration_hours')}, 0) AS total_hours,
+                   AVG(duration_hours) AS mean_hours,
+                   COALESCE(MAX(duration_hours), 0) AS max_hours,
+                   COALESCE({self._sum('outages', 'affected_customers')}, 0) AS affected_customers
+            FROM {{src}} {{where}}
+        """, region, start, end).to_dict('records')[0]
+        if totals['mean_hours'] is None:
+            totals['mean_hours'] = float('nan')
+        return totals
+
+    @traced
+    def demand_supply_gap(self, region=None, start=None, end=None) -> pd.DataFrame:
+        df = self._query('consumption', """
+            SELECT region, AVG(supply_mw - demand_mw) AS mean,
+                   MIN(supply_mw - demand_mw) AS min, MAX(supply_mw - demand_mw) AS max
+            FROM {src} {where}
+            GROUP BY region ORDER BY region
+        """, region, start, end)
+        return df.set_index('region')
+
+    @traced
+    def region_stats(self, region=None, start=None, end=None) -> pd.DataFrame:
+        df = self._query('consumption', """
+            SELECT region,
+                   AVG(demand_mw) AS demand_mean, MAX(demand_mw) AS demand_max,
+                   MIN(demand_mw) AS demand_min, STDDEV_SAMP(demand_mw) AS demand_std,
+                   AVG(supply_mw) AS supply_mean, MAX(supply_mw) AS supply_max, MIN(supply_mw) AS supply_min
+            FROM {src} {where}
+            GROUP BY region ORDER BY region
+        """, region, start, end).set_index('region')
+        df.columns = pd.MultiIndex.from_tuples([tuple(c.replace('_', '_mw_', 1).rsplit('_', 1)) for c in df.columns])
+        return df
+
+    @traced
+    def percentiles(self, region=None, start=None, end=None, percentiles=DEFAULT_PERCENTILES, column='demand_mw') -> pd.DataFrame:
+        # Exact nearest-rank percentiles, the convention the sketches estimate
+        fractions = ", ".join(f"{p / 100!r}" for p in percentiles)
+        df = self._query('consumption', f"""
+            SELECT region, COUNT(*) AS count, QUANTILE_DISC({column}, [{fractions}]) AS q
+            FROM {{src}} {{where}}
+            GROUP BY region ORDER BY region
+        """, region, start, end)
+        table = pd.DataFrame(df['q'].tolist(), index=pd.Index(df['region'], name='region'),
+                             columns=[f"p{p:g}" for p in percentiles], dtype=float)
+        table.insert(0, 'count', df['count'].astype(int).to_numpy())
+        if (region is None or region == 'All') and len(table) > 1:
+            overall = self._query('consumption', f"""
+                SELECT COUNT(*) AS count, QUANTILE_DISC({column}, [{fractions}]) AS q FROM {{src}} {{where}}
+            """, region, start, end).iloc[0]
+            table.loc['All'] = [int(overall['count']), *overall['q']]
+        return table
+
+    @traced
+    def series(self, region=None, start=None, end=None, max_points=MAX_POINTS) -> tuple:
+        """Demand and supply for charts, bucketed like PandasBackend.series."""
+        extent = self._query('consumption', """
+            SELECT COUNT(*) AS n, MIN(date) AS lo, MAX(date) AS hi FROM {src} {where} GROUP BY region
+        """, region, start, end)
+        rows = int(extent['n'].max()) if len(extent) else 0
+        lo, hi = (pd.Timestamp(extent['lo'].min()).normalize(), pd.Timestamp(extent['hi'].max()).normalize()) if rows else (None, None)
+        level = rollup.pick_level(rows, (hi - lo).days + 1 if rows else 0, max_points)
+        if level == 'raw':
+            return self.store.select('consumption', region, start, end), level
+        # Whole buckets, as the cube returns them
+        first, last = rollup.bucket_days(level, lo.value // 86_400_000_000_000, hi.value // 86_400_000_000_000)
+        df = self._query('consumption', f"""
+            SELECT CAST(date_trunc('{level}', date) AS TIMESTAMP) AS date, region, COUNT(*) AS count,
+                   AVG(demand_mw) AS demand_mw, MIN(demand_mw) AS demand_mw_min, MAX(demand_mw) AS demand_mw_max,
+                   AVG(supply_mw) AS supply_mw, MIN(supply_mw) AS supply_mw_min, MAX(supply_mw) AS supply_mw_max
+            FROM {{src}} {{where}}
+            GROUP BY ALL ORDER BY region, date
+        """, region, pd.Timestamp(first, unit='D'), pd.Timestamp(last, unit='D'))
+        return df, level
+
+    @traced
+    def summary(self, region=None, start=None, end=None) -> dict:
+        cons = self._query('consumption', f"""
+            SELECT COUNT(*) AS records, MAX(demand_mw) AS peak_demand,
+                   AVG(demand_mw) AS avg_demand, COALESCE({self._sum('consumption', 'supply_mw')}, 0) AS total_supply
+            FROM {{src}} {{where}}
+        """, region, start, end).to_dict('records')[0]
+        outages = self.outage_totals(region, start, end)
+        return {
+            'records': int(cons['records']),
+            'peak_demand': cons['peak_demand'],
+            'avg_demand': cons['avg_demand'],
+            'total_supply': cons['total_supply'],
+            'total_outages': int(outages['count']),
+            'total_outage_hours': outages['total_hours'],
+        }
+
+
+BACKENDS = {'pandas': PandasBackend, 'duckdb': DuckDBBackend}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def set_backend(name: str, store=None):
+    global _engine
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown query backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    with _engine_lock:
+        _engine = BACKENDS[name](store)
+    return _engine
+
+
+def get_engine():
+    if _engine is None:
+        return set_backend(os.environ.get(BACKEND_ENV, 'pandas'))
+    return _engine
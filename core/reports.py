@@ -0,0 +1,249 @@
+# core/reports.py
+import argparse
+import hashlib
+import html
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from core.data_store import get_store
+from core.downsample import MAX_POINTS, METHOD, downsample, use_webgl
+from core.parallel import pool_context
+from core.telemetry import traced
+
+# Static image export needs kaleido; without it only HTML is written
+HAS_KALEIDO = importlib.util.find_spec('kaleido') is not None
+
+REPORT_DIR = os.environ.get('EMS_REPORT_DIR', 'reports')
+ASSET_DIR = 'assets'
+MANIFEST = 'manifest.json'
+FORMATS = ('html', 'png', 'svg')
+PERIODS = {'week': 'W-SUN', 'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+# Bump when the report layout changes so cached reports are re-rendered
+RENDER_VERSION = 1
+
+_store = None
+_manifest_lock = threading.Lock()
+
+
+def _init_worker(store=None):
+    # Forked workers inherit the parent's loaded store; spawned ones load their own
+    global _store
+    _store = store or _store or get_store()
+
+
+def plan_reports(store, period='month', regions=None, start=None, end=None) -> list:
+    """One report spec per region and calendar period with data in [start, end]."""
+    dates = store.consumption['date'].dropna()
+    if dates.empty:
+        return []
+    first = pd.Timestamp(start) if start is not None else dates.min()
+    last = pd.Timestamp(end) if end is not None else dates.max()
+    if regions is None:
+        regions = sorted(store.consumption['region'].dropna().unique())
+    specs = []
+    for p in pd.period_range(first, last, freq=PERIODS[period]):
+        lo, hi = max(p.start_time.normalize(), first.normalize()), min(p.end_time.normalize(), last.normalize())
+        for region in regions:
+            specs.append({'region': region, 'start': lo, 'end': hi, 'label': str(p)})
+    return specs
+
+
+def report_name(spec: dict) -> str:
+    region = str(spec['region'] or 'All').replace(os.sep, '_').replace(' ', '_')
+    if spec.get('start') is None and spec.get('end') is None:
+        return f"demand_{region}"
+    span = '_'.join(f"{pd.Timestamp(d):%Y-%m-%d}" for d in (spec['start'], spec['end']) if d is not None)
+    return f"demand_{region}_{span}"
+
+
+def content_hash(spec: dict, data: pd.DataFrame, formats) -> str:
+    """Fingerprint of everything a report's files depend on."""
+    import plotly
+    digest = hashlib.sha256(json.dumps({
+        'version': RENDER_VERSION, 'plotly': plotly.__version__, 'points': MAX_POINTS, 'method': METHOD,
+        'name': report_name(spec), 'label': spec.get('label'), 'formats': sorted(formats),
+    }, sort_keys=True).encode())
+    columns = data[['date', 'region', 'demand_mw', 'supply_mw']]
+    digest.update(pd.util.hash_pandas_object(columns, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def plotly_asset(out_dir: str) -> str:
+    """Write the plotly.js bundle once per version; reports reference it by path."""
+    import plotly
+    from plotly.offline import get_plotlyjs
+    path = os.path.join(out_dir, ASSET_DIR, f'plotly-{plotly.__version__}.min.js')
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        os.replace(tmp_path, path)
+    return path
+
+
+@traced('figure.report')
+def build_figure(data: pd.DataFrame, title: str):
+    import plotly.graph_objects as go
+    chart = downsample(data, 'date', ['demand_mw', 'supply_mw'], by='region')
+    Trace = go.Scattergl if use_webgl(2 * len(chart)) else go.Scatter
+    fig = go.Figure()
+    for name, part in chart.groupby('region', sort=True, observed=True):
+        fig.add_trace(Trace(x=part['date'], y=part['demand_mw'], mode='lines', name=f'{name} - Demand'))
+        fig.add_trace(Trace(x=part['date'], y=part['supply_mw'], mode='lines', name=f'{name} - Supply', line=dict(dash='dash')))
+    fig.update_layout(title=title, xaxis_title='Date', yaxis_title='Power (MW)', height=500)
+    return fig, len(chart)
+
+
+def _summary_rows(data: pd.DataFrame) -> str:
+    rows = []
+    for name, part in data.groupby('region', sort=True, observed=True):
+        peak = part.loc[part['demand_mw'].idxmax()]
+        gap = part['supply_mw'].astype('int64') - part['demand_mw'].astype('int64')
+        rows.append(f"<tr><td>{html.escape(str(name))}</td><td>{len(part):,}</td><td>{part['demand_mw'].mean():,.0f}</td>"
+                    f"<td>{peak['demand_mw']:,} ({peak['date']:%Y-%m-%d})</td><td>{gap.min():,}</td></tr>")
+    return "".join(rows)
+
+
+def render_report(spec: dict, data: pd.DataFrame, out_dir: str, formats=('html',), asset=None) -> list:
+    """Write one report's files and return their paths.
+
+    The HTML loads plotly.js from the shared ``asset`` instead of embedding
+    the bundle, and every series is downsampled, so a page holds only its
+    own points.
+    """
+    title = f"Demand and Supply - {spec['region'] or 'All regions'}"
+    if spec.get('label'):
+        title += f" - {spec['label']}"
+    fig, points = build_figure(data, title)
+    base = os.path.join(out_dir, report_name(spec))
+    written = []
+    if 'html' in formats:
+        asset = asset or plotly_asset(out_dir)
+        src = os.path.relpath(asset, out_dir).replace(os.sep, '/')
+        body = fig.to_html(full_html=False, include_plotlyjs=False)
+        page = (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+                f"<script src=\"{src}\"></script></head><body>\n<h1>{html.escape(title)}</h1>\n"
+                f"<table><tr><th>Region</th><th>Readings</th><th>Avg demand (MW)</th><th>Peak demand (MW)</th><th>Min supply margin (MW)</th></tr>"
+                f"{_summary_rows(data)}</table>\n"
+                f"<p>{points:,} of {len(data):,} points plotted.</p>\n{body}\n</body></html>\n")
+        tmp_path = f"{base}.html.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(page)
+        os.replace(tmp_path, f"{base}.html")
+        written.append(f"{base}.html")
+    for fmt in formats:
+        if fmt != 'html' and HAS_KALEIDO:
+            fig.write_image(f"{base}.{fmt}")
+            written.append(f"{base}.{fmt}")
+    return written
+
+
+def _render_task(task):
+    spec, out_dir, formats, asset = task
+    started = time.perf_counter()
+    data = _store.select('consumption', spec['region'], spec['start'], spec['end'])
+    return render_report(spec, data, out_dir, formats, asset), time.perf_counter() - started
+
+
+def load_manifest(out_dir: str) -> dict:
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir: str, manifest: dict):
+    path = os.path.join(out_dir, MANIFEST)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_reports(specs: list, out_dir=REPORT_DIR, formats=('html',), workers=None, store=None) -> dict:
+    """Render every spec, skipping reports whose data and settings are unchanged.
+
+    Each report's content hash is checked against the manifest in
+    ``out_dir`` first; only changed or missing reports are rendered, by
+    worker processes forked after the data load so they share the parsed
+    frames. All HTML reports share one plotly.js file under ``assets/``.
+    """
+    started = time.perf_counter()
+    store = store or get_store()
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown report format(s): {', '.join(sorted(unknown))}; expected {', '.join(FORMATS)}")
+    formats = tuple(f for f in formats if f == 'html' or HAS_KALEIDO)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    asset = plotly_asset(out_dir) if 'html' in formats else None
+
+    todo, cached, empty = [], 0, 0
+    for spec in specs:
+        data = store.select('consumption', spec['region'], spec['start'], spec['end'])
+        if data.empty:
+            empty += 1
+            continue
+        name, digest = report_name(spec), content_hash(spec, data, formats)
+        entry = manifest.get(name)
+        if entry and entry['hash'] == digest and all(os.path.exists(p) for p in entry['files']):
+            cached += 1
+            continue
+        todo.append((name, digest, (spec, out_dir, formats, asset)))
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo)))
+    results = {}
+    if workers == 1:
+        _init_worker(store)
+        for name, digest, task in todo:
+            results[name] = (digest, *_render_task(task))
+    else:
+        global _store
+        _store = store
+        with ProcessPoolExecutor(workers, mp_context=pool_context(), initializer=_init_worker) as pool:
+            futures = {pool.submit(_render_task, task): (name, digest) for name, digest, task in todo}
+            for future in as_completed(futures):
+                name, digest = futures[future]
+                results[name] = (digest, *future.result())
+
+    if results:
+        with _manifest_lock:
+            # Re-read so concurrent runs in this process don't drop each other's entries
+            manifest = load_manifest(out_dir)
+            for name, (digest, files, seconds) in results.items():
+                manifest[name] = {'hash': digest, 'files': files, 'seconds': round(seconds, 4)}
+            save_manifest(out_dir, manifest)
+    return {
+        'reports': len(specs), 'rendered': len(results), 'cached': cached, 'empty': empty, 'workers': workers,
+        'formats': list(formats), 'bytes': sum(os.path.getsize(p) for _, files, _ in results.values() for p in files),
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render demand/supply reports per region and period.')
+    parser.add_argument('--period', choices=sorted(PERIODS), default='month')
+    parser.add_argument('--region', action='append', help='limit to this region (repeatable)')
+    parser.add_argument('--start', help='first day (YYYY-MM-DD)')
+    parser.add_argument('--end', help='last day (YYYY-MM-DD)')
+    parser.add_argument('--formats', default='html', help=f"comma-separated, from {', '.join(FORMATS)} (images need kaleido)")
+    parser.add_argument('--out', default=REPORT_DIR, help='output directory')
+    parser.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+    store = get_store()
+    specs = plan_reports(store, args.period, args.region, args.start, args.end)
+    stats = run_reports(specs, args.out, tuple(args.formats.split(',')), args.workers, store)
+    print(f"{stats['rendered']} rendered, {stats['cached']} unchanged, {stats['empty']} without data "
+          f"({stats['bytes'] / 1e6:.1f} MB, {stats['workers']} workers, {stats['seconds']:.2f}s) -> {os.path.abspath(args.out)}")
+    if set(args.formats.split(',')) - set(stats['formats']):
+        print("Static images skipped: install kaleido to export PNG/SVG")
+
+
+if __name__ == "__main__":
+    main()
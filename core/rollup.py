@@ -0,0 +1,344 @@
+# core/rollup.py
+import numpy as np
+import pandas as pd
+
+GRAINS = ('day', 'week', 'month')
+# Resolution pyramid, finest first; 'hour' exists only for sub-hourly data
+LEVELS = ('hour',) + GRAINS
+LEVEL_LABELS = {'raw': 'raw', 'hour': 'hourly', 'day': 'daily', 'week': 'weekly', 'month': 'monthly'}
+# Approximate bucket widths, to estimate a level's points for a span
+BUCKET_DAYS = {'hour': 1 / 24, 'day': 1, 'week': 7, 'month': 30.44}
+MEASURES = ('demand', 'supply', 'gap')
+STATS = ('sum', 'sumsq', 'min', 'max', 'argmax')
+# Cells are sorted by region, then period; region * KEY_STRIDE + period keeps that order.
+KEY_STRIDE = 1 << 32
+
+
+def _day_numbers(dates) -> np.ndarray:
+    return pd.to_datetime(dates).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def _hour_numbers(times) -> np.ndarray:
+    return np.asarray(times).astype('datetime64[h]').astype(np.int64)
+
+
+def sub_hourly(times) -> bool:
+    """True when some reading is not on the hour, e.g. 15-minute interval data."""
+    times = np.asarray(times)
+    times = times[~np.isnat(times)]
+    return bool((times != times.astype('datetime64[h]')).any())
+
+
+def _week_start(days: np.ndarray) -> np.ndarray:
+    # Day 0 (1970-01-01) is a Thursday; weeks start on Monday.
+    return days - (days + 3) % 7
+
+
+def _month_start(days: np.ndarray) -> np.ndarray:
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+
+
+PERIOD_START = {'day': lambda days: days, 'week': _week_start, 'month': _month_start}
+
+
+def _raw_cells(consumption: pd.DataFrame, regions: pd.Index) -> pd.DataFrame:
+    return cells_from_arrays(regions.get_indexer(consumption['region']), pd.to_datetime(consumption['date']).to_numpy(),
+                             consumption['demand_mw'].to_numpy(), consumption['supply_mw'].to_numpy())
+
+
+def cells_from_arrays(region: np.ndarray, time: np.ndarray, demand: np.ndarray, supply: np.ndarray) -> pd.DataFrame:
+    # Each raw reading is a cell of count 1, so raw rows and coarser cells
+    # roll up through the same code path.
+    values = {'demand': demand, 'supply': supply, 'gap': supply - demand}
+    cells = {
+        'region': region,
+        'period': _day_numbers(time),
+        'count': np.ones(len(region), dtype=np.int64),
+    }
+    for measure, value in values.items():
+        # Sum in 64 bits; the stored columns may be narrow integers
+        cells[f'{measure}_sum'] = value.astype(np.int64) if np.issubdtype(value.dtype, np.integer) else value.astype(np.float64)
+        cells[f'{measure}_sumsq'] = value.astype(np.float64) ** 2
+        cells[f'{measure}_min'] = value
+        cells[f'{measure}_max'] = value
+        cells[f'{measure}_argmax'] = time
+    return pd.DataFrame(cells)
+
+
+def day_cells(raw: pd.DataFrame) -> pd.DataFrame:
+    return _combine(raw, raw['period'].to_numpy())
+
+
+def hour_cells(raw: pd.DataFrame) -> pd.DataFrame:
+    # Hour cells count periods in hours since the epoch rather than days
+    return _combine(raw, _hour_numbers(raw['demand_argmax'].to_numpy()))
+
+
+def bucket_days(level: str, first: int, last: int) -> tuple:
+    """The inclusive day range of the whole ``level`` buckets overlapping days first..last."""
+    if level in ('hour', 'day'):
+        return first, last
+    start = PERIOD_START[level]
+    # The next bucket starts within 7 (31) days of the last one's start
+    following = start(start(np.array([last])) + (7 if level == 'week' else 31))
+    return int(start(np.array([first]))[0]), int(following[0]) - 1
+
+
+def pick_level(rows: int, days: int, max_points: int, levels=LEVELS) -> str:
+    """The finest resolution that draws a span of ``days`` in at most ``max_points`` per series.
+
+    ``rows`` is the most readings any one series has in the span; 'raw'
+    when those fit. A level never has more buckets than readings.
+    """
+    if rows <= max_points:
+        return 'raw'
+    for level in levels:
+        if min(rows, int(np.ceil(days / BUCKET_DAYS[level]))) <= max_points:
+            return level
+    return levels[-1]
+
+
+def _combine(cells: pd.DataFrame, period: np.ndarray) -> pd.DataFrame:
+    cells = cells.assign(period=period)
+    grouped = cells.groupby(['region', 'period'], sort=True)
+    agg = {'count': ('count', 'sum')}
+    for measure in MEASURES:
+        agg[f'{measure}_sum'] = (f'{measure}_sum', 'sum')
+        agg[f'{measure}_sumsq'] = (f'{measure}_sumsq', 'sum')
+        agg[f'{measure}_min'] = (f'{measure}_min', 'min')
+        agg[f'{measure}_max'] = (f'{measure}_max', 'max')
+    out = grouped.agg(**agg)
+    # idxmax keeps the first cell reaching the maximum, i.e. the earliest one.
+    for measure in MEASURES:
+        idx = grouped[f'{measure}_max'].idxmax().to_numpy()
+        out[f'{measure}_argmax'] = cells[f'{measure}_argmax'].to_numpy()[cells.index.get_indexer(idx)]
+    return out.reset_index()
+
+
+class RollupCube:
+    """Region x hour/day/week/month aggregates of the consumption data.
+
+    Every cell keeps count, sum, sum of squares, min, max and the time of
+    the max for demand, supply and gap (supply - demand), so a date-range
+    query combines at most a few cells per grain instead of scanning rows.
+    The hour level is kept only for sub-hourly data; for hourly data it
+    would just repeat the readings. ``cells`` takes per-level cells
+    already combined from ``consumption`` (see core.parallel), sorted by
+    region code and period.
+    """
+
+    def __init__(self, consumption: pd.DataFrame, cells=None):
+        self.regions = pd.Index(sorted(consumption['region'].dropna().unique()))
+        self._grains = {}
+        if cells is not None:
+            for level, level_cells in cells.items():
+                self._set(level, level_cells)
+        elif len(consumption) == 0:
+            self._set('day', _raw_cells(consumption, self.regions).iloc[0:0])
+        else:
+            raw = _raw_cells(consumption, self.regions)
+            self._set('day', day_cells(raw))
+            if sub_hourly(raw['demand_argmax'].to_numpy()):
+                self._set('hour', hour_cells(raw))
+        self._rollup_from_days()
+
+    @property
+    def levels(self) -> tuple:
+        return tuple(level for level in LEVELS if level in self._grains)
+
+    def append(self, rows: pd.DataFrame) -> bool:
+        """Fold newly appended readings into the cube.
+
+        Only cells whose period received new rows are recombined. Returns
+        False when the rows introduce an unknown region, or the first
+        sub-hourly readings; the caller should rebuild the cube then.
+        """
+        if len(rows) == 0:
+            return True
+        if not rows['region'].dropna().isin(self.regions).all():
+            return False
+        raw = _raw_cells(rows, self.regions)
+        if 'hour' in self._grains:
+            self._set('hour', self._upsert(self._grains['hour']['cells'], hour_cells(raw)))
+        elif sub_hourly(raw['demand_argmax'].to_numpy()):
+            return False
+        new_days = day_cells(raw)
+        for grain in GRAINS:
+            # Weeks straddle month boundaries, so every grain rolls up from days.
+            new_cells = _combine(new_days, PERIOD_START[grain](new_days['period'].to_numpy()))
+            self._set(grain, self._upsert(self._grains[grain]['cells'], new_cells))
+        return True
+
+    @staticmethod
+    def _upsert(cells: pd.DataFrame, new_cells: pd.DataFrame) -> pd.DataFrame:
+        keys = pd.MultiIndex.from_frame(cells[['region', 'period']])
+        touched = keys.isin(pd.MultiIndex.from_frame(new_cells[['region', 'period']]))
+        # Existing cells come first so ties on the max keep the earlier time.
+        merged = pd.concat([cells[touched], new_cells], ignore_index=True)
+        merged = _combine(merged, merged['period'].to_numpy())
+        out = pd.concat([cells[~touched], merged], ignore_index=True)
+        return out.sort_values(['region', 'period'], kind='stable', ignore_index=True)
+
+    def _set(self, grain: str, cells: pd.DataFrame):
+        region = cells['region'].to_numpy()
+        self._grains[grain] = {
+            'cells': cells,
+            'period': cells['period'].to_numpy(),
+            'keys': region.astype(np.int64) * KEY_STRIDE + cells['period'].to_numpy(),
+            'arrays': {column: cells[column].to_numpy() for column in cells.columns},
+        }
+
+    def _rollup_from_days(self):
+        days = self._grains['day']['cells']
+        for grain in GRAINS[1:]:
+            if len(days) == 0:
+                self._set(grain, days)
+            else:
+                self._set(grain, _combine(days, PERIOD_START[grain](days['period'].to_numpy())))
+
+    @property
+    def day_range(self):
+        period = self._grains['day']['period']
+        if len(period) == 0:
+            return None
+        return int(period.min()), int(period.max())
+
+    def _cover(self, first: int, last: int):
+        # Split the inclusive day range into whole months, then whole weeks,
+        # then leftover days: at most seven contiguous period ranges.
+        ranges = []
+        month_lo = _month_start(np.array([first]))[0]
+        if month_lo < first:
+            month_lo = _month_start(np.array([month_lo + 31]))[0]
+        month_hi = _month_start(np.array([last + 1]))[0]
+        if month_lo < month_hi:
+            ranges.extend(self._cover_weeks(first, month_lo - 1))
+            ranges.append(('month', month_lo, _month_start(np.array([month_hi - 1]))[0]))
+            ranges.extend(self._cover_weeks(month_hi, last))
+        else:
+            ranges.extend(self._cover_weeks(first, last))
+        return ranges
+
+    def _cover_weeks(self, first: int, last: int):
+        if first > last:
+            return []
+        week_lo = _week_start(np.array([first + 6]))[0]
+        week_hi = _week_start(np.array([last + 1]))[0]
+        if week_lo >= week_hi:
+            return [('day', first, last)]
+        ranges = [('week', week_lo, week_hi - 7)]
+        if first < week_lo:
+            ranges.insert(0, ('day', first, week_lo - 1))
+        if week_hi <= last:
+            ranges.append(('day', week_hi, last))
+        return ranges
+
+    def span(self, start=None, end=None):
+        """Inclusive (first, last) day numbers of the data within [start, end], or None."""
+        day_range = self.day_range
+        if day_range is None:
+            return None
+        first = day_range[0] if start is None else max(day_range[0], int(_day_numbers([start])[0]))
+        last = day_range[1] if end is None else min(day_range[1], int(_day_numbers([end])[0]))
+        return (first, last) if first <= last else None
+
+    def _codes(self, region) -> np.ndarray:
+        if region is None or region == 'All':
+            return np.arange(len(self.regions), dtype=np.int64)
+        if region in self.regions:
+            return np.array([self.regions.get_loc(region)], dtype=np.int64)
+        return np.array([], dtype=np.int64)
+
+    def _take(self, grain: str, codes: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        # Positions of every region's cells with period in [lo, hi], region by region
+        g = self._grains[grain]
+        i = np.searchsorted(g['keys'], codes * KEY_STRIDE + lo, side='left')
+        j = np.searchsorted(g['keys'], codes * KEY_STRIDE + hi, side='right')
+        lengths = j - i
+        # Concatenated aranges i[k]..j[k] for every region at once.
+        offsets = np.cumsum(lengths) - lengths
+        return np.repeat(i - offsets, lengths) + np.arange(lengths.sum())
+
+    def query(self, region=None, start=None, end=None) -> pd.DataFrame:
+        """Aggregates per region over the inclusive date range, sorted by region."""
+        columns = ['count'] + [f'{m}_{s}' for m in MEASURES for s in STATS]
+        empty = pd.DataFrame(columns=columns, index=pd.Index([], name='region'))
+        span, codes = self.span(start, end), self._codes(region)
+        if span is None or len(codes) == 0:
+            return empty
+
+        picked = {column: [] for column in columns}
+        picked['region'] = []
+        for grain, lo, hi in self._cover(*span):
+            idx = self._take(grain, codes, lo, hi)
+            if len(idx):
+                for column in picked:
+                    picked[column].append(self._grains[grain]['arrays'][column][idx])
+        if not picked['region']:
+            return empty
+        return self._reduce({column: np.concatenate(parts) for column, parts in picked.items()}, columns)
+
+    def series(self, level: str, region=None, start=None, end=None) -> pd.DataFrame:
+        """Demand and supply per ``level`` bucket: count, mean, min and max.
+
+        Buckets overlapping the inclusive date range are returned whole, in
+        region then time order, with the bucket start as ``date`` and the
+        means as ``demand_mw``/``supply_mw``.
+        """
+        span, codes = self.span(start, end), self._codes(region)
+        idx = np.array([], dtype=np.int64)
+        if span is not None and len(codes):
+            first, last = bucket_days(level, *span)
+            idx = self._take(level, codes, first * 24, last * 24 + 23) if level == 'hour' else self._take(level, codes, first, last)
+        arrays = self._grains[level]['arrays']
+        unit = 'datetime64[h]' if level == 'hour' else 'datetime64[D]'
+        count = arrays['count'][idx]
+        out = {
+            'date': arrays['period'][idx].astype(unit).astype('datetime64[ns]'),
+            'region': self.regions[arrays['region'][idx]],
+            'count': count,
+        }
+        for measure in ('demand', 'supply'):
+            out[f'{measure}_mw'] = arrays[f'{measure}_sum'][idx] / count
+            out[f'{measure}_mw_min'] = arrays[f'{measure}_min'][idx]
+            out[f'{measure}_mw_max'] = arrays[f'{measure}_max'][idx]
+        return pd.DataFrame(out)
+
+    def _reduce(self, cells: dict, columns: list) -> pd.DataFrame:
+        present, region = np.unique(cells['region'], return_inverse=True)
+        n = len(present)
+
+        def total(values):
+            out = np.bincount(region, weights=values, minlength=n)
+            return out.astype(values.dtype) if np.issubdtype(values.dtype, np.integer) else out
+
+        def extreme(values, ufunc):
+            out = values[np.unique(region, return_index=True)[1]].copy()
+            ufunc.at(out, region, values)
+            return out
+
+        out = {'count': total(cells['count'])}
+        for measure in MEASURES:
+            maxes = extreme(cells[f'{measure}_max'], np.maximum)
+            out[f'{measure}_sum'] = total(cells[f'{measure}_sum'])
+            out[f'{measure}_sumsq'] = total(cells[f'{measure}_sumsq'])
+            out[f'{measure}_min'] = extreme(cells[f'{measure}_min'], np.minimum)
+            out[f'{measure}_max'] = maxes
+            # Earliest time among the cells that reach the region's maximum.
+            top = cells[f'{measure}_max'] == maxes[region]
+            times = cells[f'{measure}_argmax']
+            argmax = np.full(n, np.iinfo(np.int64).max)
+            np.minimum.at(argmax, region[top], times[top].view(np.int64))
+            out[f'{measure}_argmax'] = argmax.view(times.dtype)
+        return pd.DataFrame(out, columns=columns, index=pd.Index(self.regions[present], name='region'))
+
+
+def mean(agg: pd.DataFrame, measure: str) -> pd.Series:
+    return agg[f'{measure}_sum'] / agg['count']
+
+
+def std(agg: pd.DataFrame, measure: str) -> pd.Series:
+    n = agg['count'].astype(np.float64)
+    total = agg[f'{measure}_sum'].astype(np.float64)
+    var = (agg[f'{measure}_sumsq'] - total ** 2 / n) / (n - 1)
+    return np.sqrt(var.clip(lower=0).where(n > 1))
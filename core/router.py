@@ -0,0 +1,195 @@
+# core/router.py
+import calendar
+import re
+import pandas as pd
+from core.result_cache import ResultCache
+from core.telemetry import traced
+
+DEFAULT_REGIONS = ('North', 'South', 'East', 'West')
+
+OUTAGE = r"(?:outage|blackout|power cut|interruption)s?"
+# "like" introduces an incident description, but not in "look like" or "would like"
+SIMILAR_WORDS = rf"(?:similar (?:{OUTAGE} )?to|(?<!look )(?<!looks )(?<!would )like|resembling|related to|involving|mentioning)"
+
+# Checked in order; the first intent whose pattern matches wins.
+INTENT_PATTERNS = [
+    ("similar_outages", [rf"{OUTAGE}.*\b{SIMILAR_WORDS}\s+\w", r"\bsimilar to\s+\w", rf"\bsimilar {OUTAGE}"]),
+    ("insights", [r"\b(?:explain|interpret|insights?|recommend\w*|advi[cs]e)\b", r"\bwhy\b"]),
+    ("forecast", [r"forecast|predict|projection|outlook", r"\b(?:next|coming) (?:\d+ )?(?:days?|weeks?|months?)\b", r"\btomorrow\b"]),
+    ("outages_at_peak", [rf"{OUTAGE}.*\b(?:peak|high(?:est)? (?:demand|load))", rf"\bpeak.*{OUTAGE}"]),
+    ("unserved_demand", [r"unserved|lost load|not (?:served|supplied)", rf"(?:demand|load|energy).*(?:during|lost to|from) {OUTAGE}"]),
+    ("anomalies", [r"anomal|abnormal|unusual|outliers?", r"\b(?:spikes?|alerts?|alarms?)\b"]),
+    ("percentiles", [r"percentile|quantile|\bmedian\b", r"\bp\d{1,2}\b"]),
+    ("peak_demand", [r"peak (?:demand|load)", r"\b(?:highest|maximum|max) (?:demand|load)"]),
+    ("outages_by_region", [rf"{OUTAGE}.*(?:region|\barea)", rf"(?:region|\barea).*{OUTAGE}"]),
+    ("gap", [r"gap", r"\b(?:shortfall|deficit|surplus)\b", r"demand.*supply|supply.*demand"]),
+    ("plot", [r"plot", r"visual", r"\b(?:chart|graph)s?\b"]),
+    ("summary", [r"summary", r"report", r"\b(?:overview|summari[sz]e)\b"]),
+    ("outage_totals", [OUTAGE]),
+]
+
+# Intents that only apply when the query also supplies these entities
+REQUIRED_ENTITIES = {"similar_outages": ("text",)}
+
+INTENT_DESCRIPTIONS = {
+    "similar_outages": "past outages similar to a described incident",
+    "insights": "an explanation of the figures with recommendations",
+    "forecast": "predicted future demand",
+    "outages_at_peak": "outages that overlapped periods of peak demand",
+    "unserved_demand": "demand or energy affected by outages",
+    "anomalies": "demand spikes and supply-deficit alerts",
+    "percentiles": "percentiles of demand such as the median or p95",
+    "peak_demand": "when and where the highest electricity demand occurred",
+    "outages_by_region": "outage counts and durations per region",
+    "gap": "difference between supply and demand",
+    "plot": "a chart or visualization of demand",
+    "summary": "an overall summary report",
+    "outage_totals": "total number and duration of outages",
+}
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+
+ISO_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+MONTH_YEAR = re.compile(rf"\b({'|'.join(sorted(MONTHS, key=len, reverse=True))})\.?\s+(\d{{4}})\b")
+YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+QUARTER = re.compile(r"\bq([1-4]) (\d{4})\b|\b(first|second|third|fourth|1st|2nd|3rd|4th) quarter(?: of)? (\d{4})\b")
+QUARTER_NUMBERS = {'first': 1, 'second': 2, 'third': 3, 'fourth': 4, '1st': 1, '2nd': 2, '3rd': 3, '4th': 4}
+# Relative to the reference date (the latest reading): "last quarter" is the previous full
+# quarter, "this quarter" the current one so far
+RECENT = re.compile(r"\b(last|previous|past|this|current|latest|recent) (quarter|month|year)\b")
+PREVIOUS = {'last', 'previous', 'past'}
+RECENT_PERIODS = {'quarter': pd.offsets.QuarterBegin(startingMonth=1), 'month': pd.offsets.MonthBegin(), 'year': pd.offsets.YearBegin()}
+SIMILAR = re.compile(rf"\b{SIMILAR_WORDS}\s+(.+)")
+FILLER = re.compile(r"^(?:(?:the|a|an|one|ones|that|those|this)\s+)+|(?:\s+(?:in|for|during|from|on|at|since|of|the))+$")
+PERCENTILE = re.compile(r"\bp(\d{1,2})\b|\b(\d{1,2})(?:st|nd|rd|th)? percentile|\b(median)\b")
+HORIZON = re.compile(r"\b(?:next|coming) (\d+ )?(day|week|month)s?\b|\b(tomorrow)\b")
+HORIZON_DAYS = {'day': 1, 'week': 7, 'month': 30}
+PUNCTUATION = re.compile(r"[^\w\s-]")
+SPACES = re.compile(r"\s+")
+
+
+class IntentRouter:
+    """Maps free-text queries to an intent plus region/date filters.
+
+    Patterns are compiled once, so known phrasings route with a few regex
+    searches. Only queries no pattern recognises go to the LLM, and its
+    classification is memoised on the normalised query text. Pass
+    ``llm_factory`` instead of ``llm`` to create the client on first use.
+    Relative periods are counted back from ``reference()``, today by
+    default: "last quarter" is the previous full quarter, "this quarter"
+    the current one up to the reference date.
+    """
+
+    def __init__(self, llm=None, regions=DEFAULT_REGIONS, intent_patterns=INTENT_PATTERNS, llm_factory=None, reference=None):
+        self._llm = llm
+        self.llm_factory = llm_factory
+        self.reference = reference or pd.Timestamp.today
+        self.intents = [(intent, re.compile("|".join(f"(?:{p})" for p in patterns))) for intent, patterns in intent_patterns]
+        self.set_regions(regions)
+        self.llm_cache = ResultCache(max_entries=4096, ttl=None)
+        self.llm_calls = 0
+
+    @property
+    def llm(self):
+        if self._llm is None and self.llm_factory is not None:
+            self._llm = self.llm_factory()
+        return self._llm
+
+    def set_regions(self, regions):
+        self.regions = {r.lower(): r for r in regions}
+        names = "|".join(re.escape(r) for r in sorted(self.regions, key=len, reverse=True))
+        self._region = re.compile(rf"\b({names})\b") if names else None
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return SPACES.sub(" ", PUNCTUATION.sub(" ", query.lower())).strip()
+
+    @traced
+    def route(self, query: str) -> dict:
+        text = self.normalize(query)
+        route = {"intent": None, "source": None}
+        route.update(self.extract_entities(text))
+        for intent, pattern in self.intents:
+            if pattern.search(text) and all(route[name] is not None for name in REQUIRED_ENTITIES.get(intent, ())):
+                route["intent"], route["source"] = intent, "rules"
+                return route
+        if text and (self._llm is not None or self.llm_factory is not None):
+            route["intent"] = self.classify_with_llm(text)
+            route["source"] = "llm" if route["intent"] else None
+        return route
+
+    def extract_entities(self, text: str) -> dict:
+        region = None
+        if self._region is not None:
+            match = self._region.search(text)
+            if match:
+                region = self.regions[match.group(1)]
+
+        start = end = None
+        dates = ISO_DATE.findall(text)
+        quarter = QUARTER.search(text)
+        month = MONTH_YEAR.search(text)
+        recent = RECENT.search(text)
+        if dates:
+            start, end = pd.Timestamp(min(dates)), pd.Timestamp(max(dates))
+        elif quarter:
+            number = int(quarter.group(1)) if quarter.group(1) else QUARTER_NUMBERS[quarter.group(3)]
+            start = pd.Timestamp(year=int(quarter.group(2) or quarter.group(4)), month=3 * number - 2, day=1)
+            end = start + pd.offsets.QuarterEnd(0)
+        elif month:
+            start = pd.Timestamp(year=int(month.group(2)), month=MONTHS[month.group(1)], day=1)
+            end = start + pd.offsets.MonthEnd(0)
+        elif recent and pd.notna(self.reference()):
+            end = pd.Timestamp(self.reference()).normalize()
+            period = RECENT_PERIODS[recent.group(2)]
+            start = period.rollback(end)
+            if recent.group(1) in PREVIOUS:
+                start, end = start - period, start - pd.Timedelta(days=1)
+        else:
+            years = YEAR.findall(text)
+            if years:
+                start = pd.Timestamp(year=int(min(years)), month=1, day=1)
+                end = pd.Timestamp(year=int(max(years)), month=12, day=31)
+
+        days = None
+        horizon = HORIZON.search(text)
+        if horizon:
+            days = 1 if horizon.group(3) else int(horizon.group(1) or 1) * HORIZON_DAYS[horizon.group(2)]
+        search = None
+        similar = SIMILAR.search(text)
+        if similar:
+            search = similar.group(1)
+            # Keep only the incident description: drop filters that were parsed above
+            for pattern in (self._region, ISO_DATE, QUARTER, MONTH_YEAR, RECENT, YEAR):
+                if pattern is not None:
+                    search = pattern.sub(" ", search)
+            search = FILLER.sub("", SPACES.sub(" ", search).strip()) or None
+
+        percentiles = None
+        found = PERCENTILE.findall(text)
+        if found:
+            percentiles = tuple(sorted({50 if median else int(p or q) for p, q, median in found}))
+        return {"region": region, "start": start, "end": end, "days": days, "percentiles": percentiles, "text": search}
+
+    def classify_with_llm(self, text: str):
+        missing = object()
+        cached = self.llm_cache.get(text, missing)
+        if cached is not missing:
+            return cached
+        options = "\n".join(f"- {intent}: {desc}" for intent, desc in INTENT_DESCRIPTIONS.items())
+        prompt = (
+            "Classify the user's question about an electricity grid into exactly one category.\n"
+            f"{options}\n- unknown: none of the above\n\n"
+            f"Question: {text}\nAnswer with the category name only."
+        )
+        try:
+            self.llm_calls += 1
+            answer = str(self.llm.invoke(prompt)).lower()
+        except Exception:
+            # Model unavailable: treat as unrecognised, but don't memoise so a
+            # later call can still reach the model.
+            return None
+        intent = next((name for name in INTENT_DESCRIPTIONS if name in answer), None)
+        self.llm_cache.put(text, intent)
+        return intent
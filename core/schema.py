@@ -0,0 +1,139 @@
+# core/schema.py
+import calendar
+import numpy as np
+import pandas as pd
+
+WEEKDAYS = pd.CategoricalDtype(list(calendar.day_name), ordered=True)
+MONTHS = pd.CategoricalDtype(list(calendar.month_name)[1:], ordered=True)
+SEVERITIES = pd.CategoricalDtype(['Low', 'Medium', 'High', 'Critical'], ordered=True)
+
+# Column -> dtype. 'category' columns take their categories from the data;
+# CategoricalDtype columns only accept the listed values.
+SCHEMAS = {
+    'consumption': {
+        'date': 'datetime64[ns]',
+        'region': 'category',
+        'demand_mw': 'int32',
+        'supply_mw': 'int32',
+        'hour': 'int8',
+        'day_of_week': WEEKDAYS,
+        'month': MONTHS,
+        'temperature': 'float32',
+    },
+    'outages': {
+        'date': 'datetime64[ns]',
+        'region': 'category',
+        'duration_hours': 'int16',
+        'cause': 'category',
+        'description': 'category',
+        'affected_customers': 'int32',
+        'severity': SEVERITIES,
+    },
+}
+
+# Columns filled in when a file doesn't have them, so interval data with just
+# timestamps, regions and readings (e.g. a SCADA export) loads as is
+DERIVED = {
+    'consumption': {
+        'hour': lambda df: df['date'].dt.hour,
+        'day_of_week': lambda df: df['date'].dt.day_name(),
+        'month': lambda df: df['date'].dt.month_name(),
+        'temperature': lambda df: pd.Series(np.nan, index=df.index),
+    },
+    'outages': {},
+}
+
+# Inclusive (low, high) bounds; None leaves that side open
+RANGES = {
+    'consumption': {'demand_mw': (0, None), 'supply_mw': (0, None), 'hour': (0, 23)},
+    'outages': {'duration_hours': (0, None), 'affected_customers': (0, None)},
+}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def _examples(values: pd.Series) -> str:
+    return ', '.join(repr(v) for v in values.unique()[:3])
+
+
+def _coerce(values: pd.Series, dtype, name: str, column: str) -> pd.Series:
+    if isinstance(dtype, pd.CategoricalDtype):
+        if values.dtype == dtype:
+            return values
+        out = values.astype(dtype)
+        bad = out.isna() & values.notna()
+        if bad.any():
+            raise SchemaError(f"{name}.{column}: unexpected values {_examples(values[bad])}; expected one of {', '.join(dtype.categories)}")
+        return out
+
+    if dtype == 'category':
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+
+    if dtype.startswith('datetime64'):
+        if values.dtype == dtype:
+            return values
+        out = pd.to_datetime(values, errors='coerce')
+        bad = out.isna() & values.notna()
+        if bad.any():
+            raise SchemaError(f"{name}.{column}: unparseable dates {_examples(values[bad])}")
+        return out.astype(dtype)
+
+    if values.dtype == dtype:
+        return values
+    numbers = pd.to_numeric(values, errors='coerce')
+    bad = numbers.isna() & values.notna()
+    if bad.any():
+        raise SchemaError(f"{name}.{column}: non-numeric values {_examples(values[bad])}")
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        if numbers.isna().any():
+            raise SchemaError(f"{name}.{column}: {int(numbers.isna().sum())} missing values in an integer column")
+        info = np.iinfo(dtype)
+        if len(numbers) and (numbers.min() < info.min or numbers.max() > info.max):
+            raise SchemaError(f"{name}.{column}: values outside the {dtype} range [{info.min}, {info.max}]")
+        if (numbers % 1 != 0).any():
+            raise SchemaError(f"{name}.{column}: fractional values in an integer column")
+    return numbers.astype(dtype)
+
+
+def apply_schema(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Cast ``df`` to the declared schema of dataset ``name``, validating as it goes.
+
+    Raises SchemaError when a required column is missing or a value cannot
+    be represented exactly (unparseable dates, unknown category values,
+    fractional or out-of-range integers). Missing DERIVED columns are
+    computed from the others; columns not in the schema are kept unchanged.
+    """
+    schema = SCHEMAS[name]
+    derived = DERIVED[name]
+    missing = [column for column in schema if column not in df.columns and column not in derived]
+    if missing:
+        raise SchemaError(f"{name}: missing column(s) {', '.join(missing)}")
+
+    out = df.copy(deep=False)
+    for column, dtype in schema.items():
+        if column in df.columns:
+            out[column] = _coerce(df[column], dtype, name, column)
+    for column, derive in derived.items():
+        if column not in df.columns:
+            out[column] = _coerce(derive(out), schema[column], name, column)
+    for column, (low, high) in RANGES[name].items():
+        values = out[column]
+        if (low is not None and (values < low).any()) or (high is not None and (values > high).any()):
+            raise SchemaError(f"{name}.{column}: values outside [{low}, {'' if high is None else high}]")
+    return out
+
+
+def concat_rows(frame: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """Append schema-typed ``rows`` to ``frame`` without losing categorical dtypes."""
+    rows = rows.copy(deep=False)
+    for column in frame.columns:
+        dtype = frame[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype) and isinstance(rows[column].dtype, pd.CategoricalDtype):
+            new = rows[column].cat.categories.difference(dtype.categories)
+            if len(new):
+                frame = frame.assign(**{column: frame[column].cat.add_categories(new)})
+                dtype = frame[column].dtype
+            rows[column] = rows[column].astype(dtype)
+    return pd.concat([frame, rows], ignore_index=True)
@@ -0,0 +1,347 @@
+# core/telemetry.py
+import bisect
+import contextlib
+import functools
+import inspect
+import math
+import os
+import sys
+import threading
+import time
+
+# "0" turns span timing off; traces and the profiler still work when asked for
+TELEMETRY_ENV = 'EMS_TELEMETRY'
+ENABLED = os.environ.get(TELEMETRY_ENV, '1') != '0'
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SPAN_METRIC = 'ems_span_seconds'
+SPAN_ERRORS = 'ems_span_errors_total'
+PROFILE_INTERVAL = 0.005
+PROFILE_TOP = 20
+
+_local = threading.local()
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Observation counts per latency bucket, with their sum and maximum."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        # Linear within the bucket holding the rank, as Prometheus' histogram_quantile
+        if not self.count:
+            return math.nan
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return self.max
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms, exported as JSON or Prometheus text."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.help = {
+            SPAN_METRIC: 'Seconds spent in instrumented code, by span',
+            SPAN_ERRORS: 'Spans that ended with an exception',
+        }
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        self.observe_key((name, _labels(labels)), seconds)
+
+    def observe_key(self, key: tuple, seconds: float):
+        # For hot callers that build the (name, labels) key once
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = []
+            for (name, labels), h in sorted(self.histograms.items()):
+                histograms.append({
+                    'name': name, 'labels': dict(labels), 'count': h.count, 'sum_seconds': h.sum,
+                    'mean_ms': h.sum / h.count * 1000, 'p50_ms': h.quantile(0.5) * 1000,
+                    'p95_ms': h.quantile(0.95) * 1000, 'p99_ms': h.quantile(0.99) * 1000, 'max_ms': h.max * 1000,
+                })
+        return {'counters': counters, 'histograms': histograms}
+
+    def spans(self) -> list:
+        """Per-span latency summaries, slowest total time first."""
+        rows = [dict(h['labels'], **{k: v for k, v in h.items() if k not in ('name', 'labels')})
+                for h in self.snapshot()['histograms'] if h['name'] == SPAN_METRIC]
+        return sorted(rows, key=lambda row: -row['sum_seconds'])
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines, described = [], set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self.help:
+                    lines.append(f'# HELP {name} {self.help[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name, 'counter')
+                lines.append(f'{name}{_label_text(labels)} {value}')
+            for (name, labels), h in sorted(self.histograms.items()):
+                header(name, 'histogram')
+                cumulative = 0
+                for bound, n in zip([repr(float(b)) for b in h.buckets] + ['+Inf'], h.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{_label_text(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{_label_text(labels)} {h.sum!r}')
+                lines.append(f'{name}_count{_label_text(labels)} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class Trace:
+    """The spans one thread opened while the trace was active, in start order with their depth.
+
+    ``profile`` holds the sampling profiler's hottest functions when the
+    trace was started with ``profile=True``.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.spans = []
+        self.depth = 0
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.profile = None
+        self.samples = 0
+
+    def open(self, name: str) -> dict:
+        entry = {'span': name, 'depth': self.depth, 'start_ms': (time.perf_counter() - self.started) * 1000, 'ms': None}
+        self.spans.append(entry)
+        self.depth += 1
+        return entry
+
+    def close(self, entry: dict, seconds: float):
+        self.depth -= 1
+        entry['ms'] = seconds * 1000
+
+    def to_json(self) -> dict:
+        return {'name': self.name, 'ms': None if self.seconds is None else self.seconds * 1000,
+                'spans': self.spans, 'profile': self.profile, 'samples': self.samples}
+
+    def text(self) -> str:
+        lines = [f"Trace {self.name!r}: {(self.seconds or 0) * 1000:,.1f} ms"]
+        for entry in self.spans:
+            ms = f"{entry['ms']:>10,.1f} ms" if entry['ms'] is not None else f"{'open':>13}"
+            lines.append(f"  {ms}  {'  ' * entry['depth']}{entry['span']}")
+        if self.profile is not None:
+            lines.append(f"Profile ({self.samples:,} stack samples):")
+            lines.append(f"  {'own':>6} {'total':>6}  function")
+            for row in self.profile:
+                lines.append(f"  {row['own_pct']:>5.1f}% {row['total_pct']:>5.1f}%  {row['function']}")
+        return '\n'.join(lines)
+
+
+class _Span:
+    __slots__ = ('name', 'trace', 'entry', 'started')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = getattr(_local, 'trace', None)
+        self.entry = self.trace.open(self.name) if self.trace is not None else None
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        if self.entry is not None:
+            self.trace.close(self.entry, seconds)
+        if ENABLED:
+            key = _span_keys.get(self.name)
+            if key is None:
+                key = _span_keys[self.name] = (SPAN_METRIC, _labels({'span': self.name}))
+            metrics.observe_key(key, seconds)
+            if exc_type is not None and exc_type is not GeneratorExit:
+                metrics.inc(SPAN_ERRORS, span=self.name)
+        return False
+
+
+_NO_SPAN = contextlib.nullcontext()
+_span_keys = {}
+
+
+def span(name: str):
+    """Time the enclosed block into the ``ems_span_seconds`` histogram under ``name``."""
+    if not ENABLED and getattr(_local, 'trace', None) is None:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def traced(name=None):
+    """Decorator running each call of the function in a span, named after it by default.
+
+    Generator functions are timed until they are exhausted or closed.
+    """
+    if callable(name):
+        return traced()(name)
+
+    def decorate(func):
+        label = name or func.__qualname__
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with span(label):
+                    yield from func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with span(label):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _where(code) -> str:
+    path = code.co_filename
+    relative = os.path.relpath(path) if os.path.isabs(path) else path
+    if relative.startswith('..'):
+        relative = os.path.join(*path.split(os.sep)[-2:])
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({relative}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every ``interval`` seconds from a background thread.
+
+    The profiled code runs unmodified, so the overhead is one stack walk
+    per sample rather than a hook on every call. ``own`` counts samples
+    where a function was running, ``total`` samples where it was anywhere
+    on the stack.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = 0
+        self.own = {}
+        self.total = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.thread_id = self.thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ems-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.own[frame.f_code] = self.own.get(frame.f_code, 0) + 1
+            seen = set()
+            while frame is not None:
+                if frame.f_code not in seen:
+                    seen.add(frame.f_code)
+                    self.total[frame.f_code] = self.total.get(frame.f_code, 0) + 1
+                frame = frame.f_back
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def top(self, limit=PROFILE_TOP) -> list:
+        """The functions with the most samples of their own, then on the stack."""
+        # The span wrappers are on every traced stack and say nothing about the code
+        codes = [code for code in self.total if code.co_filename != __file__]
+        codes = sorted(codes, key=lambda code: (-self.own.get(code, 0), -self.total[code]))[:limit]
+        samples = max(self.samples, 1)
+        return [{'function': _where(code), 'own': self.own.get(code, 0), 'total': self.total[code],
+                 'own_pct': 100 * self.own.get(code, 0) / samples, 'total_pct': 100 * self.total[code] / samples}
+                for code in codes]
+
+
+@contextlib.contextmanager
+def trace(name: str, profile=False, interval=PROFILE_INTERVAL):
+    """Record the spans this thread opens inside the block, and optionally sample its stack.
+
+    Yields the ``Trace``; its ``seconds`` and ``profile`` are filled in
+    when the block exits.
+    """
+    current = Trace(name)
+    previous = getattr(_local, 'trace', None)
+    profiler = SamplingProfiler(interval) if profile else None
+    _local.trace = current
+    try:
+        if profiler is not None:
+            profiler.start()
+        with span(name):
+            yield current
+    finally:
+        current.seconds = time.perf_counter() - current.started
+        if profiler is not None:
+            profiler.stop()
+            current.profile, current.samples = profiler.top(), profiler.samples
+        _local.trace = previous
@@ -1,76 +1,16 @@
 # generate_data.py - Run this script to create large datasets
-import pandas as pd
+import argparse
+import os
 import numpy as np
-from datetime import datetime, timedelta
-
-# Set random seed for reproducibility
-np.random.seed(42)
-
-# Generate dates for a full year
-start_date = datetime(2024, 1, 1)
-dates = [start_date + timedelta(days=x) for x in range(365)]
-
-# Regions
-regions = ['North', 'South', 'East', 'West']
-
-# Generate consumption data
-consumption_data = []
-
-for date in dates:
-    for region in regions:
-        # Different base demands for different regions
-        base_demand = {
-            'North': 1200,
-            'South': 900,
-            'East': 1000,
-            'West': 700
-        }
-        
-        # Add seasonal variation
-        month = date.month
-        if month in [6, 7, 8]:  # Summer - higher demand
-            seasonal_factor = 1.3
-        elif month in [12, 1, 2]:  # Winter - higher demand
-            seasonal_factor = 1.2
-        else:
-            seasonal_factor = 1.0
-        
-        # Add day of week variation
-        if date.weekday() < 5:  # Weekday
-            weekday_factor = 1.1
-        else:  # Weekend
-            weekday_factor = 0.85
-        
-        # Random variation
-        random_factor = np.random.uniform(0.9, 1.1)
-        
-        # Calculate demand
-        demand = int(base_demand[region] * seasonal_factor * weekday_factor * random_factor)
-        
-        # Supply is usually 5-10% higher than demand
-        supply = int(demand * np.random.uniform(1.05, 1.10))
-        
-        # Random hour (peak hours are more common)
-        hour = np.random.choice([10, 11, 12, 13, 14, 15, 16, 17, 18], p=[0.08, 0.1, 0.12, 0.15, 0.18, 0.15, 0.12, 0.08, 0.02])
-        
-        consumption_data.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'region': region,
-            'demand_mw': demand,
-            'supply_mw': supply,
-            'hour': hour,
-            'day_of_week': date.strftime('%A'),
-            'month': date.strftime('%B'),
-            'temperature': np.random.randint(15, 35) if month in [5, 6, 7, 8, 9] else np.random.randint(-5, 20)
-        })
-
-# Create DataFrame
-df_consumption = pd.DataFrame(consumption_data)
-df_consumption.to_csv('data/consumption_logs.csv', index=False)
-print(f"Generated {len(df_consumption)} consumption records")
-
-# Generate outage data
-outage_causes = [
+import pandas as pd
+
+REGIONS = ['North', 'South', 'East', 'West']
+BASE_DEMAND = {'North': 1200, 'South': 900, 'East': 1000, 'West': 700}
+
+PEAK_HOURS = np.array([10, 11, 12, 13, 14, 15, 16, 17, 18])
+PEAK_HOUR_P = [0.08, 0.1, 0.12, 0.15, 0.18, 0.15, 0.12, 0.08, 0.02]
+
+OUTAGE_CAUSES = [
     'Equipment Failure',
     'Weather',
     'Maintenance',
@@ -83,7 +23,7 @@ outage_causes = [
     'Cyber Attack'
 ]
 
-outage_descriptions = {
+OUTAGE_DESCRIPTIONS = {
     'Equipment Failure': [
         'Transformer malfunction at substation',
         'Circuit breaker failure',
@@ -139,44 +79,205 @@ outage_descriptions = {
     ]
 }
 
-outage_data = []
-
-# Generate 200-300 random outages throughout the year
-num_outages = np.random.randint(200, 300)
-
-for _ in range(num_outages):
-    date = np.random.choice(dates)
-    region = np.random.choice(regions)
-    cause = np.random.choice(outage_causes)
-    description = np.random.choice(outage_descriptions[cause])
-    
-    # Duration varies by cause
-    if cause == 'Maintenance':
-        duration = np.random.randint(2, 8)
-    elif cause in ['Weather', 'Natural Disaster']:
-        duration = np.random.randint(4, 24)
-    elif cause == 'Grid Overload':
-        duration = np.random.randint(1, 4)
+# Duration range [low, high) in hours by cause
+OUTAGE_DURATIONS = {
+    'Maintenance': (2, 8),
+    'Weather': (4, 24),
+    'Natural Disaster': (4, 24),
+    'Grid Overload': (1, 4),
+}
+DEFAULT_DURATION = (1, 12)
+
+SEVERITIES = ['Low', 'Medium', 'High', 'Critical']
+SEVERITY_P = [0.3, 0.4, 0.2, 0.1]
+
+# ~250 outages a year across the four default regions
+DEFAULT_OUTAGE_RATE = 250 / (365 * 4)
+
+# Typical load shape over the day, peaking mid-afternoon (mean 1.0)
+HOURLY_PROFILE = 1.0 + 0.25 * np.sin((np.arange(24) - 9) * np.pi / 12)
+
+
+def make_regions(count: int, seed: int):
+    names = REGIONS[:count] + [f'Region{i:03d}' for i in range(len(REGIONS) + 1, count + 1)]
+    rng = np.random.default_rng([seed, 0])
+    extra = rng.integers(600, 1300, size=max(0, count - len(REGIONS)))
+    base = np.array([BASE_DEMAND[r] for r in names[:len(REGIONS)]] + list(extra), dtype=np.float64)
+    return names, base
+
+
+def month_starts(start: str, years: float):
+    start = pd.Timestamp(start)
+    end = start + pd.DateOffset(days=int(round(365 * years)))
+    bounds = list(pd.date_range(start.to_period('M').to_timestamp(), end, freq='MS'))
+    edges = [start] + [b for b in bounds if b > start] + [end]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+# Reading interval per granularity; sub-daily data follows HOURLY_PROFILE
+FREQUENCIES = {'daily': 'D', 'hourly': 'h', '15min': '15min'}
+
+
+def consumption_chunk(rng, lo, hi, names, base, granularity):
+    freq = FREQUENCIES[granularity]
+    times = pd.date_range(lo, hi, freq=freq, inclusive='left')
+    n_t, n_r = len(times), len(names)
+    if n_t == 0:
+        return None
+
+    month = times.month.to_numpy()
+    seasonal = np.where(np.isin(month, [6, 7, 8]), 1.3, np.where(np.isin(month, [12, 1, 2]), 1.2, 1.0))
+    weekday = np.where(times.weekday.to_numpy() < 5, 1.1, 0.85)
+    factor = (seasonal * weekday)[:, None]
+    if granularity != 'daily':
+        factor = factor * HOURLY_PROFILE[times.hour.to_numpy()][:, None]
+
+    demand = (base[None, :] * factor * rng.uniform(0.9, 1.1, size=(n_t, n_r))).astype(np.int64)
+    supply = (demand * rng.uniform(1.05, 1.10, size=(n_t, n_r))).astype(np.int64)
+    if granularity != 'daily':
+        hour = np.repeat(times.hour.to_numpy(), n_r)
+        date = np.repeat(times.strftime('%Y-%m-%d %H:%M:%S').to_numpy(), n_r)
     else:
-        duration = np.random.randint(1, 12)
-    
-    outage_data.append({
-        'date': date.strftime('%Y-%m-%d'),
-        'region': region,
+        hour = rng.choice(PEAK_HOURS, size=n_t * n_r, p=PEAK_HOUR_P)
+        date = np.repeat(times.strftime('%Y-%m-%d').to_numpy(), n_r)
+    summer = np.repeat(np.isin(month, [5, 6, 7, 8, 9]), n_r)
+    temperature = np.where(summer, rng.integers(15, 35, size=n_t * n_r), rng.integers(-5, 20, size=n_t * n_r))
+
+    return pd.DataFrame({
+        'date': date,
+        'region': np.tile(np.array(names, dtype=object), n_t),
+        'demand_mw': demand.ravel(),
+        'supply_mw': supply.ravel(),
+        'hour': hour,
+        'day_of_week': np.repeat(times.day_name().to_numpy(), n_r),
+        'month': np.repeat(times.month_name().to_numpy(), n_r),
+        'temperature': temperature,
+    })
+
+
+def outage_chunk(rng, lo, hi, names, outage_rate, granularity):
+    days = (hi - lo).days
+    count = rng.poisson(outage_rate * days * len(names))
+    if count == 0:
+        return None
+
+    day = rng.integers(0, days, size=count)
+    when = lo + pd.to_timedelta(day, unit='D')
+    if granularity != 'daily':
+        step = pd.Timedelta(pd.tseries.frequencies.to_offset(FREQUENCIES[granularity]))
+        when = when + step * rng.integers(0, pd.Timedelta(days=1) // step, size=count)
+    cause = rng.integers(0, len(OUTAGE_CAUSES), size=count)
+
+    n_desc = np.array([len(OUTAGE_DESCRIPTIONS[c]) for c in OUTAGE_CAUSES])
+    desc_table = np.array([OUTAGE_DESCRIPTIONS[c] + [''] * (n_desc.max() - len(OUTAGE_DESCRIPTIONS[c])) for c in OUTAGE_CAUSES], dtype=object)
+    description = desc_table[cause, (rng.random(count) * n_desc[cause]).astype(np.int64)]
+
+    bounds = np.array([OUTAGE_DURATIONS.get(c, DEFAULT_DURATION) for c in OUTAGE_CAUSES])
+    low, high = bounds[cause, 0], bounds[cause, 1]
+    duration = low + (rng.random(count) * (high - low)).astype(np.int64)
+
+    df = pd.DataFrame({
+        'date': when.strftime('%Y-%m-%d %H:%M:%S' if granularity != 'daily' else '%Y-%m-%d'),
+        'region': np.array(names, dtype=object)[rng.integers(0, len(names), size=count)],
         'duration_hours': duration,
-        'cause': cause,
+        'cause': np.array(OUTAGE_CAUSES, dtype=object)[cause],
         'description': description,
-        'affected_customers': np.random.randint(500, 50000),
-        'severity': np.random.choice(['Low', 'Medium', 'High', 'Critical'], p=[0.3, 0.4, 0.2, 0.1])
+        'affected_customers': rng.integers(500, 50000, size=count),
+        'severity': np.array(SEVERITIES, dtype=object)[rng.choice(len(SEVERITIES), size=count, p=SEVERITY_P)],
     })
+    return df.sort_values('date', kind='stable').reset_index(drop=True)
+
+
+class Writer:
+    """Appends chunks to one file per dataset, or to region/month partitions."""
+
+    def __init__(self, out_dir, name, fmt, partition):
+        self.out_dir = out_dir
+        self.name = name
+        self.fmt = fmt
+        self.partition = partition
+        self.rows = 0
+        self._parquet = None
+        self._wrote_header = False
+
+    def write(self, df, month_label):
+        if df is None or len(df) == 0:
+            return
+        self.rows += len(df)
+        if self.partition:
+            for region, part in df.groupby('region', sort=False):
+                path = os.path.join(self.out_dir, self.name, f'region={region}', f'month={month_label}', f'part-0.{self.fmt}')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.fmt == 'parquet':
+                    part.to_parquet(path, index=False)
+                else:
+                    part.to_csv(path, index=False)
+        elif self.fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(os.path.join(self.out_dir, f'{self.name}.parquet'), table.schema)
+            self._parquet.write_table(table)
+        else:
+            path = os.path.join(self.out_dir, f'{self.name}.csv')
+            df.to_csv(path, mode='a' if self._wrote_header else 'w', header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def generate(out_dir='data', regions=4, years=1.0, granularity='daily', outage_rate=DEFAULT_OUTAGE_RATE,
+             start='2024-01-01', seed=42, fmt='csv', partition=False, verbose=True):
+    """Write synthetic consumption and outage data one calendar month at a time.
+
+    Every month draws from its own generator seeded with (seed, month), so
+    the output is reproducible and memory stays bounded by one month of rows.
+    Returns the number of (consumption, outage) rows written.
+    """
+    names, base = make_regions(regions, seed)
+    os.makedirs(out_dir, exist_ok=True)
+    consumption = Writer(out_dir, 'consumption_logs', fmt, partition)
+    outages = Writer(out_dir, 'outage_reports', fmt, partition)
+    try:
+        for lo, hi in month_starts(start, years):
+            month_key = lo.year * 12 + lo.month
+            rng = np.random.default_rng([seed, 1, month_key])
+            consumption.write(consumption_chunk(rng, lo, hi, names, base, granularity), f'{lo:%Y-%m}')
+            outages.write(outage_chunk(rng, lo, hi, names, outage_rate, granularity), f'{lo:%Y-%m}')
+            if verbose:
+                print(f"{lo:%Y-%m}: {consumption.rows:,} consumption / {outages.rows:,} outage records")
+    finally:
+        consumption.close()
+        outages.close()
+    return consumption.rows, outages.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic energy consumption and outage data.')
+    parser.add_argument('--out-dir', default='data', help='output directory (default: data)')
+    parser.add_argument('--scale', type=int, default=1, help='scale factor: multiplies the number of regions (default: 1)')
+    parser.add_argument('--regions', type=int, default=None, help='number of regions (default: 4 x scale)')
+    parser.add_argument('--years', type=float, default=1.0, help='years of history (default: 1)')
+    parser.add_argument('--granularity', choices=list(FREQUENCIES), default='daily')
+    parser.add_argument('--outage-rate', type=float, default=DEFAULT_OUTAGE_RATE, help='expected outages per region per day')
+    parser.add_argument('--start', default='2024-01-01', help='first date (default: 2024-01-01)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', dest='fmt', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--partition', action='store_true', help='write region=<r>/month=<yyyy-mm> partitions')
+    args = parser.parse_args()
+
+    regions = args.regions or len(REGIONS) * args.scale
+    rows, outage_rows = generate(args.out_dir, regions, args.years, args.granularity, args.outage_rate,
+                                 args.start, args.seed, args.fmt, args.partition)
+
+    print("\nData generation complete!")
+    print(f"Regions: {regions}, granularity: {args.granularity}, years: {args.years:g}")
+    print(f"Total consumption records: {rows:,}")
+    print(f"Total outage records: {outage_rows:,}")
 
-# Create DataFrame
-df_outages = pd.DataFrame(outage_data)
-df_outages = df_outages.sort_values('date').reset_index(drop=True)
-df_outages.to_csv('data/outage_reports.csv', index=False)
-print(f"Generated {len(df_outages)} outage records")
 
-print("\nData generation complete!")
-print(f"Date range: {start_date.strftime('%Y-%m-%d')} to {dates[-1].strftime('%Y-%m-%d')}")
-print(f"Total consumption records: {len(df_consumption)}")
-print(f"Total outage records: {len(df_outages)}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,200 @@
 # main.py
-from langchain_ollama import OllamaLLM
-from agents.data_agent import DataAgent
-from agents.analysis_agent import AnalysisAgent
-from agents.report_agent import ReportAgent
+import argparse
+import sys
+import time
+from functools import cached_property
+
+_IMPORT_STARTED = time.perf_counter()
+
+# Intents with side effects (writing files) are always executed; the LLM
+# gateway memoises model answers itself and does not keep failures
+UNCACHED_INTENTS = {"plot", "insights"}
+
+# intent -> (agent attribute, method); agents are only built once routed to
+HANDLERS = {
+    "similar_outages": ("analysis_agent", "find_similar_outages"),
+    "insights": ("report_agent", "generate_insights"),
+    "forecast": ("forecast_agent", "forecast_demand"),
+    "peak_demand": ("data_agent", "get_peak_demand"),
+    "percentiles": ("data_agent", "get_demand_percentiles"),
+    "outages_by_region": ("analysis_agent", "analyze_outages_by_region"),
+    "outage_totals": ("analysis_agent", "summarize_outage_totals"),
+    "gap": ("analysis_agent", "analyze_demand_supply_gap"),
+    "outages_at_peak": ("analysis_agent", "analyze_outages_during_peak"),
+    "unserved_demand": ("analysis_agent", "estimate_unserved_demand"),
+    "anomalies": ("analysis_agent", "detect_anomalies"),
+    "plot": ("report_agent", "create_demand_plot"),
+    "summary": ("report_agent", "generate_summary"),
+}
+
+# intent -> (agent attribute, method) yielding the answer as the model generates it
+STREAMING_HANDLERS = {
+    "insights": ("report_agent", "stream_insights"),
+}
+
+# Route entities passed to an intent's handler besides region, start and end
+INTENT_OPTIONS = {
+    "forecast": ("days",),
+    "percentiles": ("percentiles",),
+    "similar_outages": ("text",),
+}
+
+HEAVY_MODULES = ("pandas", "duckdb", "pyarrow", "plotly", "langchain", "langchain_ollama")
 
 class EnergyManagementSystem:
-    def __init__(self):
-        self.llm = OllamaLLM(model="llama2")
-        self.data_agent = DataAgent(self.llm)
-        self.analysis_agent = AnalysisAgent(self.llm)
-        self.report_agent = ReportAgent(self.llm)
-    
+    """Entry point for queries; every component is created on first use.
+
+    Constructing the system imports nothing heavy. The data store, query
+    engine and router are built by the first query, an agent when its
+    intent is first routed to, and the model client behind the LLM gateway
+    only on its first call, so a one-shot aggregate never loads langchain.
+    """
+
+    @cached_property
+    def llm(self):
+        from core.llm import get_gateway
+        return get_gateway()
+
+    @cached_property
+    def store(self):
+        from core.data_store import get_store
+        return get_store()
+
+    @cached_property
+    def engine(self):
+        from core.query_engine import get_engine
+        return get_engine()
+
+    @cached_property
+    def cache(self):
+        from core.result_cache import ResultCache
+        return ResultCache()
+
+    @cached_property
+    def router(self):
+        from core.router import IntentRouter
+        # "last quarter" and the like are relative to the latest reading
+        return IntentRouter(regions=self.store.consumption['region'].dropna().unique(),
+                            llm_factory=lambda: self.llm,
+                            reference=lambda: self.store.index('consumption').all.last_date())
+
+    @cached_property
+    def data_agent(self):
+        from agents.data_agent import DataAgent
+        return DataAgent(self.llm, self.store, self.engine)
+
+    @cached_property
+    def analysis_agent(self):
+        from agents.analysis_agent import AnalysisAgent
+        return AnalysisAgent(self.llm, self.store, self.engine)
+
+    @cached_property
+    def report_agent(self):
+        from agents.report_agent import ReportAgent
+        return ReportAgent(self.llm, self.store, self.engine)
+
+    @cached_property
+    def forecast_agent(self):
+        from agents.forecast_agent import ForecastAgent
+        return ForecastAgent(self.llm, self.store)
+
+    def data_version(self) -> tuple:
+        return self.store.version('consumption'), self.store.version('outages')
+
     def process_query(self, query: str) -> str:
-        query = query.lower().strip()
-        
-        if "peak demand" in query:
-            return self.data_agent.get_peak_demand()
-        elif "outage" in query and "region" in query:
-            return self.analysis_agent.analyze_outages_by_region()
-        elif "gap" in query or ("demand" in query and "supply" in query):
-            return self.analysis_agent.analyze_demand_supply_gap()
-        elif "plot" in query or "visual" in query:
-            return self.report_agent.create_demand_plot()
-        elif "summary" in query or "report" in query:
-            return self.report_agent.generate_summary()
-        else:
+        route = self.router.route(query)
+        options = {name: route[name] for name in INTENT_OPTIONS.get(route["intent"], ())}
+        return self.answer(route["intent"], route["region"], route["start"], route["end"], **options)
+
+    def stream_query(self, query: str):
+        """Yield the answer to ``query`` in pieces: model output as it is generated, other answers whole."""
+        route = self.router.route(query)
+        if route["intent"] in STREAMING_HANDLERS:
+            agent_name, method = STREAMING_HANDLERS[route["intent"]]
+            yield from getattr(getattr(self, agent_name), method)(region=route["region"], start=route["start"], end=route["end"])
+            return
+        options = {name: route[name] for name in INTENT_OPTIONS.get(route["intent"], ())}
+        yield self.answer(route["intent"], route["region"], route["start"], route["end"], **options)
+
+    def answer(self, intent, region=None, start=None, end=None, **options) -> str:
+        if intent is None:
             return "I'm sorry, I don't understand that query. Please ask about peak demand, outages by region, demand-supply gap, or request a visualization."
+        agent_name, method = HANDLERS[intent]
+        # Options other intents use are ignored, so callers can pass a whole route
+        options = {name: options.get(name) for name in INTENT_OPTIONS.get(intent, ())}
+        handler = lambda: getattr(getattr(self, agent_name), method)(region=region, start=start, end=end, **options)
+        if intent in UNCACHED_INTENTS:
+            return handler()
+        return self.cache.get_or_compute((intent, region, start, end, tuple(options.items()), self.data_version()), handler)
+
+def startup_report(query: str) -> list:
+    """Time each startup phase of a fresh system answering ``query``."""
+    phases = [("import main", _IMPORT_DONE - _IMPORT_STARTED)]
+
+    def timed(name, func):
+        start = time.perf_counter()
+        result = func()
+        phases.append((name, time.perf_counter() - start))
+        return result
+
+    system = timed("construct system", EnergyManagementSystem)
+    timed("load data", lambda: (system.store.consumption, system.store.outages))
+    timed("build router", lambda: system.router)
+    timed("first query", lambda: system.process_query(query))
+    timed("repeat query", lambda: system.process_query(query))
+    return phases
+
+def print_answer(system, query: str):
+    # Model answers appear word by word instead of after the whole generation
+    for chunk in system.stream_query(query):
+        print(chunk, end="", flush=True)
+    print()
+
+def print_startup_report(query: str):
+    phases = startup_report(query)
+    print(f"Startup report for {query!r}")
+    for name, seconds in phases:
+        print(f"  {name:<18} {seconds * 1000:>9.1f} ms")
+    total = sum(seconds for name, seconds in phases if name != "repeat query")
+    print(f"  {'total':<18} {total * 1000:>9.1f} ms")
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"  modules loaded: {', '.join(loaded) or 'none'}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Energy Management System")
+    parser.add_argument("query", nargs="*", help="answer this query and exit instead of starting the prompt")
+    parser.add_argument("--startup-report", action="store_true", help="time each startup phase for the query and exit")
+    parser.add_argument("--profile", action="store_true", help="trace and sample the query's stack, printing both to stderr")
+    parser.add_argument("--batch", metavar="FILE", help="answer every query in FILE ('-' for stdin) and write JSONL results")
+    parser.add_argument("--output", metavar="FILE", help="batch results file (default: stdout)")
+    parser.add_argument("--workers", type=int, help="batch worker processes (default: CPU count)")
+    args = parser.parse_args()
+    query = " ".join(args.query)
+
+    if args.batch:
+        from batch import run_batch
+        stats = run_batch(args.batch, args.output, args.workers)
+        print(f"{stats['queries']} queries ({stats['unique']} unique, {stats['invalid']} invalid) on {stats['workers']} worker(s) "
+              f"in {stats['seconds']:.2f}s", file=sys.stderr)
+        return
+
+    if args.startup_report:
+        print_startup_report(query or "What was the peak demand?")
+        return
+
+    system = EnergyManagementSystem()
+
+    if query and args.profile:
+        from core.telemetry import trace
+        with trace("query", profile=True) as request:
+            print_answer(system, query)
+        print(request.text(), file=sys.stderr)
+        return
+
+    if query:
+        print_answer(system, query)
+        return
+
     print("Energy Management System")
     print("=" * 50)
     print("\nYou can ask questions like:")
@@ -37,19 +204,18 @@ def main():
     print("- What's the gap between supply and demand?")
     print("\nType 'exit' to quit")
     print("-" * 50)
-    
-    system = EnergyManagementSystem()
-    
+
     while True:
         query = input("\nEnter your query: ").strip()
-        
+
         if query.lower() == 'exit':
             print("Thank you for using the Energy Management System!")
             break
-        
-        response = system.process_query(query)
+
         print("\nResponse:")
-        print(response)
+        print_answer(system, query)
+
+_IMPORT_DONE = time.perf_counter()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,358 @@
+# service.py
+import argparse
+import asyncio
+import functools
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+from core.downsample import downsample
+from core.outage_index import DEFAULT_RESULTS
+from core.outage_stats import OUTAGE_KEYS
+from core.quantiles import DEFAULT_PERCENTILES, MEASURES as PERCENTILE_COLUMNS
+from core.telemetry import metrics, trace
+from main import EnergyManagementSystem
+
+MAX_BODY_BYTES = 64 * 1024
+LATENCY_SAMPLES = 2048
+REQUEST_METRIC = 'ems_http_request_seconds'
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+               504: 'Gateway Timeout'}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def to_json(value):
+    if isinstance(value, dict):
+        return {str(k): to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, pd.DataFrame):
+        return to_json(value.to_dict('index'))
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class LatencyStats:
+    """Request count, errors and latency percentiles over the most recent samples."""
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.samples = deque(maxlen=samples)
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, seconds: float, ok: bool):
+        self.samples.append(seconds)
+        self.requests += 1
+        self.errors += not ok
+
+    def snapshot(self) -> dict:
+        ms = np.array(self.samples) * 1000
+        stats = {'requests': self.requests, 'errors': self.errors}
+        if len(ms):
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            stats.update(mean_ms=ms.mean(), p50_ms=p50, p95_ms=p95, p99_ms=p99, max_ms=ms.max())
+        return to_json(stats)
+
+
+class QueryService:
+    """Serves the energy queries as JSON over HTTP from an asyncio loop.
+
+    Query work runs on a thread pool so the loop keeps accepting
+    connections; pandas, numpy and DuckDB release the GIL for the heavy
+    parts. At most ``max_pending`` queries are admitted at once (others get
+    503 with Retry-After) and a query that exceeds ``timeout`` seconds is
+    answered with 504.
+    """
+
+    def __init__(self, system=None, workers=4, max_pending=64, timeout=10.0):
+        self.system = system or EnergyManagementSystem()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query')
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.latency = {}
+        metrics.describe(REQUEST_METRIC, 'Seconds from reading a request to writing its response')
+        self.routes = {
+            '/peak-demand': self.peak_demand,
+            '/outages': self.outages,
+            '/outage-totals': self.outage_totals,
+            '/gap': self.gap,
+            '/percentiles': self.percentiles,
+            '/summary': self.summary,
+            '/plot': self.plot,
+            '/anomalies': self.anomalies,
+            '/similar-outages': self.similar_outages,
+            '/alerts': self.alerts,
+            '/query': self.query,
+        }
+
+    def warm_up(self):
+        # Load data and build the router before the first request arrives
+        self.system.router
+        self.system.engine.peak_demand()
+
+    def cached(self, name: str, params: dict, compute):
+        filters = filter_params(params)
+        key = ('service', name, tuple(sorted(params.items())), self.system.data_version())
+        return self.system.cache.get_or_compute(key, lambda: to_json(compute(**filters)))
+
+    def peak_demand(self, params: dict):
+        return self.cached('peak_demand', params, self.system.engine.peak_demand)
+
+    def outages(self, params: dict):
+        by = params.pop('by', 'region')
+        if by not in OUTAGE_KEYS:
+            raise RequestError(400, f"'by' must be one of {', '.join(OUTAGE_KEYS)}")
+        return self.cached(f'outages_{by}', params, lambda **f: self.system.engine.outage_breakdown(by, **f))
+
+    def outage_totals(self, params: dict):
+        return self.cached('outage_totals', params, self.system.engine.outage_totals)
+
+    def gap(self, params: dict):
+        return self.cached('gap', params, self.system.engine.demand_supply_gap)
+
+    def percentiles(self, params: dict):
+        column = params.pop('column', 'demand_mw')
+        if column not in PERCENTILE_COLUMNS:
+            raise RequestError(400, f"'column' must be one of {', '.join(PERCENTILE_COLUMNS)}")
+        raw = params.pop('p', None)
+        try:
+            percentiles = tuple(float(p) for p in raw.split(',')) if raw else DEFAULT_PERCENTILES
+        except ValueError:
+            raise RequestError(400, "'p' must be comma-separated numbers")
+        if not all(0 <= p <= 100 for p in percentiles):
+            raise RequestError(400, "percentiles must be between 0 and 100")
+        name = f"percentiles_{column}_{','.join(f'{p:g}' for p in percentiles)}"
+        return self.cached(name, params, lambda **f: self.system.engine.percentiles(**f, percentiles=percentiles, column=column))
+
+    def summary(self, params: dict):
+        return self.cached('summary', params, self.system.engine.summary)
+
+    def plot(self, params: dict):
+        # Plot-ready demand and supply series per region, from the same pyramid level as the dashboard charts
+        def series(region, start, end):
+            data, level = self.system.engine.series(region, start, end)
+            data = downsample(data, 'date', ['demand_mw', 'supply_mw'], by='region')
+            return {
+                name: {'level': level, 'date': [d.isoformat() for d in part['date']],
+                       'demand_mw': part['demand_mw'].tolist(), 'supply_mw': part['supply_mw'].tolist()}
+                for name, part in data.groupby('region', sort=False, observed=True)
+            }
+        return self.cached('plot', params, series)
+
+    def anomalies(self, params: dict):
+        # Backtest: every spike and deficit alert the streaming detector raises over the filtered history
+        def scan(region, start, end):
+            readings, scores, alerts = self.system.analysis_agent.monitor.scan(region, start, end)
+            return {'readings': len(readings), 'spikes': int(scores['spike'].sum()),
+                    'deficits': int(scores['deficit_alert'].sum()), 'alerts': alerts}
+        return self.cached('anomalies', params, scan)
+
+    def similar_outages(self, params: dict):
+        text = params.pop('q', None)
+        if not text:
+            raise RequestError(400, "missing 'q'")
+        k = params.pop('k', None)
+        try:
+            k = int(k) if k else DEFAULT_RESULTS
+        except ValueError:
+            raise RequestError(400, f"invalid k '{k}'")
+        index = self.system.analysis_agent.outage_index
+        return self.cached(f'similar_outages_{k}_{text}', params, lambda **f: index.similar(text, **f, k=k).to_dict('records'))
+
+    def alerts(self, params: dict):
+        # Live alerts raised by readings appended since startup, newest last
+        limit = params.pop('limit', None)
+        filters = filter_params(params)
+        try:
+            limit = int(limit) if limit else None
+        except ValueError:
+            raise RequestError(400, f"invalid limit '{limit}'")
+        monitor = self.system.analysis_agent.monitor
+        monitor.sync()
+        return to_json(monitor.recent_alerts(limit, filters['region']))
+
+    def query(self, params: dict):
+        text = params.get('q') or params.get('query')
+        if not text:
+            raise RequestError(400, "missing 'q'")
+        return {'query': text, 'answer': self.system.process_query(text)}
+
+    async def dispatch(self, method: str, path: str, params: dict):
+        handler = self.routes.get(path)
+        if handler is None:
+            raise RequestError(404, f"unknown endpoint '{path}'")
+        if method not in ('GET', 'POST'):
+            raise RequestError(405, f"method {method} not allowed")
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise RequestError(503, "server busy, retry later")
+
+        if str(params.pop('profile', '')).lower() in TRUE_VALUES:
+            handler = functools.partial(profiled, path, handler)
+        self.pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, handler, params)
+        # The slot is held until the worker really finishes, even after a timeout
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise RequestError(504, f"query exceeded {self.timeout:g}s")
+
+    def _release(self, _future):
+        self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'endpoints': {path: stats.snapshot() for path, stats in sorted(self.latency.items())},
+            'cache': to_json(self.system.cache.stats()),
+            'llm': to_json(self.system.llm.stats()),
+            'spans': to_json(metrics.spans()),
+        }
+
+    async def handle(self, reader, writer):
+        started = time.perf_counter()
+        path, status = None, 500
+        try:
+            method, path, params = await read_request(reader)
+            if path == '/health':
+                status, body = 200, {'status': 'ok'}
+            elif path == '/stats':
+                status, body = 200, self.stats()
+            elif path == '/metrics':
+                # Prometheus scrapes the text format; format=json gives the same numbers as JSON
+                status, body = 200, to_json(metrics.snapshot()) if params.get('format') == 'json' else metrics.prometheus()
+            else:
+                status, body = 200, await self.dispatch(method, path, params)
+        except RequestError as e:
+            status, body = e.status, {'error': str(e)}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            status, body = 500, {'error': f"{type(e).__name__}: {e}"}
+
+        await write_response(writer, status, body)
+        if path in self.routes:
+            seconds = time.perf_counter() - started
+            self.latency.setdefault(path, LatencyStats()).record(seconds, status == 200)
+            metrics.observe(REQUEST_METRIC, seconds, endpoint=path, status=status)
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.warm_up)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Energy query service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def profiled(path: str, handler, params: dict) -> dict:
+    """Run ``handler`` under a trace with the sampling profiler on; the answer moves under ``result``."""
+    with trace(path, profile=True) as request:
+        result = handler(params)
+    return {'result': result, 'trace': to_json(request.to_json())}
+
+
+def filter_params(params: dict) -> dict:
+    unknown = set(params) - {'region', 'start', 'end'}
+    if unknown:
+        raise RequestError(400, f"unknown parameter(s): {', '.join(sorted(unknown))}")
+    filters = {'region': params.get('region'), 'start': None, 'end': None}
+    for name in ('start', 'end'):
+        if params.get(name):
+            try:
+                filters[name] = pd.Timestamp(params[name])
+            except ValueError:
+                raise RequestError(400, f"invalid {name} date '{params[name]}'")
+    return filters
+
+
+async def read_request(reader):
+    request_line = (await reader.readuntil(b'\r\n')).decode('latin-1').split()
+    if len(request_line) != 3:
+        raise RequestError(400, "malformed request line")
+    method, target, _ = request_line
+    headers = {}
+    while True:
+        line = (await reader.readuntil(b'\r\n')).decode('latin-1')
+        if line == '\r\n':
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    url = urlsplit(target)
+    params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, "request body too large")
+    if length:
+        try:
+            body = json.loads(await reader.readexactly(length))
+        except ValueError:
+            raise RequestError(400, "body must be a JSON object")
+        if not isinstance(body, dict):
+            raise RequestError(400, "body must be a JSON object")
+        params.update({k: str(v) for k, v in body.items() if v is not None})
+    return method.upper(), url.path.rstrip('/') or '/', params
+
+
+async def write_response(writer, status: int, body):
+    if isinstance(body, str):
+        payload, content_type = body.encode(), 'text/plain; version=0.0.4; charset=utf-8'
+    else:
+        payload, content_type = json.dumps(body).encode(), 'application/json'
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n")
+    if status == 503:
+        head += "Retry-After: 1\r\n"
+    writer.write(head.encode() + b"\r\n" + payload)
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON query service for the Energy Management System.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=4, help='query worker threads')
+    parser.add_argument('--max-pending', type=int, default=64, help='queries admitted at once before answering 503')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds before a query is answered with 504')
+    args = parser.parse_args()
+
+    service = QueryService(workers=args.workers, max_pending=args.max_pending, timeout=args.timeout)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
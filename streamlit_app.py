@@ -1,9 +1,24 @@
 # streamlit_app.py
+import json
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+from agents.report_agent import ReportAgent
+from core.anomaly import describe_alert, get_monitor
+from core.data_store import get_store
+from core.downsample import downsample, use_webgl
+from core.ingest import Ingestor
+from core.llm import get_gateway
+from core.outage_index import HAS_CHROMADB, get_outage_index
+from core.outage_stats import summarize_outages
+from core.quantiles import RELATIVE_ACCURACY
+from core.query_engine import get_engine
+from core.rollup import LEVEL_LABELS
+from core.result_cache import ResultCache
+from core.telemetry import metrics, span, trace
+from main import HANDLERS, INTENT_OPTIONS, EnergyManagementSystem
 
 # Page configuration
 st.set_page_config(
@@ -43,24 +58,123 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Load data
-@st.cache_data
+@st.cache_resource
+def get_data_store():
+    return get_store()
+
+@st.cache_resource
+def get_query_engine():
+    return get_engine()
+
+@st.cache_resource
+def get_anomaly_monitor():
+    monitor = get_monitor()
+    monitor.sync()
+    return monitor
+
+@st.cache_resource
+def get_ingestor():
+    # Alerts are raised as the ingestor appends rows, not when the page reruns
+    listeners = [get_anomaly_monitor().sync]
+    if HAS_CHROMADB:
+        # New outages become searchable without re-embedding the history
+        listeners.append(get_outage_index().sync)
+    return Ingestor(get_data_store(), listeners=listeners).start()
+
+@st.cache_resource
+def get_report_agent():
+    return ReportAgent(get_gateway(), get_data_store(), get_query_engine())
+
+@st.cache_resource
+def get_system():
+    # Shares the store, engine and LLM gateway singletons with the charts above
+    return EnergyManagementSystem()
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
+@st.cache_resource
+def get_intent_router():
+    # The CLI's router: regions from the data, relative periods from the latest reading, LLM fallback
+    return get_system().router
+
+def data_version():
+    store = get_data_store()
+    return store.version('consumption'), store.version('outages')
+
 def load_data():
     try:
-        consumption = pd.read_csv('data/consumption_logs.csv')
-        outages = pd.read_csv('data/outage_reports.csv')
-        consumption['date'] = pd.to_datetime(consumption['date'])
-        outages['date'] = pd.to_datetime(outages['date'])
-        return consumption, outages
+        store = get_data_store()
+        return store.consumption, store.outages
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return None, None
 
+get_ingestor()
 consumption_data, outage_data = load_data()
+store = get_data_store()
+engine = get_query_engine()
+result_cache = get_result_cache()
 
 if consumption_data is None or outage_data is None:
     st.error("Please make sure data files exist in the 'data' folder!")
     st.stop()
 
+def build_response(intent, region, start_date, end_date, has_consumption, has_outages, options):
+    if intent == "peak_demand":
+        if has_consumption:
+            peak = engine.peak_demand(region, start_date, end_date)
+            return f"✅ Peak demand observed on {peak['date'].strftime('%Y-%m-%d')} in {peak['region']} region with {peak['demand_mw']} MW"
+        return "No data available for the selected filters."
+    
+    elif intent in ("outages_by_region", "outage_totals"):
+        if not has_outages:
+            return "No outage data available for the selected filters."
+        if intent == "outages_by_region":
+            summary = engine.outage_breakdown('region', region, start_date, end_date)
+            result = []
+            for row in summary.itertuples():
+                result.append(f"**{row.Index}**: {row.count} outages, {row.total_hours} hrs")
+            return "\n\n".join(result)
+        totals = engine.outage_totals(region, start_date, end_date)
+        return f"**Total Outages**: {totals['count']}\n\n**Total Duration**: {totals['total_hours']} hours\n\n**Average Duration**: {totals['mean_hours']:.2f} hours"
+    
+    elif intent == "gap":
+        if has_consumption:
+            analysis = engine.demand_supply_gap(region, start_date, end_date)
+            return f"**Demand-Supply Gap Analysis:**\n\n{analysis.to_string()}"
+        return "No data available for the selected filters."
+    
+    elif intent == "summary":
+        if not has_consumption:
+            return "No data available for the selected filters."
+        stats = engine.summary(region, start_date, end_date)
+        return f"""**📊 Summary Report**
+
+**Peak Demand**: {stats['peak_demand']} MW
+
+**Average Demand**: {stats['avg_demand']:.2f} MW
+
+**Total Supply**: {stats['total_supply']} MW
+
+**Total Outages**: {stats['total_outages']}
+
+**Total Outage Hours**: {stats['total_outage_hours']} hrs
+
+**Date Range**: {start_date} to {end_date}
+
+**Region**: {region}
+
+**Records Analyzed**: {stats['records']} consumption records"""
+    
+    elif intent in HANDLERS:
+        # Intents without a dashboard layout get the agents' answer, one paragraph per line
+        answer = get_system().answer(intent, None if region == "All" else region, start_date, end_date, **options)
+        return answer.replace("\n", "\n\n")
+    
+    return "❓ Please ask about:\n- Peak demand\n- Demand percentiles\n- Outages by region\n- Outages similar to an incident\n- Demand-supply gap\n- Anomalies\n- Demand forecast\n- Summary report\n- Insights and recommendations"
+
 # Main header
 st.markdown('<h1 class="main-header">⚡ Agentic Energy Assistant</h1>', unsafe_allow_html=True)
 
@@ -105,105 +219,43 @@ query = st.text_area(
 # Generate Report Button
 if st.button("🔍 Generate Report", type="primary"):
     if query:
-        with st.spinner("Processing your query..."):
-            # Filter data based on selections
-            filtered_consumption = consumption_data.copy()
-            filtered_outages = outage_data.copy()
-            
-            # Apply date filter
-            filtered_consumption = filtered_consumption[
-                (filtered_consumption['date'] >= pd.to_datetime(start_date)) &
-                (filtered_consumption['date'] <= pd.to_datetime(end_date))
-            ]
-            filtered_outages = filtered_outages[
-                (filtered_outages['date'] >= pd.to_datetime(start_date)) &
-                (filtered_outages['date'] <= pd.to_datetime(end_date))
-            ]
+        # The profiler toggle applies to this report only
+        profile = st.session_state.pop("profile_report", False)
+        with st.spinner("Processing your query..."), trace("streamlit.report", profile=profile) as report_trace:
+            # Process query; a region or period named in the query overrides the selectors
+            route = get_intent_router().route(query)
+            intent = route['intent']
+            region = route['region'] or region
+            start_date = route['start'].date() if route['start'] is not None else start_date
+            end_date = route['end'].date() if route['end'] is not None else end_date
             
-            # Apply region filter
-            if region != "All":
-                filtered_consumption = filtered_consumption[filtered_consumption['region'] == region]
-                filtered_outages = filtered_outages[filtered_outages['region'] == region]
+            # Filter data based on selections
+            filtered_consumption = store.select('consumption', region, start_date, end_date)
+            filtered_outages = store.select('outages', region, start_date, end_date)
             
-            # Process query
-            query_lower = query.lower()
-            response = ""
+            options = {name: route[name] for name in INTENT_OPTIONS.get(intent, ())}
+            cache_key = (intent, region, start_date, end_date, tuple(options.items()), data_version())
             
             try:
-                if "peak demand" in query_lower:
-                    if len(filtered_consumption) > 0:
-                        peak_row = filtered_consumption.loc[filtered_consumption['demand_mw'].idxmax()]
-                        response = f"✅ Peak demand observed on {peak_row['date'].strftime('%Y-%m-%d')} in {peak_row['region']} region with {peak_row['demand_mw']} MW"
-                    else:
-                        response = "No data available for the selected filters."
-                
-                elif "outage" in query_lower:
-                    if len(filtered_outages) > 0:
-                        if "region" in query_lower:
-                            summary = {}
-                            for _, row in filtered_outages.iterrows():
-                                r = row['region']
-                                if r not in summary:
-                                    summary[r] = {'count': 0, 'hours': 0}
-                                summary[r]['count'] += 1
-                                summary[r]['hours'] += row['duration_hours']
-                            
-                            result = []
-                            for r, data in summary.items():
-                                result.append(f"**{r}**: {data['count']} outages, {data['hours']} hrs")
-                            response = "\n\n".join(result)
-                        else:
-                            total_outages = len(filtered_outages)
-                            total_hours = filtered_outages['duration_hours'].sum()
-                            avg_duration = filtered_outages['duration_hours'].mean()
-                            response = f"**Total Outages**: {total_outages}\n\n**Total Duration**: {total_hours} hours\n\n**Average Duration**: {avg_duration:.2f} hours"
-                    else:
-                        response = "No outage data available for the selected filters."
-                
-                elif "gap" in query_lower or ("demand" in query_lower and "supply" in query_lower):
-                    if len(filtered_consumption) > 0:
-                        filtered_consumption['gap'] = filtered_consumption['supply_mw'] - filtered_consumption['demand_mw']
-                        analysis = filtered_consumption.groupby('region')['gap'].agg(['mean', 'min', 'max'])
-                        response = f"**Demand-Supply Gap Analysis:**\n\n{analysis.to_string()}"
-                    else:
-                        response = "No data available for the selected filters."
-                
-                elif "summary" in query_lower or "report" in query_lower:
-                    if len(filtered_consumption) > 0:
-                        peak_demand = filtered_consumption['demand_mw'].max()
-                        avg_demand = filtered_consumption['demand_mw'].mean()
-                        total_supply = filtered_consumption['supply_mw'].sum()
-                        total_outages = len(filtered_outages)
-                        total_outage_hours = filtered_outages['duration_hours'].sum() if len(filtered_outages) > 0 else 0
-                        
-                        response = f"""**📊 Summary Report**
-
-**Peak Demand**: {peak_demand} MW
-
-**Average Demand**: {avg_demand:.2f} MW
-
-**Total Supply**: {total_supply} MW
-
-**Total Outages**: {total_outages}
-
-**Total Outage Hours**: {total_outage_hours} hrs
-
-**Date Range**: {start_date} to {end_date}
-
-**Region**: {region}
-
-**Records Analyzed**: {len(filtered_consumption)} consumption records"""
-                    else:
-                        response = "No data available for the selected filters."
-                
+                if intent == "insights":
+                    # Streamed below as the model generates it; the LLM gateway memoises the answer
+                    response = None
                 else:
-                    response = "❓ Please ask about:\n- Peak demand\n- Outages by region\n- Demand-supply gap\n- Summary report"
+                    response = result_cache.get_or_compute(cache_key, lambda: build_response(
+                        intent, region, start_date, end_date,
+                        len(filtered_consumption) > 0, len(filtered_outages) > 0, options
+                    ))
                 
                 # Display result
                 st.markdown('<div class="result-box">', unsafe_allow_html=True)
                 st.success("✅ Query Processed Successfully!")
                 st.markdown("### 📊 Results:")
-                st.markdown(response)
+                if route['region'] or route['start'] is not None or route['end'] is not None:
+                    st.caption(f"Filters from your query: {region}, {start_date} to {end_date}")
+                if response is None:
+                    st.write_stream(get_report_agent().stream_insights(region=region, start=start_date, end=end_date))
+                else:
+                    st.markdown(response)
                 st.markdown('</div>', unsafe_allow_html=True)
                 
                 # Show visualizations
@@ -216,106 +268,123 @@ if st.button("🔍 Generate Report", type="primary"):
                     
                     with tab1:
                         st.markdown("### Energy Demand Over Time")
-                        fig1 = px.line(
-                            filtered_consumption, 
-                            x='date', 
-                            y='demand_mw', 
-                            color='region',
-                            title=f'Energy Demand Trends - {region}',
-                            labels={'demand_mw': 'Demand (MW)', 'date': 'Date'}
-                        )
-                        fig1.update_layout(height=500)
+                        # Long spans are drawn from the coarsest pyramid level that fits the chart
+                        chart_consumption, level = engine.series(region, start_date, end_date)
+                        chart_consumption = downsample(chart_consumption, 'date', ['demand_mw', 'supply_mw'], by='region')
+                        if level != 'raw':
+                            st.caption(f"Showing {LEVEL_LABELS[level]} averages of {len(filtered_consumption):,} readings; narrow the date range for finer detail.")
+                        elif len(chart_consumption) < len(filtered_consumption):
+                            st.caption(f"Showing {len(chart_consumption):,} of {len(filtered_consumption):,} points (peaks preserved); narrow the date range for full detail.")
+                        with span('figure.demand_trends'):
+                            fig1 = px.line(
+                                chart_consumption, 
+                                x='date', 
+                                y='demand_mw', 
+                                color='region',
+                                title=f'Energy Demand Trends - {region}',
+                                labels={'demand_mw': 'Demand (MW)', 'date': 'Date'},
+                                hover_data=['demand_mw_min', 'demand_mw_max'] if level != 'raw' else None,
+                                render_mode='webgl' if use_webgl(len(chart_consumption)) else 'auto'
+                            )
+                            fig1.update_layout(height=500)
                         st.plotly_chart(fig1, use_container_width=True)
                     
                     with tab2:
                         st.markdown("### Supply vs Demand Comparison")
-                        fig2 = go.Figure()
+                        with span('figure.supply_vs_demand'):
+                            fig2 = go.Figure()
+                            Trace = go.Scattergl if use_webgl(2 * len(chart_consumption)) else go.Scatter
                         
-                        if region == "All":
-                            for r in filtered_consumption['region'].unique():
-                                region_data = filtered_consumption[filtered_consumption['region'] == r]
-                                fig2.add_trace(go.Scatter(
-                                    x=region_data['date'], 
-                                    y=region_data['demand_mw'], 
+                            if region == "All":
+                                for r in chart_consumption['region'].unique():
+                                    region_data = chart_consumption[chart_consumption['region'] == r]
+                                    fig2.add_trace(Trace(
+                                        x=region_data['date'], 
+                                        y=region_data['demand_mw'], 
+                                        mode='lines', 
+                                        name=f'{r} - Demand'
+                                    ))
+                                    fig2.add_trace(Trace(
+                                        x=region_data['date'], 
+                                        y=region_data['supply_mw'], 
+                                        mode='lines', 
+                                        name=f'{r} - Supply', 
+                                        line=dict(dash='dash')
+                                    ))
+                            else:
+                                fig2.add_trace(Trace(
+                                    x=chart_consumption['date'], 
+                                    y=chart_consumption['demand_mw'], 
                                     mode='lines', 
-                                    name=f'{r} - Demand'
+                                    name='Demand',
+                                    line=dict(color='red')
                                 ))
-                                fig2.add_trace(go.Scatter(
-                                    x=region_data['date'], 
-                                    y=region_data['supply_mw'], 
+                                fig2.add_trace(Trace(
+                                    x=chart_consumption['date'], 
+                                    y=chart_consumption['supply_mw'], 
                                     mode='lines', 
-                                    name=f'{r} - Supply', 
-                                    line=dict(dash='dash')
+                                    name='Supply',
+                                    line=dict(color='green', dash='dash')
                                 ))
-                        else:
-                            fig2.add_trace(go.Scatter(
-                                x=filtered_consumption['date'], 
-                                y=filtered_consumption['demand_mw'], 
-                                mode='lines', 
-                                name='Demand',
-                                line=dict(color='red')
-                            ))
-                            fig2.add_trace(go.Scatter(
-                                x=filtered_consumption['date'], 
-                                y=filtered_consumption['supply_mw'], 
-                                mode='lines', 
-                                name='Supply',
-                                line=dict(color='green', dash='dash')
-                            ))
                         
-                        fig2.update_layout(
-                            title='Supply vs Demand Comparison', 
-                            xaxis_title='Date', 
-                            yaxis_title='Power (MW)',
-                            height=500
-                        )
+                            fig2.update_layout(
+                                title='Supply vs Demand Comparison', 
+                                xaxis_title='Date', 
+                                yaxis_title='Power (MW)',
+                                height=500
+                            )
                         st.plotly_chart(fig2, use_container_width=True)
                     
                     with tab3:
                         st.markdown("### Outage Analysis")
                         if len(filtered_outages) > 0:
+                            outage_summary = summarize_outages(filtered_outages)
                             col1, col2 = st.columns(2)
                             
                             with col1:
-                                outage_by_region = filtered_outages.groupby('region')['duration_hours'].sum().reset_index()
-                                fig3 = px.bar(
-                                    outage_by_region, 
-                                    x='region', 
-                                    y='duration_hours', 
-                                    title='Total Outage Duration by Region',
-                                    labels={'duration_hours': 'Total Hours', 'region': 'Region'},
-                                    color='duration_hours',
-                                    color_continuous_scale='Reds'
-                                )
-                                fig3.update_layout(height=400)
+                                outage_by_region = outage_summary['region']['total_hours'].rename('duration_hours').reset_index()
+                                with span('figure.outage_hours_by_region'):
+                                    fig3 = px.bar(
+                                        outage_by_region, 
+                                        x='region', 
+                                        y='duration_hours', 
+                                        title='Total Outage Duration by Region',
+                                        labels={'duration_hours': 'Total Hours', 'region': 'Region'},
+                                        color='duration_hours',
+                                        color_continuous_scale='Reds'
+                                    )
+                                    fig3.update_layout(height=400)
                                 st.plotly_chart(fig3, use_container_width=True)
                             
                             with col2:
                                 if 'cause' in filtered_outages.columns:
-                                    outage_by_cause = filtered_outages['cause'].value_counts().reset_index()
-                                    outage_by_cause.columns = ['cause', 'count']
-                                    fig4 = px.pie(
-                                        outage_by_cause, 
-                                        values='count', 
-                                        names='cause', 
-                                        title='Outages by Cause',
-                                        hole=0.4
-                                    )
-                                    fig4.update_layout(height=400)
+                                    outage_by_cause = outage_summary['cause']['count'].reset_index()
+                                    with span('figure.outages_by_cause'):
+                                        fig4 = px.pie(
+                                            outage_by_cause, 
+                                            values='count', 
+                                            names='cause', 
+                                            title='Outages by Cause',
+                                            hole=0.4
+                                        )
+                                        fig4.update_layout(height=400)
                                     st.plotly_chart(fig4, use_container_width=True)
                             
                             # Outage timeline
                             st.markdown("#### Outage Timeline")
-                            fig5 = px.scatter(
-                                filtered_outages,
-                                x='date',
-                                y='duration_hours',
-                                color='region',
-                                size='duration_hours',
-                                hover_data=['cause', 'region'],
-                                title='Outage Events Over Time'
-                            )
-                            fig5.update_layout(height=400)
+                            timeline = downsample(filtered_outages, 'date', 'duration_hours', by='region')
+                            with span('figure.outage_timeline'):
+                                fig5 = px.scatter(
+                                    timeline,
+                                    x='date',
+                                    y='duration_hours',
+                                    color='region',
+                                    size='duration_hours',
+                                    hover_data=['cause', 'region'],
+                                    title='Outage Events Over Time',
+                                    render_mode='webgl' if use_webgl(len(timeline)) else 'auto'
+                                )
+                                fig5.update_layout(height=400)
                             st.plotly_chart(fig5, use_container_width=True)
                         else:
                             st.info("ℹ️ No outage data available for the selected period.")
@@ -324,38 +393,56 @@ if st.button("🔍 Generate Report", type="primary"):
                         st.markdown("### Key Performance Indicators")
                         
                         # Metrics row
+                        kpis = engine.summary(region, start_date, end_date)
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
-                            st.metric("📊 Peak Demand", f"{filtered_consumption['demand_mw'].max()} MW")
+                            st.metric("📊 Peak Demand", f"{kpis['peak_demand']} MW")
                         with col2:
-                            st.metric("📈 Avg Demand", f"{filtered_consumption['demand_mw'].mean():.2f} MW")
+                            st.metric("📈 Avg Demand", f"{kpis['avg_demand']:.2f} MW")
                         with col3:
-                            st.metric("🔴 Total Outages", len(filtered_outages))
+                            st.metric("🔴 Total Outages", kpis['total_outages'])
                         with col4:
-                            total_outage_hrs = filtered_outages['duration_hours'].sum() if len(filtered_outages) > 0 else 0
-                            st.metric("⏱️ Outage Hours", f"{total_outage_hrs} hrs")
+                            st.metric("⏱️ Outage Hours", f"{kpis['total_outage_hours']} hrs")
                         
                         st.markdown("---")
                         
                         # Statistical summary table
                         st.markdown("### 📊 Statistical Summary by Region")
-                        summary_stats = filtered_consumption.groupby('region').agg({
-                            'demand_mw': ['mean', 'max', 'min', 'std'],
-                            'supply_mw': ['mean', 'max', 'min']
-                        }).round(2)
+                        summary_stats = engine.region_stats(region, start_date, end_date).round(2)
                         st.dataframe(summary_stats, use_container_width=True)
                         
-                        # Box plot for demand distribution
+                        # Percentiles from the per-month sketches, no sorting of rows
+                        st.markdown("### 📐 Demand Percentiles by Region")
+                        percentile_table = engine.percentiles(region, start_date, end_date, (5, 25, 50, 75, 95, 99))
+                        st.dataframe(percentile_table.round(0), use_container_width=True)
+                        if engine.name == 'pandas':
+                            st.caption(f"Estimated from mergeable quantile sketches; each value is within {RELATIVE_ACCURACY:.0%} of the exact percentile.")
+                        
+                        # Box plot for demand distribution, drawn from the same percentiles
+                        # instead of sending every reading to the browser
                         st.markdown("### 📦 Demand Distribution by Region")
-                        fig6 = px.box(
-                            filtered_consumption,
-                            x='region',
-                            y='demand_mw',
-                            color='region',
-                            title='Demand Distribution Across Regions'
-                        )
-                        fig6.update_layout(height=400)
+                        with span('figure.demand_distribution'):
+                            box_stats = engine.percentiles(region, start_date, end_date, (0, 25, 50, 75, 100))
+                            box_stats = box_stats.drop(index='All', errors='ignore') if len(box_stats) > 1 else box_stats
+                            fig6 = go.Figure()
+                            for name, row in box_stats.iterrows():
+                                fig6.add_trace(go.Box(
+                                    x=[name],
+                                    name=name,
+                                    q1=[row['p25']],
+                                    median=[row['p50']],
+                                    q3=[row['p75']],
+                                    lowerfence=[row['p0']],
+                                    upperfence=[row['p100']]
+                                ))
+                            fig6.update_layout(
+                                title='Demand Distribution Across Regions',
+                                xaxis_title='region',
+                                yaxis_title='demand_mw',
+                                height=400
+                            )
                         st.plotly_chart(fig6, use_container_width=True)
+                        st.caption("Boxes span the 25th to 75th percentile; whiskers reach the lowest and highest reading.")
                 
                 # Show data table
                 with st.expander("📋 View Raw Data"):
@@ -372,6 +459,7 @@ if st.button("🔍 Generate Report", type="primary"):
             except Exception as e:
                 st.error(f"❌ Error processing query: {str(e)}")
                 st.exception(e)
+        st.session_state["last_trace"] = report_trace.to_json()
     else:
         st.warning("⚠️ Please enter a query before generating the report.")
 
@@ -389,9 +477,11 @@ with st.sidebar:
     
     ### Sample Queries:
     - What was the peak demand?
+    - p95 demand in the North last quarter
     - Summarize outages by region
     - Show demand-supply gap
     - Give me a summary report
+    - Explain the demand-supply gap in the West
     - How many outages occurred?
     
     ### Features:
@@ -409,8 +499,42 @@ with st.sidebar:
     st.metric("📅 Date Range", f"{(consumption_data['date'].max() - consumption_data['date'].min()).days} days")
     st.metric("📝 Consumption Records", f"{len(consumption_data):,}")
     st.metric("🔴 Outage Records", f"{len(outage_data):,}")
-    st.metric("⚡ Peak Demand", f"{consumption_data['demand_mw'].max()} MW")
-    st.metric("📊 Avg Demand", f"{consumption_data['demand_mw'].mean():.2f} MW")
+    overall = engine.summary()
+    st.metric("⚡ Peak Demand", f"{overall['peak_demand']} MW")
+    st.metric("📊 Avg Demand", f"{overall['avg_demand']:.2f} MW")
+    
+    cache_stats = result_cache.stats()
+    st.metric("🗂️ Cached Answers", f"{cache_stats['entries']:,}", help=f"{cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses ({cache_stats['hit_rate']:.0%} hit rate)")
+    
+    st.divider()
+    st.header("🚨 Live Alerts")
+    alerts = get_anomaly_monitor().recent_alerts(limit=5)
+    if alerts:
+        for alert in reversed(alerts):
+            (st.error if alert['kind'] == 'deficit' else st.warning)(describe_alert(alert))
+    else:
+        st.caption("No demand spikes or supply deficits in newly ingested readings.")
+    
+    st.divider()
+    st.header("🩺 Diagnostics")
+    st.checkbox("Profile the next report", key="profile_report",
+                help="Sample the Python stack while the next report is generated")
+    last_trace = st.session_state.get("last_trace")
+    if last_trace:
+        st.metric("⏱️ Last Report", f"{last_trace['ms']:,.0f} ms")
+        spans = pd.DataFrame(last_trace['spans'])
+        spans['span'] = ['\u2003' * depth + name for depth, name in zip(spans['depth'], spans['span'])]
+        st.dataframe(spans[['span', 'ms']].round(1), hide_index=True, use_container_width=True)
+        if last_trace['profile']:
+            st.caption(f"Hottest functions ({last_trace['samples']:,} stack samples)")
+            st.dataframe(pd.DataFrame(last_trace['profile'])[['function', 'own_pct', 'total_pct']].round(1),
+                         hide_index=True, use_container_width=True)
+    with st.expander("Span latency since start"):
+        span_stats = pd.DataFrame(metrics.spans())
+        if len(span_stats):
+            st.dataframe(span_stats[['span', 'count', 'mean_ms', 'p95_ms', 'max_ms']].round(1), hide_index=True, use_container_width=True)
+    st.download_button("Prometheus metrics", metrics.prometheus(), file_name="ems_metrics.prom", mime="text/plain")
+    st.download_button("JSON metrics", json.dumps(metrics.snapshot()), file_name="ems_metrics.json", mime="application/json")
     
     st.divider()
     st.caption("Powered by Agentic AI 🤖")
\ No newline at end of file
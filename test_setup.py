@@ -22,6 +22,21 @@ try:
 except Exception as e:
     print(f"✗ Pandas error: {e}")
 
+# Test that bad batch lines become error records instead of stopping the run
+try:
+    import tempfile
+    from batch import read_queries
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+        f.write('summary\n{"query": \n{"query": 5}\n[1, 2]\n{}\n{"id": "q1", "query": "peak demand"}\n')
+    queries, invalid = read_queries(f.name)
+    os.remove(f.name)
+    if [item['line'] for item in queries] == [1, 6] and [item['line'] for item, _ in invalid] == [2, 3, 4, 5]:
+        print(f"✓ Batch input checked - {len(invalid)} bad lines reported")
+    else:
+        print(f"✗ Batch input error: read {queries}, rejected {invalid}")
+except Exception as e:
+    print(f"✗ Batch input error: {e}")
+
 # Test Ollama
 try:
     from langchain_ollama import OllamaLLM